@@ -24,7 +24,7 @@
 
 
 
-import io, os, sys, gc, traceback, toml, logging, atexit
+import io, os, sys, gc, mmap, traceback, toml, logging, atexit, threading
 import json, urllib.request as rq
 # from memory_profiler import profile
 import datetime
@@ -34,13 +34,14 @@ from enum import IntEnum
 from random import choice
 from base64 import b64decode
 from operator import itemgetter
-import zipfile
 from indexed_gzip import IndexedGzipFile
 from indexed_bzip2 import IndexedBzip2File
 from deps.ui.ImgSrc_svg import ImgDict
 from deps.ui.transSrc import transDict
 from deps.DatabaseFetcher import DatabaseFetcher
-from deps.cystdf import stdf_MPR_Parser, stdf_PFTR_Parser, setByteSwap
+from deps.ZipMemberReader import ZipMemberReader
+from deps.XzFileReader import XzFileReader
+from deps.cystdf import stdf_Multi_Parser, stdfMPRReader, setByteSwap, loadBzipIndex, GZ_INDEX_SUFFIX, TRANSCODE_SUFFIX
 
 from deps.uic_stdLoader import stdfLoader
 from deps.uic_stdFailMarker import FailMarker
@@ -92,7 +93,8 @@ setattr(sys, "CONFIG_PATH", os.path.join(rootFolder, base + ".config"))
 # setting attr to human string
 settingNamePair = [("showHL_trend", "Show Upper Limit (Trend)"), ("showLL_trend", "Show Lower Limit (Trend)"), ("showHSpec_trend", "Show High Specification (Trend)"), ("showLSpec_trend", "Show Low Specification (Trend)"), ("showMed_trend", "Show Median Line (Trend)"), ("showMean_trend", "Show Mean Line (Trend)"),
                    ("showHL_histo", "Show Upper Limit (Histo)"), ("showLL_histo", "Show Lower Limit (Histo)"), ("showHSpec_histo", "Show High Specification (Histo)"), ("showLSpec_histo", "Show Low Specification (Histo)"), ("showMed_histo", "Show Median Line (Histo)"), ("showMean_histo", "Show Mean Line (Histo)"), ("showGaus_histo", "Show Gaussian Fit"), ("showBoxp_histo", "Show Boxplot"), ("binCount", "Bin Count"), ("showSigma", "δ Lines"),
-                   ("language", "Language"), ("recentFolder", "Recent Folder"), ("dataNotation", "Data Notation"), ("dataPrecision", "Data Precison"), ("cpkThreshold", "Cpk Warning Threshold"), ("checkCpk", "Search Low Cpk"), ("sortTestList", "Sort TestList"),
+                   ("language", "Language"), ("recentFolder", "Recent Folder"), ("dataNotation", "Data Notation"), ("dataPrecision", "Data Precison"), ("cpkThreshold", "Cpk Warning Threshold"), ("checkCpk", "Search Low Cpk"), ("sortTestList", "Sort TestList"), ("eagerValues", "Extract Values at Loading"), 
+                   ("transcodeCompressed", "Decompress to Cache at Loading"), ("cacheLimitGB", "Cache Size Limit (GB)"), ("compactData", "Compact Test Data"),
                    ("siteColor", "Site Colors"), ("sbinColor", "Software Bin Colors"), ("hbinColor", "Hardware Bin Colors")]
 setattr(sys, "CONFIG_NAME", settingNamePair)
 
@@ -119,8 +121,9 @@ def calc_cpk(L:float, H:float, data:np.ndarray) -> tuple:
     if data.size == 0 or np.all(np.isnan(data)):
         return np.nan, np.nan, np.nan
     
-    sdev = np.nanstd(data)
-    mean = np.nanmean(data)
+    # accumulate in float64, data may be float32 in compact mode
+    sdev = np.nanstd(data, dtype=np.float64)
+    mean = np.nanmean(data, dtype=np.float64)
     
     if np.isnan(L) or np.isnan(H):
         return mean, sdev, np.nan
@@ -226,44 +229,202 @@ def isHexColor(color: str) -> bool:
         return False
 
 
+class PreadFile:
+    '''
+    Reader of a file descriptor shared by threads, every reader keeps its own position 
+    and reads by `os.pread`, the offset of the descriptor is never moved
+    '''
+    def __init__(self, fd: int):
+        self.fd = fd
+        self.pos = 0
+    
+    def seek(self, offset: int, whence: int = 0) -> int:
+        if whence == io.SEEK_SET:
+            pos = offset
+        elif whence == io.SEEK_CUR:
+            pos = self.pos + offset
+        elif whence == io.SEEK_END:
+            pos = os.fstat(self.fd).st_size + offset
+        else:
+            raise ValueError(f"Invalid whence ({whence})")
+        if pos < 0:
+            raise ValueError(f"Negative seek position {pos}")
+        self.pos = pos
+        return self.pos
+    
+    def tell(self) -> int:
+        return self.pos
+        
+    def read(self, numBytes: int = -1) -> bytes:
+        if numBytes is None or numBytes < 0:
+            numBytes = max(os.fstat(self.fd).st_size - self.pos, 0)
+        data = os.pread(self.fd, numBytes, self.pos)
+        self.pos += len(data)
+        return data
+    
+    def close(self):
+        # descriptor is owned by the primary handle
+        pass
+
+
 class StdfFile:
+    '''
+    Handle pool of a stdf file, `seek` & `read` go to the handle of the calling thread.
+    
+    The thread opened the file uses the primary handle, other threads open their own handle 
+    on first use: uncompressed file is shared by `os.pread`, compressed file gets another 
+    decompressor seeded with the index of the primary handle. Parsers running in background 
+    threads never race on the position of a shared handle.
+    '''
     def __init__(self, path: str):
         self.fpath = path
         self.ftype = ""
+        self.mapped = None          # mmap of uncompressed file, shared by threads
+        self.gzIndexPath = ""       # index file imported by every gz handle
+        self.blockOffsets = None    # block offsets shared by bzip handles
+        self.owner = threading.get_ident()
+        self.local = threading.local()
+        self.generation = 0         # handles of other threads are reopened once primary handle changed
+        self.threadHandles = []
+        self.lock = threading.Lock()
         
         if (path.lower()).endswith("gz"):
             self.ftype = "gz"
-            self.fHandle = IndexedGzipFile(filename=path, mode='rb')
         
         elif (path.lower()).endswith("bz2"):
             self.ftype = "bzip"
-            self.fHandle = IndexedBzip2File(path, parallelization = 4)
         
         elif (path.lower()).endswith("zip"):
+            # seekable reader of the 1st file in zip, ignore the rest
             self.ftype = "zip"
-            self.zipObj = zipfile.ZipFile(path, "r")
-            if len(self.zipObj.namelist()) == 0:
-                raise OSError("Empty zip file detected")
-            # open the 1st file in zip, ignore the rest
-            fileNameOf1st = self.zipObj.namelist()[0]
-            if self.zipObj.filelist[0].file_size == 0:
-                raise OSError(f"The first item in the zip is not a file: \n{fileNameOf1st}")            
-            self.fHandle = self.zipObj.open(fileNameOf1st, "r", force_zip64=True)
+        
+        elif (path.lower()).endswith(("xz", "lzma")):
+            # seek from the block located by xz index
+            self.ftype = "xz"
         
         else:
             self.ftype = "orig"
-            self.fHandle = open(path, 'rb')
+        self.fHandle = self.openHandle()
+    
+    def openHandle(self):
+        # independent handle of the file, indexed the same as the primary handle
+        if self.ftype == "gz":
+            fHandle = IndexedGzipFile(filename=self.fpath, mode='rb')
+            if self.gzIndexPath:
+                fHandle.import_index(filename=self.gzIndexPath)
+        elif self.ftype == "bzip":
+            fHandle = IndexedBzip2File(self.fpath, parallelization = 4)
+            if self.blockOffsets:
+                fHandle.set_block_offsets(self.blockOffsets)
+        elif self.ftype == "zip":
+            fHandle = ZipMemberReader(self.fpath)
+        elif self.ftype == "xz":
+            fHandle = XzFileReader(self.fpath)
+        elif self.ftype == "copy":
+            fHandle = open(self.fHandle.name, 'rb')
+        else:
+            fHandle = open(self.fpath, 'rb')
+        return fHandle
+    
+    def threadHandle(self):
+        if threading.get_ident() == self.owner:
+            return self.fHandle
+        local = self.local
+        if getattr(local, "generation", -1) != self.generation:
+            if self.ftype in ["orig", "copy"] and hasattr(os, "pread"):
+                fHandle = PreadFile(self.fHandle.fileno())
+            else:
+                fHandle = self.openHandle()
+            with self.lock:
+                self.threadHandles.append(fHandle)
+            local.fHandle = fHandle
+            local.generation = self.generation
+        return local.fHandle
+    
+    def closeThreadHandles(self):
+        with self.lock:
+            for fHandle in self.threadHandles:
+                fHandle.close()
+            self.threadHandles = []
+            self.generation += 1
     
     def seek(self, offset: int, whence: int = 0):
-        self.fHandle.seek(offset, whence)
+        self.threadHandle().seek(offset, whence)
         
     def read(self, numBytes: int):
-        return self.fHandle.read(numBytes)
+        return self.threadHandle().read(numBytes)
+
+    def fileno(self):
+        # uncompressed file is read by the parsers of cystdf directly, 
+        # `pread` allows the descriptor to be shared by threads
+        if self.ftype not in ["orig", "copy"]:
+            raise io.UnsupportedOperation("fileno")
+        return self.fHandle.fileno()
+
+    def view(self):
+        # read-only mmap of uncompressed file for the parsers of cystdf, records are decoded from 
+        # the page cache without copying, None if the file is compressed or cannot be mapped
+        if self.ftype not in ["orig", "copy"]:
+            return None
+        if self.mapped is None:
+            try:
+                self.mapped = mmap.mmap(self.fHandle.fileno(), 0, access=mmap.ACCESS_READ)
+            except (ValueError, OSError, OverflowError) as e:
+                # empty file, or too large for the address space
+                logger.info(f"Cannot map stdf file, read it instead: {repr(e)}")
+                self.mapped = False
+        return self.mapped or None
+    
+    def closeView(self):
+        if self.mapped:
+            try:
+                self.mapped.close()
+            except BufferError:
+                # still used by a parser, released once it finishes
+                pass
+        self.mapped = None
+    
+    def openTranscoded(self, dbPath: str) -> bool:
+        # read the decompressed copy written at ingest instead of decompressing on every seek
+        copyPath = dbPath + TRANSCODE_SUFFIX
+        if self.ftype in ["orig", "copy"] or not os.path.isfile(copyPath):
+            return False
+        try:
+            fHandle = open(copyPath, 'rb')
+        except OSError as e:
+            logger.warning(f"Failed to open decompressed copy: {repr(e)}")
+            return False
+        self.closeThreadHandles()
+        self.closeView()
+        self.fHandle.close()
+        self.fHandle = fHandle
+        self.ftype = "copy"
+        return True
+    
+    def importIndex(self, dbPath: str):
+        # seek index written at ingest, saves decompressing from the start on the first seek
+        self.closeThreadHandles()
+        try:
+            if self.ftype == "gz" and os.path.isfile(dbPath + GZ_INDEX_SUFFIX):
+                self.fHandle.import_index(filename=dbPath + GZ_INDEX_SUFFIX)
+                self.gzIndexPath = dbPath + GZ_INDEX_SUFFIX
+            elif self.ftype == "bzip":
+                blockOffsets = loadBzipIndex(dbPath)
+                if blockOffsets:
+                    self.fHandle.set_block_offsets(blockOffsets)
+                    self.blockOffsets = blockOffsets
+        except Exception as e:
+            logger.warning(f"Failed to import {self.ftype} index: {repr(e)}")
+            # handle may be left with a partial index
+            self.fHandle.close()
+            self.gzIndexPath = ""
+            self.blockOffsets = None
+            self.fHandle = self.openHandle()
     
     def close(self):
+        self.closeThreadHandles()
+        self.closeView()
         self.fHandle.close()
-        if self.ftype == "zip":
-            self.zipObj.close()
 
 
 class FontNames:
@@ -838,6 +999,10 @@ class SettingParams:
         self.checkCpk = False
         self.cpkThreshold = 1.33
         self.sortTestList = "Original"
+        self.eagerValues = False    # extract all test values while loading, selecting tests no longer reads the file
+        self.transcodeCompressed = False    # keep a decompressed copy of compressed file, selecting tests reads the copy
+        self.cacheLimitGB = 4       # size of cached databases and copies, least recently used are removed
+        self.compactData = False    # keep test values as float32 and flags as int16 / uint8 in memory
         # colors
         self.siteColor = {-1: "#00CC00", 0: "#00B3FF", 1: "#FF9300", 2: "#EC4EFF", 
                           3: "#00FFFF", 4: "#AA8D00", 5: "#FFB1FF", 6: "#929292", 7: "#FFFB00"}
@@ -1073,7 +1238,8 @@ class MyWindow(QtWidgets.QMainWindow):
                       "Color Setting": {}}
         configName = dict(sys.CONFIG_NAME)
         for k, v in self.settingParams.__dict__.items():
-            if k in ["language", "recentFolder", "dataNotation", "dataPrecision", "checkCpk", "cpkThreshold", "sortTestList"]:
+            if k in ["language", "recentFolder", "dataNotation", "dataPrecision", "checkCpk", "cpkThreshold", "sortTestList", "eagerValues", 
+                     "transcodeCompressed", "cacheLimitGB", "compactData"]:
                 # General
                 configData["General"][configName[k]] = v
             elif k in ["showHL_trend", "showLL_trend", "showHSpec_trend", "showLSpec_trend", "showMed_trend", "showMean_trend"]:
@@ -1105,7 +1271,7 @@ class MyWindow(QtWidgets.QMainWindow):
             f, _typ = QFileDialog.getOpenFileName(self, 
                                                   caption=self.tr("Select a STD File To Open"), 
                                                   directory=self.settingParams.recentFolder,
-                                                  filter=self.tr("All Supported Files (*.std* *.std*.gz *.std*.bz2 *.std*.zip);;STDF (*.std *.stdf);;Compressed STDF (*.std*.gz *.std*.bz2 *.std*.zip);;All Files (*.*)"),)
+                                                  filter=self.tr("All Supported Files (*.std* *.std*.gz *.std*.bz2 *.std*.zip *.std*.xz);;STDF (*.std *.stdf);;Compressed STDF (*.std*.gz *.std*.bz2 *.std*.zip *.std*.xz);;All Files (*.*)"),)
         else:
             f = os.path.normpath(f)
             
@@ -1598,6 +1764,8 @@ class MyWindow(QtWidgets.QMainWindow):
                         if humanString in configString:
                             attr = configString[humanString]    # e.g. showHL_trend
                             if type(param) == type(getattr(self.settingParams, attr)):
+                                if attr == "cacheLimitGB" and param <= 0:
+                                    continue    # keep the default, a limit of 0 would evict the whole cache
                                 setattr(self.settingParams, attr, param)
         except (FileNotFoundError, TypeError, toml.TomlDecodeError):
             # any error occurs in config file reading, simply ignore
@@ -1979,7 +2147,6 @@ class MyWindow(QtWidgets.QMainWindow):
             self.failCntDict[testID] = 0
             if self.settingParams.checkCpk:
                 # if all tests passed, check if cpk is lower than the threshold
-                parsedData["dataList"] = np.array(parsedData["dataList"], dtype='float64')
                 for head in self.availableHeads:
                     for site in self.availableSites:
                         cpk = self.getData(testTuple, [head], [site])["Cpk"]
@@ -2008,24 +2175,48 @@ class MyWindow(QtWidgets.QMainWindow):
             self.updateModelContent(self.sim_list, self.completeTestList)
     
     
-    def getDataFromOffsets(self, testInfo:dict) -> dict:
-        sel_offset = testInfo.pop("Offset")
-        sel_length = testInfo.pop("BinaryLen")
+    def getDataFromOffsets(self, testInfoList: list) -> list:
+        # use values extracted at loading if available, otherwise parse data on-the-fly
+        testDictList = [self.DatabaseFetcher.getTestValues_AllDUTs(testInfo) for testInfo in testInfoList]
+        # uncompressed file is decoded from its mmap, no bytes are read
+        mapped = self.std_handle.view()
+        fileSource = self.std_handle if mapped is None else mapped
+        parseList = []
+        for ind, (testInfo, testDict) in enumerate(zip(testInfoList, testDictList)):
+            sel_offset = testInfo.pop("Offset")
+            sel_length = testInfo.pop("BinaryLen")
+            if testDict is None:
+                pinCount = 0 if testInfo["RTN_ICNT"] is None else testInfo["RTN_ICNT"]
+                rsltCount = 0 if testInfo["RSLT_PGM_CNT"] is None else testInfo["RSLT_PGM_CNT"]
+                if testInfo["recHeader"] == REC.MPR:
+                    # pins of MPR are decoded when they are viewed
+                    reader = stdfMPRReader(pinCount, rsltCount, sel_offset, sel_length, fileSource)
+                    testDictList[ind] = {"MPRReader": reader, "dataList": reader.dataList, 
+                                         "statesList": reader.statesList, "flagList": reader.flagList}
+                else:
+                    parseList.append((testInfo["recHeader"], pinCount, rsltCount, sel_offset, sel_length))
+        # tests are read in one sweep of the file
+        parsedDicts = iter(stdf_Multi_Parser(parseList, fileSource, compact=self.settingParams.compactData))
+        return [self.formatTestDict(testInfo, next(parsedDicts) if testDict is None else testDict) 
+                for testInfo, testDict in zip(testInfoList, testDictList)]
+    
+    
+    def formatTestDict(self, testInfo: dict, testDict: dict) -> dict:
         recHeader = testInfo["recHeader"]
-        # parse data on-the-fly
+        if self.settingParams.compactData:
+            dataType, flagType, stateType = np.float32, np.int16, np.uint8
+        else:
+            dataType, flagType, stateType = float, int, int
         if recHeader == REC.MPR:
-            pinCount = 0 if testInfo["RTN_ICNT"] is None else testInfo["RTN_ICNT"]
-            rsltCount = 0 if testInfo["RSLT_PGM_CNT"] is None else testInfo["RSLT_PGM_CNT"]
-            testDict = stdf_MPR_Parser(recHeader, pinCount, rsltCount, sel_offset, sel_length, self.std_handle)
             pinInfoDict = self.DatabaseFetcher.getPinNames(testInfo["TEST_NUM"], testInfo["TEST_NAME"], "RTN")
             # if pmr in TestPin_Map is not found in Pin_Map, the following value in pinInfoDict is empty
             testDict["PMR_INDX"] = pinInfoDict["PMR"]
             testDict["LOG_NAM"] = pinInfoDict["LOG_NAM"]
             testDict["PHY_NAM"] = pinInfoDict["PHY_NAM"]
             testDict["CHAN_NAM"] = pinInfoDict["CHAN_NAM"]
-            testDict["statesList"] = np.array(testDict["statesList"], dtype=int)
+            if not "MPRReader" in testDict:
+                testDict["statesList"] = np.array(testDict["statesList"], dtype=stateType)
         else:
-            testDict = stdf_PFTR_Parser(recHeader, sel_offset, sel_length, self.std_handle)
             if recHeader == REC.FTR:
                 testDict["VECT_NAM"] = testInfo["VECT_NAM"] if testInfo["VECT_NAM"] is not None else "" 
         
@@ -2041,10 +2232,14 @@ class MyWindow(QtWidgets.QMainWindow):
         testDict["recHeader"] = recHeader
         testDict["TEST_NUM"] = testInfo["TEST_NUM"]
         testDict["TEST_NAME"] = testInfo["TEST_NAME"]
-        testDict["dataList"] = np.array(testDict["dataList"], dtype="float")
-        testDict["flagList"] = np.array(testDict["flagList"], dtype=int)
-                
-        testDict["dataList"] = testDict["dataList"] if recHeader == REC.FTR else testDict["dataList"] * 10 ** result_scale
+        testDict["flagList"] = np.array(testDict["flagList"], dtype=flagType)
+        if "MPRReader" in testDict:
+            # rows of pins are scaled when decoded
+            testDict["MPRReader"].setFormat(10 ** result_scale, dataType, stateType)
+        else:
+            testDict["dataList"] = np.array(testDict["dataList"], dtype=dataType)
+            # large scale factor promotes float32 data, cast it back
+            testDict["dataList"] = testDict["dataList"] if recHeader == REC.FTR else (testDict["dataList"] * 10 ** result_scale).astype(dataType, copy=False)
         testDict["LL"] = result_lolimit * 10 ** result_scale
         testDict["HL"] = result_hilimit * 10 ** result_scale
         testDict["LSpec"] = result_lospec * 10 ** result_scale
@@ -2078,14 +2273,25 @@ class MyWindow(QtWidgets.QMainWindow):
                 if (not pre_testID in testIDs) and (pre_testID in self.selData):
                     self.selData.pop(pre_testID)
                 
-        for testID in testIDs:
-            # skip if testID has been read
-            if testID in self.selData:
-                continue
-            
-            # read the newly selected test num
-            testInfo = self.DatabaseFetcher.getTestInfo_AllDUTs(testID)
-            self.selData[testID] = self.getDataFromOffsets(testInfo)
+        # skip if testID has been read
+        newTestIDs = [testID for testID in dict.fromkeys(testIDs) if testID not in self.selData]
+        if len(newTestIDs) == 0:
+            return
+        
+        # read the newly selected test nums
+        testInfoList = [self.DatabaseFetcher.getTestInfo_AllDUTs(testID) for testID in newTestIDs]
+        self.selData.update(zip(newTestIDs, self.getDataFromOffsets(testInfoList)))
+    
+    
+    def isTestDataRequired(self, testTuple) -> bool:
+        '''whether `isTestFail` reads test data, i.e. fail count in TSR is not enough'''
+        testID = (testTuple[0], testTuple[-1])
+        if testID in self.selData:
+            return False
+        if not testID in self.failCntDict:
+            return False
+        failCount = self.failCntDict[testID]
+        return failCount < 0 or (failCount == 0 and self.settingParams.checkCpk)
             
             
     def getData(self, testTuple:tuple, selectHeads:list = [], selectSites:list = [], selectDUTs: list = []):
@@ -3154,7 +3360,8 @@ class MyWindow(QtWidgets.QMainWindow):
     
     def callFileLoader(self, stdHandle):
         if stdHandle:
-            self.loader.loadFile(stdHandle.fpath)
+            self.loader.loadFile(stdHandle.fpath, eagerValues=self.settingParams.eagerValues, 
+                                 transcode=self.settingParams.transcodeCompressed, cacheLimit=self.settingParams.cacheLimitGB << 30)
 
         
     @Slot(bool)
@@ -3169,10 +3376,11 @@ class MyWindow(QtWidgets.QMainWindow):
                     self.stdHandleList[0].close()
             self.stdHandleList = [self.std_handle]
             self.DatabaseFetcher.closeDB()
-            databasePath = os.path.join(sys.rootFolder, "logs", "tmp.db")
-            os.replace(os.path.join(sys.rootFolder, "logs", "tmp_new.db"), databasePath)
-            self.DatabaseFetcher.connectDB(databasePath)
+            # database is kept in cache folder by loader
+            self.DatabaseFetcher.connectDB(self.loader.databasePath)
             self.dbConnected = True
+            if not self.std_handle.openTranscoded(self.loader.databasePath):
+                self.std_handle.importIndex(self.loader.databasePath)
             
             # get all MPR test numbers
             self.testRecTypeDict = self.DatabaseFetcher.getTestRecordTypeDict()
@@ -3275,10 +3483,6 @@ class MyWindow(QtWidgets.QMainWindow):
             self.std_handle.close()
             self.std_handle = self.stdHandleList[0]
             self.stdHandleList = [self.std_handle]
-            # delete tmp_new.db
-            tmp_new_path = os.path.join(sys.rootFolder, "logs", "tmp_new.db")
-            if os.path.exists(tmp_new_path):
-                os.remove(tmp_new_path)
 
     
     @Slot(str, bool, bool, bool)
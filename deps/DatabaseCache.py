@@ -0,0 +1,200 @@
+#
+# DatabaseCache.py - STDF Viewer
+#
+# Author: noonchen - chennoon233@foxmail.com
+# Created Date: October 17th 2026
+# -----
+# Last Modified: Sat Oct 17 2026
+# Modified By: noonchen
+# -----
+# Copyright (c) 2026 noonchen
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+import os, hashlib, sqlite3, logging
+from .cystdf import DB_SCHEMA_VERSION, OFFSET_MATRIX_SUFFIX, VALUE_MATRIX_SUFFIX, GZ_INDEX_SUFFIX, BZ_INDEX_SUFFIX, TRANSCODE_SUFFIX
+
+
+logger = logging.getLogger("STDF Viewer")
+
+SAMPLE_COUNT = 16           # number of blocks hashed from the stdf file
+SAMPLE_SIZE = 1 << 16       # bytes per block
+CACHE_LIMIT = 4 << 30       # total size of cached databases, in bytes
+# files written along with a database
+SIDECAR_SUFFIXES = (OFFSET_MATRIX_SUFFIX, VALUE_MATRIX_SUFFIX, GZ_INDEX_SUFFIX, BZ_INDEX_SUFFIX, TRANSCODE_SUFFIX)
+
+
+def fileFingerprint(filepath: str) -> str:
+    '''
+    return a hex key of the file from its path, size, mtime and
+    a hash of evenly spaced blocks, whole file is never read
+    '''
+    filepath = os.path.abspath(filepath)
+    st = os.stat(filepath)
+    h = hashlib.blake2b(digest_size=20)
+    h.update(f"{filepath}|{st.st_size}|{st.st_mtime_ns}".encode("utf-8", errors="surrogateescape"))
+    with open(filepath, "rb") as f:
+        if st.st_size <= SAMPLE_COUNT * SAMPLE_SIZE:
+            h.update(f.read())
+        else:
+            # first & last block are always included
+            step = (st.st_size - SAMPLE_SIZE) // (SAMPLE_COUNT - 1)
+            for i in range(SAMPLE_COUNT):
+                f.seek(i * step)
+                h.update(f.read(SAMPLE_SIZE))
+    return h.hexdigest()
+
+
+class DatabaseCache:
+    '''
+    Keeps parsed databases of stdf files in a folder, named by file fingerprint.
+
+    Databases are stamped with `DB_SCHEMA_VERSION` of cystdf, a stamp mismatch is
+    treated as a miss. Least recently used databases are removed when total size
+    exceeds `limit`.
+    '''
+    def __init__(self, folder: str, limit: int = CACHE_LIMIT):
+        self.folder = folder
+        self.limit = limit
+        os.makedirs(self.folder, exist_ok=True)
+
+
+    def dbPath(self, key: str) -> str:
+        return os.path.join(self.folder, key + ".db")
+
+
+    def tmpPath(self, key: str) -> str:
+        '''path for parser to write, the file is moved into cache by `store`'''
+        return os.path.join(self.folder, key + ".tmp")
+
+
+    def lookup(self, key: str, requireValues: bool = False, requireTranscode: bool = False):
+        '''
+        return cached database path, or None if missing or outdated. 
+        
+        if `requireValues`, database parsed without eagerValues is a miss, 
+        unless its matrices are skipped for sparsity. 
+        if `requireTranscode`, database without decompressed copy is a miss. 
+        databases stored aside by `store` are newer than `key.db`, they are checked first
+        '''
+        asides = sorted(self.asidePaths(key), key=os.path.getmtime, reverse=True)
+        for path in asides + [self.dbPath(key)]:
+            if self.isValid(path, requireValues, requireTranscode):
+                # mtime is used as last access time, atime is not reliable
+                os.utime(path)
+                return path
+        return None
+
+
+    def isValid(self, path: str, requireValues: bool, requireTranscode: bool) -> bool:
+        if not os.path.isfile(path):
+            return False
+        if requireValues and os.path.isfile(path + OFFSET_MATRIX_SUFFIX) and not os.path.isfile(path + VALUE_MATRIX_SUFFIX):
+            return False
+        if requireTranscode and not os.path.isfile(path + TRANSCODE_SUFFIX):
+            return False
+        try:
+            con = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+            try:
+                version = con.execute("PRAGMA user_version").fetchone()[0]
+            finally:
+                con.close()
+        except sqlite3.Error:
+            version = -1
+        if version != DB_SCHEMA_VERSION:
+            logger.info(f"Discard cached database of schema version {version}: {path}")
+            self.discard(path)
+            return False
+        return True
+
+
+    def store(self, key: str) -> str:
+        '''
+        stamp the database written in `tmpPath` and move it into cache, return its path. 
+        
+        if the old database of `key` is still opened (e.g. by the viewer on Windows) and 
+        cannot be replaced, the new one is stored aside as `key-N.db`
+        '''
+        tmp = self.tmpPath(key)
+        con = sqlite3.connect(tmp)
+        try:
+            con.execute(f"PRAGMA user_version = {DB_SCHEMA_VERSION:d}")
+        finally:
+            con.close()
+        path = self.dbPath(key)
+        # remove the old database and its sidecars, files in use are left
+        self.discard(path)
+        if any(os.path.exists(p) for p in self.entryFiles(path)):
+            path = self.asidePath(key)
+        else:
+            for aside in self.asidePaths(key):
+                self.discard(aside)
+        os.replace(tmp, path)
+        # move sidecars along with the database
+        for suffix in SIDECAR_SUFFIXES:
+            if os.path.isfile(tmp + suffix):
+                os.replace(tmp + suffix, path + suffix)
+        self.evict(keep=path)
+        return path
+
+
+    def entryFiles(self, path: str) -> tuple:
+        return (path, path + "-wal", path + "-shm") + tuple(path + suffix for suffix in SIDECAR_SUFFIXES)
+
+
+    def asidePaths(self, key: str) -> list:
+        '''databases of `key` stored aside of a database in use'''
+        return [os.path.join(self.folder, fn) for fn in os.listdir(self.folder) 
+                if fn.startswith(key + "-") and fn.endswith(".db")]
+
+
+    def asidePath(self, key: str) -> str:
+        n = 1
+        while any(os.path.exists(p) for p in self.entryFiles(self.dbPath(f"{key}-{n}"))):
+            n += 1
+        return self.dbPath(f"{key}-{n}")
+
+
+    def discard(self, path: str):
+        for p in self.entryFiles(path):
+            try:
+                os.remove(p)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                # in use on Windows
+                logger.warning(f"Cannot remove cached database: {repr(e)}")
+
+
+    def evict(self, keep: str = ""):
+        '''remove least recently used databases until total size is within limit'''
+        entries = []
+        for fn in os.listdir(self.folder):
+            path = os.path.join(self.folder, fn)
+            if fn.endswith(".db") and os.path.isfile(path):
+                st = os.stat(path)
+                size = st.st_size
+                for suffix in SIDECAR_SUFFIXES:
+                    if os.path.isfile(path + suffix):
+                        size += os.path.getsize(path + suffix)
+                entries.append((st.st_mtime, size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.limit:
+                break
+            if path == keep:
+                continue
+            self.discard(path)
+            if not os.path.exists(path):
+                total -= size
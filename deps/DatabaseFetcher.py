@@ -24,6 +24,15 @@
 
 import sqlite3
 import numpy as np
+from enum import IntEnum
+from .cystdf import loadOffsetMatrix, loadValueMatrix
+
+
+class REC(IntEnum):
+    '''Constants of STDF Records: typ<<8 | sub'''
+    PTR = 3850
+    FTR = 3860
+    MPR = 3855
 
 
 getStatus = lambda flag: "Pass" if flag & 0b00011000 == 0 else ("Failed" if flag & 0b00010000 == 0 else "Unknown")
@@ -49,6 +58,8 @@ class DatabaseFetcher:
         self.connection = None
         self.cursor = None
         self.completeDutArray = np.array([])
+        self.offsetMatrix = None    # memory-mapped (Offset, BinaryLen) of [TEST_ID, DUTIndex-1]
+        self.valueMatrix = None     # memory-mapped test values, only if parsed with eagerValues
     
     
     def connectDB(self, dataBasePath):
@@ -56,11 +67,16 @@ class DatabaseFetcher:
         self.connection = sqlite3.connect(dataBasePath)
         self.connection.text_factory = tryDecode
         self.cursor = self.connection.cursor()
+        # None if the sidecar is not written, e.g. too sparse
+        self.offsetMatrix = loadOffsetMatrix(dataBasePath)
+        self.valueMatrix = loadValueMatrix(dataBasePath)
         
     
     def closeDB(self):
         if not self.connection is None:
             self.connection.close()
+        self.offsetMatrix = None
+        self.valueMatrix = None
         
     
     def containsWafer(self):
@@ -290,6 +306,42 @@ class DatabaseFetcher:
         return statsDict
     
     
+    def getMatrixSlots(self, tid: int, shape: tuple):
+        '''return column index of all duts in a [TEST_ID, DUTIndex-1] matrix, None if the matrix does not cover them'''
+        if tid < shape[0] and 0 < self.completeDutArray.size and self.completeDutArray[-1] <= shape[1]:
+            if self.completeDutArray.size == shape[1]:
+                # all duts, no copy
+                return slice(None)
+            return self.completeDutArray - 1
+        return None
+    
+    
+    def getTestValues_AllDUTs(self, testInfo: dict):
+        '''
+        return values of all duts extracted at loading, with the same keys as stdf_PFTR_Parser / stdf_MPR_Parser, 
+        or None if the database is not parsed with eagerValues
+        '''
+        if self.valueMatrix is None: return None
+        
+        if self.completeDutArray.size == 0:
+            self.getDUT_SiteInfo()
+        tid = testInfo["TEST_ID"]
+        slots = self.getMatrixSlots(tid, self.valueMatrix["flagList"].shape)
+        if slots is None:
+            return None
+        
+        if testInfo["recHeader"] == REC.MPR:
+            if not tid in self.valueMatrix["MPR"]:
+                return None
+            rsltArray, statArray = self.valueMatrix["MPR"][tid]
+            return {"dataList": rsltArray[:, slots], 
+                    "statesList": statArray[:, slots], 
+                    "flagList": self.valueMatrix["flagList"][tid, slots]}
+        else:
+            return {"dataList": self.valueMatrix["dataList"][tid, slots], 
+                    "flagList": self.valueMatrix["flagList"][tid, slots]}
+    
+    
     def getTestInfo_AllDUTs(self, testID: tuple) -> dict:
         '''return test info of all duts in the database, including offsets and length in stdf file'''
         if self.cursor is None: raise RuntimeError("No database is connected")
@@ -306,11 +358,20 @@ class DatabaseFetcher:
         if self.completeDutArray.size == 0:
             self.getDUT_SiteInfo()
         
+        # slice offset & length from sidecar, -1 is already filled if testNum is not presented in a DUT
+        if self.offsetMatrix is not None:
+            offsetArray, lengthArray = self.offsetMatrix
+            slots = self.getMatrixSlots(testInfo["TEST_ID"], offsetArray.shape)
+            if slots is not None:
+                testInfo.update({"Offset": offsetArray[testInfo["TEST_ID"], slots], "BinaryLen": lengthArray[testInfo["TEST_ID"], slots]})
+                return testInfo
+        
         # get offset & length, insert -1 if testNum is not presented in a DUT
         tmpContainer = dict(zip( self.completeDutArray, [[-1, -1]]*(self.completeDutArray.size) ))
+        # Test_Offsets is clustered by (TEST_ID, DUTIndex), this is a range scan of one test
+        # dutIndex not in completeDutArray is ignored below
         sql = "SELECT DUTIndex, Offset, BinaryLen FROM Test_Offsets \
-            WHERE TEST_ID in (SELECT TEST_ID FROM Test_Info WHERE TEST_NUM=? AND TEST_NAME=?) AND \
-                    DUTIndex in (SELECT DUTIndex FROM Dut_Info) \
+            WHERE TEST_ID=(SELECT TEST_ID FROM Test_Info WHERE TEST_NUM=? AND TEST_NAME=?) \
             ORDER by DUTIndex"
         sqlResult = self.cursor.execute(sql, testID)
         
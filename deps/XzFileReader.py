@@ -0,0 +1,247 @@
+#
+# XzFileReader.py - STDF Viewer
+#
+# Author: noonchen - chennoon233@foxmail.com
+# Created Date: October 17th 2026
+# -----
+# Last Modified: Sat Oct 17 2026
+# Modified By: noonchen
+# -----
+# Copyright (c) 2026 noonchen
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+import io, os, lzma, zlib, struct
+from bisect import bisect_right
+from collections import OrderedDict
+
+
+WINDOW_SIZE = 1 << 20           # bytes of decompressed data per cached window
+CACHE_WINDOWS = 32              # windows kept in LRU cache
+INPUT_CHUNK = 1 << 16           # compressed bytes fed to lzma at a time
+
+XZ_MAGIC = b"\xfd7zXZ\x00"
+XZ_FOOTER_MAGIC = b"YZ"
+STREAM_HEADER_SIZE = 12
+STREAM_FOOTER = struct.Struct("<IIH2s")
+
+
+def _readVli(buf: bytes, pos: int):
+    '''decode a variable-length integer of xz, return value and next position'''
+    value = 0
+    for i in range(9):
+        byte = buf[pos + i]
+        value |= (byte & 0x7F) << (7 * i)
+        if not byte & 0x80:
+            return value, pos + i + 1
+    raise ValueError("Invalid integer in xz index")
+
+
+def _readBlocks(f, fileSize: int) -> list:
+    '''
+    return (compressed offset, compressed size, uncompressed size, stream header)
+    of every block from the indexes of xz streams, in file order
+    '''
+    streams = []
+    pos = fileSize
+    while pos > 0:
+        if pos < 2 * STREAM_HEADER_SIZE:
+            raise ValueError("Truncated xz file")
+        f.seek(pos - STREAM_FOOTER.size)
+        footer = f.read(STREAM_FOOTER.size)
+        crc, backwardSize, flags, magic = STREAM_FOOTER.unpack(footer)
+        if magic != XZ_FOOTER_MAGIC:
+            # stream padding is a multiple of 4 null bytes
+            if footer[-4:] == b"\x00" * 4:
+                pos -= 4
+                continue
+            raise ValueError("Invalid xz stream footer")
+        if zlib.crc32(footer[4:10]) != crc:
+            raise ValueError("Corrupted xz stream footer")
+        indexSize = (backwardSize + 1) * 4
+        indexStart = pos - STREAM_FOOTER.size - indexSize
+        if indexStart < STREAM_HEADER_SIZE:
+            raise ValueError("Invalid xz index size")
+        f.seek(indexStart)
+        index = f.read(indexSize)
+        if index[0] != 0 or zlib.crc32(index[:-4]) != struct.unpack("<I", index[-4:])[0]:
+            raise ValueError("Corrupted xz index")
+        count, p = _readVli(index, 1)
+        records = []
+        for _ in range(count):
+            unpadded, p = _readVli(index, p)
+            uncompressed, p = _readVli(index, p)
+            records.append(((unpadded + 3) & ~3, uncompressed))
+        streamStart = indexStart - sum(size for size, _ in records) - STREAM_HEADER_SIZE
+        if streamStart < 0:
+            raise ValueError("Invalid xz index records")
+        f.seek(streamStart)
+        header = f.read(STREAM_HEADER_SIZE)
+        if header[:6] != XZ_MAGIC or struct.unpack("<H", header[6:8])[0] != flags:
+            raise ValueError("Invalid xz stream header")
+        blocks = []
+        offset = streamStart + STREAM_HEADER_SIZE
+        for size, uncompressed in records:
+            blocks.append((offset, size, uncompressed, header))
+            offset += size
+        streams.append(blocks)
+        pos = streamStart
+    return [block for blocks in reversed(streams) for block in blocks]
+
+
+class _BlockDecoder:
+    '''decompressor of a xz block positioned at a window boundary'''
+    def __init__(self, block: int, header: bytes):
+        self.block = block
+        self.window = 0             # index of the next window in the block
+        self.cmpPos = 0             # compressed bytes of block read
+        self.decomp = lzma.LZMADecompressor(format=lzma.FORMAT_XZ)
+        # a block is decoded as the 1st block of its stream
+        self.decomp.decompress(header)
+
+
+class XzFileReader:
+    '''
+    Seekable reader of a xz file.
+
+    Every block is located by the indexes at the end of xz streams, a seek decompresses
+    from the start of the block containing it, instead of the start of file. Blocks are
+    decompressed by windows of `WINDOW_SIZE` bytes, recently used windows are kept in a
+    LRU cache. File without a valid index (e.g. legacy .lzma) falls back to the stream of lzma.
+    '''
+    def __init__(self, path: str, cacheWindows: int = CACHE_WINDOWS):
+        self.path = path
+        self.pos = 0
+        self.stream = None
+        self.cacheWindows = max(cacheWindows, 1)
+        self.cache = OrderedDict()      # (block, window) -> data
+        self.decoder = None             # decompressor after the last window decoded
+        self.fh = open(path, "rb")
+        try:
+            blocks = _readBlocks(self.fh, os.fstat(self.fh.fileno()).st_size)
+        except (ValueError, IndexError, struct.error):
+            blocks = None
+        if blocks is None:
+            self.fh.close()
+            self.fh = None
+            self.stream = lzma.open(path, "rb")
+            self.size = self.stream.seek(0, io.SEEK_END)
+            self.stream.seek(0)
+            return
+        # empty blocks hold no data to seek
+        self.blocks = [block for block in blocks if block[2] > 0]
+        self.blockStarts = []
+        self.size = 0
+        for block in self.blocks:
+            self.blockStarts.append(self.size)
+            self.size += block[2]
+
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        if self.stream:
+            self.pos = self.stream.seek(offset, whence)
+            return self.pos
+        if whence == io.SEEK_SET:
+            pos = offset
+        elif whence == io.SEEK_CUR:
+            pos = self.pos + offset
+        elif whence == io.SEEK_END:
+            pos = self.size + offset
+        else:
+            raise ValueError(f"Invalid whence ({whence})")
+        if pos < 0:
+            raise ValueError(f"Negative seek position {pos}")
+        self.pos = pos
+        return self.pos
+
+
+    def tell(self) -> int:
+        return self.pos
+
+
+    def read(self, numBytes: int = -1) -> bytes:
+        if self.stream:
+            data = self.stream.read(numBytes)
+            self.pos += len(data)
+            return data
+        end = self.size if numBytes is None or numBytes < 0 else min(self.pos + numBytes, self.size)
+        chunks = []
+        pos = self.pos
+        while pos < end:
+            block = bisect_right(self.blockStarts, pos) - 1
+            window, start = divmod(pos - self.blockStarts[block], WINDOW_SIZE)
+            data = self.getWindow(block, window)
+            chunk = data[start:start + end - pos]
+            if not chunk:
+                # block is shorter than its index record
+                break
+            chunks.append(chunk)
+            pos += len(chunk)
+        data = b"".join(chunks)
+        self.pos += len(data)
+        return data
+
+
+    def close(self):
+        if self.stream:
+            self.stream.close()
+        if self.fh:
+            self.fh.close()
+        self.cache.clear()
+        self.decoder = None
+
+
+    def getWindow(self, block: int, window: int) -> bytes:
+        data = self.cache.get((block, window))
+        if data is not None:
+            self.cache.move_to_end((block, window))
+            return data
+        decoder = self.decoder
+        if decoder is None or decoder.block != block or decoder.window > window:
+            decoder = self.decoder = _BlockDecoder(block, self.blocks[block][3])
+        while True:
+            data = self.decodeWindow(decoder)
+            self.putWindow((block, decoder.window - 1), data)
+            if decoder.window > window or len(data) < WINDOW_SIZE:
+                return data if decoder.window - 1 == window else b""
+
+
+    def decodeWindow(self, decoder: _BlockDecoder) -> bytes:
+        '''decompress next window of the block, shorter only at the end of block'''
+        offset, size, uncompressed, _ = self.blocks[decoder.block]
+        remain = min(WINDOW_SIZE, uncompressed - decoder.window * WINDOW_SIZE)
+        chunks = []
+        decomp = decoder.decomp
+        while remain > 0 and not decomp.eof:
+            data = b""
+            if decomp.needs_input:
+                if decoder.cmpPos >= size:
+                    break
+                self.fh.seek(offset + decoder.cmpPos)
+                data = self.fh.read(min(INPUT_CHUNK, size - decoder.cmpPos))
+                if not data:
+                    break
+                decoder.cmpPos += len(data)
+            out = decomp.decompress(data, remain)
+            chunks.append(out)
+            remain -= len(out)
+        decoder.window += 1
+        return b"".join(chunks)
+
+
+    def putWindow(self, key: tuple, data: bytes):
+        self.cache[key] = data
+        self.cache.move_to_end(key)
+        while len(self.cache) > self.cacheWindows:
+            self.cache.popitem(last=False)
@@ -0,0 +1,217 @@
+#
+# ZipMemberReader.py - STDF Viewer
+#
+# Author: noonchen - chennoon233@foxmail.com
+# Created Date: October 17th 2026
+# -----
+# Last Modified: Sat Oct 17 2026
+# Modified By: noonchen
+# -----
+# Copyright (c) 2026 noonchen
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+
+import io, zlib, struct, zipfile
+from bisect import bisect_right
+from collections import OrderedDict
+
+
+WINDOW_SIZE = 1 << 20           # bytes of decompressed data per cached window
+CACHE_WINDOWS = 32              # windows kept in LRU cache
+CHECKPOINT_SPACING = 1 << 23    # decompressed bytes between checkpoints, multiple of WINDOW_SIZE
+INPUT_CHUNK = 1 << 14           # compressed bytes fed to zlib at a time, also held by every checkpoint
+
+LOCAL_HEADER = struct.Struct("<4s22sHH")
+LOCAL_HEADER_SIGNATURE = b"PK\x03\x04"
+
+
+class _Inflater:
+    '''raw deflate decompressor positioned at a window boundary'''
+    def __init__(self, decomp, window: int, cmpPos: int):
+        self.decomp = decomp
+        self.window = window        # index of the next window to produce
+        self.cmpPos = cmpPos        # compressed bytes read from member, excluding decomp.unconsumed_tail
+
+    def copy(self):
+        return _Inflater(self.decomp.copy(), self.window, self.cmpPos)
+
+
+class ZipMemberReader:
+    '''
+    Seekable reader of the first member of a zip file.
+
+    Deflated member is decompressed by windows of `WINDOW_SIZE` bytes, recently used windows are
+    kept in a LRU cache. Decompressor state is saved as a checkpoint every `CHECKPOINT_SPACING` bytes
+    during the first sequential pass, a seek backwards resumes from the nearest checkpoint instead of
+    the start of member. Stored member is read directly, other compression methods fall back to the
+    stream of zipfile.
+    '''
+    def __init__(self, path: str, cacheWindows: int = CACHE_WINDOWS, spacing: int = CHECKPOINT_SPACING):
+        self.path = path
+        self.zipObj = zipfile.ZipFile(path, "r")
+        try:
+            if len(self.zipObj.namelist()) == 0:
+                raise OSError("Empty zip file detected")
+            # open the 1st file in zip, ignore the rest
+            self.info = self.zipObj.filelist[0]
+            if self.info.file_size == 0:
+                raise OSError(f"The first item in the zip is not a file: \n{self.info.filename}")
+        except Exception:
+            self.zipObj.close()
+            raise
+        self.size = self.info.file_size
+        self.pos = 0
+        self.stream = None
+        self.fh = None
+        self.cacheWindows = max(cacheWindows, 1)
+        self.windowsPerCheckpoint = max(spacing // WINDOW_SIZE, 1)
+        self.cache = OrderedDict()
+        self.checkpointWindows = []     # sorted window index of checkpoints
+        self.checkpoints = []
+        self.frontier = None            # decompressor at the end of first pass
+        self.cursor = None              # decompressor after the last window decoded from a checkpoint
+
+        encrypted = self.info.flag_bits & 0x1
+        if not encrypted and self.info.compress_type in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED):
+            self.fh = open(path, "rb")
+            self.fh.seek(self.info.header_offset)
+            signature, _, nameLen, extraLen = LOCAL_HEADER.unpack(self.fh.read(LOCAL_HEADER.size))
+            if signature != LOCAL_HEADER_SIGNATURE:
+                self.close()
+                raise OSError(f"Bad local file header in zip: \n{self.info.filename}")
+            self.dataOffset = self.info.header_offset + LOCAL_HEADER.size + nameLen + extraLen
+            if self.info.compress_type == zipfile.ZIP_DEFLATED:
+                self.frontier = _Inflater(zlib.decompressobj(-zlib.MAX_WBITS), 0, 0)
+                self.addCheckpoint(self.frontier)
+        else:
+            self.stream = self.zipObj.open(self.info, "r", force_zip64=True)
+
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        if self.stream:
+            self.pos = self.stream.seek(offset, whence)
+            return self.pos
+        if whence == io.SEEK_SET:
+            pos = offset
+        elif whence == io.SEEK_CUR:
+            pos = self.pos + offset
+        elif whence == io.SEEK_END:
+            pos = self.size + offset
+        else:
+            raise ValueError(f"Invalid whence ({whence})")
+        if pos < 0:
+            raise ValueError(f"Negative seek position {pos}")
+        self.pos = pos
+        return self.pos
+
+
+    def tell(self) -> int:
+        return self.pos
+
+
+    def read(self, numBytes: int = -1) -> bytes:
+        if self.stream:
+            data = self.stream.read(numBytes)
+            self.pos += len(data)
+            return data
+        end = self.size if numBytes is None or numBytes < 0 else min(self.pos + numBytes, self.size)
+        if end <= self.pos:
+            return b""
+        if self.frontier is None:
+            # stored member
+            self.fh.seek(self.dataOffset + self.pos)
+            data = self.fh.read(end - self.pos)
+        else:
+            chunks = []
+            pos = self.pos
+            while pos < end:
+                window, start = divmod(pos, WINDOW_SIZE)
+                data = self.getWindow(window)
+                chunk = data[start:start + end - pos]
+                if not chunk:
+                    # member is shorter than declared
+                    break
+                chunks.append(chunk)
+                pos += len(chunk)
+            data = b"".join(chunks)
+        self.pos += len(data)
+        return data
+
+
+    def close(self):
+        if self.stream:
+            self.stream.close()
+        if self.fh:
+            self.fh.close()
+        self.zipObj.close()
+        self.cache.clear()
+        self.checkpoints.clear()
+        self.checkpointWindows.clear()
+        self.frontier = self.cursor = None
+
+
+    def getWindow(self, window: int) -> bytes:
+        data = self.cache.get(window)
+        if data is not None:
+            self.cache.move_to_end(window)
+            return data
+        if window >= self.frontier.window:
+            inflater = self.frontier
+        else:
+            # resume from the last decoded window if it is not farther than the nearest checkpoint
+            i = bisect_right(self.checkpointWindows, window) - 1
+            if self.cursor is not None and self.checkpointWindows[i] <= self.cursor.window <= window:
+                inflater = self.cursor
+            else:
+                inflater = self.checkpoints[i].copy()
+            self.cursor = inflater
+        while True:
+            data = self.inflateWindow(inflater)
+            self.putWindow(inflater.window - 1, data)
+            if inflater is self.frontier and inflater.window % self.windowsPerCheckpoint == 0:
+                self.addCheckpoint(inflater)
+            if inflater.window > window or len(data) < WINDOW_SIZE:
+                return data if inflater.window - 1 == window else b""
+
+
+    def inflateWindow(self, inflater: _Inflater) -> bytes:
+        '''decompress next window of inflater, shorter only at the end of member'''
+        chunks = []
+        remain = WINDOW_SIZE
+        decomp = inflater.decomp
+        while remain > 0 and not decomp.eof:
+            data = decomp.unconsumed_tail
+            if not data:
+                self.fh.seek(self.dataOffset + inflater.cmpPos)
+                data = self.fh.read(min(INPUT_CHUNK, self.info.compress_size - inflater.cmpPos))
+                if not data:
+                    break
+                inflater.cmpPos += len(data)
+            out = decomp.decompress(data, remain)
+            chunks.append(out)
+            remain -= len(out)
+        inflater.window += 1
+        return b"".join(chunks)
+
+
+    def putWindow(self, window: int, data: bytes):
+        self.cache[window] = data
+        self.cache.move_to_end(window)
+        while len(self.cache) > self.cacheWindows:
+            self.cache.popitem(last=False)
+
+
+    def addCheckpoint(self, inflater: _Inflater):
+        self.checkpointWindows.append(inflater.window)
+        self.checkpoints.append(inflater.copy())
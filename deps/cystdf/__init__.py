@@ -24,14 +24,26 @@
 
 
 
+import struct, threading
 import numpy as np
+from collections import OrderedDict
 try:
     from . import _cystdf
 except ImportError as e:
     e.msg = "cystdf module should be built before running STDF-Viewer"
     raise
 
-__all__ = ["stdfDataRetriever", "stdfRecordAnalyzer", "stdf_PFTR_Parser", "stdf_MPR_Parser", "setByteSwap"]
+__all__ = ["stdfDataRetriever", "stdfRecordAnalyzer", "stdf_PFTR_Parser", "stdf_MPR_Parser", "stdf_Multi_Parser", "stdfMPRReader", "setByteSwap", "loadOffsetMatrix", 
+           "loadValueMatrix", "DB_SCHEMA_VERSION", "OFFSET_MATRIX_SUFFIX", "VALUE_MATRIX_SUFFIX", "GZ_INDEX_SUFFIX", 
+           "BZ_INDEX_SUFFIX", "loadBzipIndex", "TRANSCODE_SUFFIX", "isCompressed", "PREFETCH_TESTS"]
+
+DB_SCHEMA_VERSION = _cystdf.DB_SCHEMA_VERSION
+OFFSET_MATRIX_SUFFIX = _cystdf.OFFSET_MATRIX_SUFFIX
+VALUE_MATRIX_SUFFIX = _cystdf.VALUE_MATRIX_SUFFIX
+GZ_INDEX_SUFFIX = _cystdf.GZ_INDEX_SUFFIX
+BZ_INDEX_SUFFIX = _cystdf.BZ_INDEX_SUFFIX
+TRANSCODE_SUFFIX = _cystdf.TRANSCODE_SUFFIX
+isCompressed = _cystdf.isCompressed
 
 class stdfDataRetriever(_cystdf.stdfDataRetriever):
     pass
@@ -47,5 +59,162 @@ def stdf_MPR_Parser(recHeader:int, pinCount:int, rsltCount:int, offsetArray:np.n
     '''For MPR only, keys: {dataList, statesList, flagList}'''
     return _cystdf.parseMPR_rawList(recHeader, pinCount, rsltCount, offsetArray, lengthArray, file_handle)
 
+def stdf_Multi_Parser(testList:list, file_handle, compact:bool=False) -> list:
+    '''
+    For PTR, FTR & MPR of many tests, read in one sweep of the file. 
+    testList: [(recHeader, pinCount, rsltCount, offsetArray, lengthArray)], 
+    return dicts in the same order, keys are the same as stdf_PFTR_Parser / stdf_MPR_Parser. 
+    compact: return float32 dataList, int16 flagList & uint8 statesList instead of float64 & int64. 
+    file_handle: seekable file, or a buffer of the whole file (e.g. mmap) that records are decoded from in place
+    '''
+    return _cystdf.parseRawLists(testList, file_handle, compact)
+
+PREFETCH_TESTS = 100    # tests passed to stdf_Multi_Parser in one sweep of the stdf file
+
+MPR_CACHE_PINS = 16    # decoded pins kept by stdfMPRReader
+
+class _PinRows:
+    '''rows of RTN_RSLT or RTN_STAT indexed by pin, decoded on access'''
+    def __init__(self, reader, count:int, isStates:bool):
+        self.reader = reader
+        self.count = count
+        self.isStates = isStates
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index:int) -> np.ndarray:
+        if not 0 <= index < self.count:
+            raise IndexError(f"Pin index {index} out of range")
+        return self.reader.getPin(index)[1 if self.isStates else 0]
+
+class stdfMPRReader:
+    '''
+    RTN_RSLT & RTN_STAT of a MPR test decoded by pin on demand, instead of all pins at once.
+
+    Positions of RTN_STAT & RTN_RSLT in every record are located once from the fields before them, 
+    a pin then reads only its own bytes of the records. The layout (10 bytes per record) is kept 
+    if `keepLayout`, otherwise it is located again for every pin. Up to `cachePins` decoded pins 
+    are kept. `dataList` and `statesList` can be indexed by pin like the arrays of stdf_MPR_Parser, 
+    results are multiplied by `scale` and converted to `dataType`, states to `stateType`.
+    '''
+    def __init__(self, pinCount:int, rsltCount:int, offsetArray:np.ndarray, lengthArray:np.ndarray, file_handle, 
+                 keepLayout:bool=True, cachePins:int=MPR_CACHE_PINS):
+        self.offsetArray = np.ascontiguousarray(offsetArray, dtype=np.int64)
+        self.lengthArray = None if keepLayout else np.ascontiguousarray(lengthArray, dtype=np.int32)
+        self.file_handle = file_handle
+        self.flagList, layout = _cystdf.locateMPR_rawList(self.offsetArray, np.ascontiguousarray(lengthArray, dtype=np.int32), file_handle)
+        self.layout = layout if keepLayout else None
+        self.cachePins = max(cachePins, 1)
+        self.cache = OrderedDict()      # pin -> (results, states)
+        self.lock = threading.Lock()
+        self.scale = 1
+        self.dataType = np.float32
+        self.stateType = np.uint8
+        self.dataList = _PinRows(self, rsltCount, False)
+        self.statesList = _PinRows(self, pinCount, True)
+
+    def setFormat(self, scale, dataType, stateType):
+        '''set scale and dtypes of rows, decoded rows are dropped'''
+        with self.lock:
+            self.scale = scale
+            self.dataType = dataType
+            self.stateType = stateType
+            self.cache.clear()
+
+    def getPin(self, pin:int) -> tuple:
+        '''return (results, states) of the pin'''
+        with self.lock:
+            rows = self.cache.get(pin)
+            if rows is not None:
+                self.cache.move_to_end(pin)
+                return rows
+            layout = self.layout
+            if layout is None:
+                _, layout = _cystdf.locateMPR_rawList(self.offsetArray, self.lengthArray, self.file_handle)
+            results, states = _cystdf.parseMPR_pinRow(pin, self.offsetArray, layout, self.file_handle)
+            # scaled in dataType as the viewer does for other tests, large scale factor promotes float32, cast it back
+            results = (results.astype(self.dataType, copy=False) * self.scale).astype(self.dataType, copy=False)
+            rows = (results, states.astype(self.stateType, copy=False))
+            self.cache[pin] = rows
+            while len(self.cache) > self.cachePins:
+                self.cache.popitem(last=False)
+            return rows
+
 def setByteSwap(swapOn:bool):
-    _cystdf.setByteSwap(swapOn)
\ No newline at end of file
+    _cystdf.setByteSwap(swapOn)
+
+def loadOffsetMatrix(dbPath:str):
+    '''Map the offset matrix sidecar of dbPath, return (Offset, BinaryLen) arrays of shape [TEST_ID, DUTIndex-1], or None if unavailable'''
+    matrixPath = dbPath + _cystdf.OFFSET_MATRIX_SUFFIX
+    headerSize = _cystdf.OFFSET_MATRIX_HEADER
+    magic = _cystdf.OFFSET_MATRIX_MAGIC
+    try:
+        with open(matrixPath, "rb") as f:
+            header = f.read(len(magic) + 8)
+            fileSize = f.seek(0, 2)
+    except OSError:
+        return None
+    if len(header) < len(magic) + 8 or header[:len(magic)] != magic:
+        return None
+    testCount, dutCount = struct.unpack("=II", header[len(magic):])
+    cellCount = testCount * dutCount
+    if fileSize != headerSize + 12 * cellCount:
+        return None
+    # copy-on-write mapping, parsers require writable buffers, file is never modified
+    offsetArray = np.memmap(matrixPath, dtype=np.int64, mode="c", offset=headerSize, shape=(testCount, dutCount))
+    lengthArray = np.memmap(matrixPath, dtype=np.int32, mode="c", offset=headerSize + 8 * cellCount, shape=(testCount, dutCount))
+    return (offsetArray, lengthArray)
+
+def loadValueMatrix(dbPath:str):
+    '''
+    Map the value sidecar of dbPath written with eagerValues, return None if unavailable, or a dict of
+    {dataList: float32 & flagList: int16 arrays of shape [TEST_ID, DUTIndex-1], 
+     MPR: {TEST_ID: (RTN_RSLT float32 array of shape [rsltCount, DUTIndex-1], RTN_STAT uint8 array of shape [pinCount, DUTIndex-1])}}
+    '''
+    matrixPath = dbPath + _cystdf.VALUE_MATRIX_SUFFIX
+    headerSize = _cystdf.VALUE_MATRIX_HEADER
+    magic = _cystdf.VALUE_MATRIX_MAGIC
+    try:
+        with open(matrixPath, "rb") as f:
+            header = f.read(len(magic) + 12)
+            fileSize = f.seek(0, 2)
+    except OSError:
+        return None
+    if len(header) < len(magic) + 12 or header[:len(magic)] != magic:
+        return None
+    testCount, dutCount, mprCount = struct.unpack("=III", header[len(magic):])
+    flagOffset, dirOffset, blockOffset = _cystdf.valueMatrixSections(testCount, dutCount, mprCount)
+    if fileSize < blockOffset:
+        return None
+    # arrays are copied by viewer, read-only mapping is enough
+    directory = np.fromfile(matrixPath, dtype=np.int64, count=4 * mprCount, offset=dirOffset).reshape(mprCount, 4)
+    mprDict = {}
+    for tid, pinCount, rsltCount, offset in directory.tolist():
+        if offset < blockOffset or offset + (4 * rsltCount + pinCount) * dutCount > fileSize:
+            return None
+        rsltArray = np.memmap(matrixPath, dtype=np.float32, mode="r", offset=offset, shape=(rsltCount, dutCount))
+        statArray = np.memmap(matrixPath, dtype=np.uint8, mode="r", offset=offset + 4 * rsltCount * dutCount, shape=(pinCount, dutCount))
+        mprDict[tid] = (rsltArray, statArray)
+    dataArray = np.memmap(matrixPath, dtype=np.float32, mode="r", offset=headerSize, shape=(testCount, dutCount))
+    flagArray = np.memmap(matrixPath, dtype=np.int16, mode="r", offset=flagOffset, shape=(testCount, dutCount))
+    return {"dataList": dataArray, "flagList": flagArray, "MPR": mprDict}
+
+def loadBzipIndex(dbPath:str):
+    '''Read the bzip2 index sidecar of dbPath, return {bit offset: uncompressed offset} of blocks, or None if unavailable'''
+    indexPath = dbPath + _cystdf.BZ_INDEX_SUFFIX
+    headerSize = _cystdf.BZ_INDEX_HEADER
+    magic = _cystdf.BZ_INDEX_MAGIC
+    try:
+        with open(indexPath, "rb") as f:
+            header = f.read(len(magic) + 4)
+            fileSize = f.seek(0, 2)
+    except OSError:
+        return None
+    if len(header) < len(magic) + 4 or header[:len(magic)] != magic:
+        return None
+    count, = struct.unpack("=I", header[len(magic):])
+    if fileSize != headerSize + 16 * count:
+        return None
+    blocks = np.fromfile(indexPath, dtype=np.int64, count=2 * count, offset=headerSize).reshape(count, 2)
+    return dict(blocks.tolist())
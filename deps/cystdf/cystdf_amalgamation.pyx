@@ -27,6 +27,8 @@
 
 
 
+import os
+import struct
 import logging
 import platform
 import numpy as np
@@ -37,6 +39,7 @@ cimport numpy as cnp
 cimport cython
 from cython.view cimport array as cyarray
 from cython.parallel import prange
+from cpython.buffer cimport PyObject_CheckBuffer
 
 from includes.pthread cimport *
 from hashmap_src.hashmap_libc cimport *
@@ -86,24 +89,102 @@ ctypedef struct header:
     uint8_t     rec_sub
 
 # minimun unit represents a record
+# rawData points into the slab payload when read from stream, 
+# or into the file mapping in mmap mode
 ctypedef struct recData:
     uint16_t        recHeader
     uint64_t        offset
     unsigned char*  rawData
     uint16_t        binaryLen
 
-# queue element
+# test record decoded by a chunk worker, 
+# ids are local to the chunk and renumbered by the summarizer
+ctypedef struct trInfo:
+    int32_t     localID         # index in worker's testIDMap, -1 if not decoded
+    uint32_t    localDut        # n-th PIR of the chunk, 0 if head/site is opened in a previous chunk
+    uint32_t    TEST_NUM
+    float       LO_LIMIT
+    float       HI_LIMIT
+    uint8_t     HEAD_NUM
+    uint8_t     SITE_NUM
+    uint8_t     OPT_FLAG
+
+# slab capacity
+cdef enum:
+    SLAB_RECORDS    = 4096          # max records per slab
+    SLAB_PAYLOAD    = 1 << 18       # bytes of raw data per slab, must be larger than max record length (65535)
+    QUEUE_BYTES     = 1 << 25       # default memory budget of the parse queue
+
+# rows of Test_Offsets_Staging inserted by one statement, 4 variables per row,
+# must be within SQLITE_MAX_VARIABLE_NUMBER (999 before sqlite 3.32)
+cdef enum:
+    TR_BATCH_ROWS   = 200
+
+# records selected in the viewer are read in file order, 
+# ranges apart by no more than RAW_READ_GAP bytes are merged into a read of up to RAW_READ_SPAN bytes
+cdef enum:
+    RAW_READ_GAP    = 1 << 16
+    RAW_READ_SPAN   = 1 << 23
+
+# records of many tests are read and decoded in batches of about RAW_BATCH_BYTES
+cdef enum:
+    RAW_BATCH_BYTES = 1 << 28
+
+# a MPR pin reads a few bytes per record, ranges are merged only within PIN_READ_GAP bytes, 
+# MPR_FIXED_BYTES is the size of fields before RTN_STAT
+cdef enum:
+    PIN_READ_GAP    = 1 << 12
+    MPR_FIXED_BYTES = 12
+
+# bzip2 and xz blocks are decompressed by a thread pool at ingest, 
+# as many threads as IndexedBzip2File of the viewer
+cdef enum:
+    DECOMPRESS_THREADS  = 4
+
+ctypedef struct trRow:
+    uint32_t    DUTIndex
+    int         TEST_ID
+    uint64_t    offset
+    uint16_t    binaryLen
+
+# queue element, a slab of records
 ctypedef struct dataCluster:
-    STDERR      error
-    OPT         operation
-    recData*    pData
+    STDERR          error
+    OPT             operation
+    uint32_t        count           # number of records in recs
+    uint32_t        used            # bytes used in payload
+    bint            decoded         # tr is filled by a chunk worker
+    recData         recs[SLAB_RECORDS]
+    trInfo          tr[SLAB_RECORDS]
+    unsigned char   payload[SLAB_PAYLOAD]
 
 # arg struct
 ctypedef struct parse_arg:
     void*           filename
+    stdf_mapping*   mapping     # NULL or unmapped for stream reading
     tsQueue*        q
     bint*           p_needByteSwap
     bint*           stopFlag
+    gz_index*       gzIndex     # NULL or seek points to record while inflating gzip
+    bz_index*       bzIndex     # NULL or block offsets to record while decompressing bzip2
+    int             threads     # threads decompressing bzip2 or xz
+    void*           copyPath    # NULL or path to save decompressed data of a compressed file
+    STDERR          copyStatus  # STD_OK if the copy is complete up to where parsing stopped
+
+# thread-local tables of a chunk worker
+ctypedef struct chunkDecoder:
+    testIDMap*      idMap
+    map_t           headSite    # key: head<<8 | site, value: localDut
+    uint32_t        dutCount
+    bint            failed      # stop decoding if tables are incomplete
+
+# arg struct of a chunk worker, chunk is [start, end) of the mapped file
+ctypedef struct chunk_arg:
+    const stdf_mapping* mapping
+    uint64_t        start
+    uint64_t        end
+    tsQueue*        q
+    bint*           stopFlag
 
 # *** end of typedefs for stdIO *** #
 
@@ -111,96 +192,123 @@ ctypedef struct parse_arg:
 ###########################
 # *** funcs for stdIO *** #
 ###########################
-cdef STDERR check_endian(STDF* std, bint* p_needByteSwap) nogil:
-    cdef header hData
-    if std.fops.stdf_read(std, &hData, sizeof(hData)) == STD_OK:
-        if hData.rec_typ == 0 and hData.rec_sub == 10:
-            if hData.rec_len == 2:
-                p_needByteSwap[0] = False
-            elif hData.rec_len == 512:
-                p_needByteSwap[0] = True
-            else:
-                # not a stdf
-                return INVAILD_STDF
-            return STD_OK
+cdef STDERR check_FAR_header(header* hData, bint* p_needByteSwap) nogil:
+    if hData.rec_typ == 0 and hData.rec_sub == 10:
+        if hData.rec_len == 2:
+            p_needByteSwap[0] = False
+        elif hData.rec_len == 512:
+            p_needByteSwap[0] = True
         else:
             # not a stdf
             return INVAILD_STDF
+        return STD_OK
+    else:
+        # not a stdf
+        return INVAILD_STDF
+
+
+cdef STDERR check_endian(STDF* std, bint* p_needByteSwap) nogil:
+    cdef header hData
+    if stdf_read(std, &hData, sizeof(hData)) == STD_OK:
+        return check_FAR_header(&hData, p_needByteSwap)
     else:
         # read file failed
         return OS_FAIL
 
 
+cdef STDERR check_endian_mapped(const stdf_mapping* m, bint* p_needByteSwap) nogil:
+    cdef header hData
+    if m.size >= sizeof(hData):
+        memcpy(&hData, m.base, sizeof(hData))
+        return check_FAR_header(&hData, p_needByteSwap)
+    else:
+        return INVAILD_STDF
+
+
+cdef inline bint isValidRecord(uint16_t recHeader) nogil:
+    return (recHeader == REC_MIR or recHeader == REC_WCR or recHeader == REC_WIR or recHeader == REC_WRR or
+            recHeader == REC_PTR or recHeader == REC_FTR or recHeader == REC_MPR or recHeader == REC_TSR or
+            recHeader == REC_PIR or recHeader == REC_PRR or recHeader == REC_HBR or recHeader == REC_SBR or 
+            recHeader == REC_PCR or recHeader == REC_PMR or recHeader == REC_PGR or recHeader == REC_PLR or
+            recHeader == REC_MRR or recHeader == REC_DTR or recHeader == REC_GDR or recHeader == REC_EPS or
+            recHeader == REC_BPS or recHeader == REC_SDR or recHeader == REC_RDR or recHeader == REC_ATR or
+            recHeader == REC_FAR)
+
+
+cdef inline dataCluster* flush_slab(tsQueue* q, dataCluster* slab) nogil:
+    # send slab to consumer, empty slab is returned to the queue's free list
+    if slab != NULL:
+        if slab.count > 0:
+            slab.operation = PARSE
+            message_queue_write(q, slab)
+        else:
+            message_queue_message_free(q, slab)
+    return NULL
+
+
+cdef inline void send_finish(tsQueue* q, dataCluster* slab, STDERR error) nogil:
+    # records in the pending slab must be delivered before FINISH
+    flush_slab(q, slab)
+    cdef dataCluster *ele = <dataCluster*>message_queue_message_alloc_blocking(q)
+    ele.error = error
+    ele.count = 0
+    ele.operation = FINISH
+    message_queue_write(q, ele)
+
+
+cdef inline dataCluster* new_slab(tsQueue* q) nogil:
+    # slabs are pre-allocated by the queue and recycled by message_queue_message_free
+    cdef dataCluster *slab = <dataCluster*>message_queue_message_alloc_blocking(q)
+    slab.error = STD_OK
+    slab.count = 0
+    slab.used = 0
+    slab.decoded = False
+    return slab
+
+
 cdef void get_offset(STDF* std, tsQueue* q, bint* p_needByteSwap, bint* stopFlag) nogil:
     cdef header hData
+    cdef STDERR status
     cdef uint16_t recHeader
     cdef uint64_t offset = 0
-    cdef dataCluster *ele
+    cdef dataCluster *slab = NULL
+    cdef recData *rec
 
     while True:
         # check stop signal from main thread
         if stopFlag != NULL:
             if stopFlag[0]:
-                ele = <dataCluster*>message_queue_message_alloc_blocking(q)
-                ele.error = TERMINATE
-                ele.operation = FINISH
-                message_queue_write(q, ele)
+                send_finish(q, slab, TERMINATE)
                 break
         
-        if std.fops.stdf_read(std, &hData, sizeof(hData)) == STD_OK:
+        status = stdf_read(std, &hData, sizeof(hData))
+        if status == STD_OK:
             recHeader = MAKE_REC(hData.rec_typ, hData.rec_sub)
             offset += sizeof(hData)  # manually advanced by sizeof header
             # swap if byte order is different
             if p_needByteSwap[0]:
                 SwapBytes(&hData.rec_len, sizeof(uint16_t))
 
-            if (recHeader == REC_MIR or recHeader == REC_WCR or recHeader == REC_WIR or recHeader == REC_WRR or
-                recHeader == REC_PTR or recHeader == REC_FTR or recHeader == REC_MPR or recHeader == REC_TSR or
-                recHeader == REC_PIR or recHeader == REC_PRR or recHeader == REC_HBR or recHeader == REC_SBR or 
-                recHeader == REC_PCR or recHeader == REC_PMR or recHeader == REC_PGR or recHeader == REC_PLR or
-                recHeader == REC_MRR or recHeader == REC_DTR or recHeader == REC_GDR or recHeader == REC_EPS or
-                recHeader == REC_BPS or recHeader == REC_SDR or recHeader == REC_RDR or recHeader == REC_ATR or
-                recHeader == REC_FAR):
-                # get binaryLen and read rawData
-                # alloc memory
-                ele = <dataCluster*>message_queue_message_alloc_blocking(q)
-                ele.pData = <recData*>malloc(sizeof(recData))
-                if ele.pData != NULL:
-                    ele.pData.rawData = <unsigned char*>malloc(hData.rec_len)
-                    if ele.pData.rawData != NULL:
-                        # read rawData
-                        if std.fops.stdf_read(std, ele.pData.rawData, hData.rec_len) == STD_OK:
-                            # send to queue
-                            # ele.pData.rawData[hData.rec_len] = b'\0'  # no need for add NULL at the end, length is record
-                            ele.pData.recHeader = recHeader
-                            ele.pData.offset = offset
-                            ele.pData.binaryLen = hData.rec_len
-                            ele.operation = PARSE
-                            message_queue_write(q, ele)
-                            offset += hData.rec_len  # manually advanced by length of raw data
-                        else:
-                            # end of file
-                            free(ele.pData.rawData)
-                            free(ele.pData)
-                            ele.pData = NULL
-                            ele.error = STD_EOF
-                            ele.operation = FINISH
-                            message_queue_write(q, ele)
-                            break
-                    else:
-                        free(ele.pData.rawData)
-                        free(ele.pData)
-                        ele.pData   = NULL
-                        ele.error   = NO_MEMORY
-                        ele.operation     = FINISH
-                        message_queue_write(q, ele)
-                        break
+            if isValidRecord(recHeader):
+                # start a new slab if current one cannot hold this record
+                if slab == NULL or slab.count == SLAB_RECORDS or slab.used + hData.rec_len > SLAB_PAYLOAD:
+                    flush_slab(q, slab)
+                    slab = new_slab(q)
+                # read rawData into the slab payload
+                rec = &slab.recs[slab.count]
+                rec.rawData = &slab.payload[slab.used]
+                status = stdf_read(std, rec.rawData, hData.rec_len)
+                if status == STD_OK:
+                    # no need for add NULL at the end, length is record
+                    rec.recHeader = recHeader
+                    rec.offset = offset
+                    rec.binaryLen = hData.rec_len
+                    slab.count += 1
+                    slab.used += hData.rec_len
+                    offset += hData.rec_len  # manually advanced by length of raw data
                 else:
-                    free(ele.pData)
-                    ele.pData   = NULL
-                    ele.error   = NO_MEMORY
-                    ele.operation     = FINISH
-                    message_queue_write(q, ele)
+                    # end of file, or error of decompression
+                    send_finish(q, slab, status)
                     break
                 
             else:
@@ -209,19 +317,172 @@ cdef void get_offset(STDF* std, tsQueue* q, bint* p_needByteSwap, bint* stopFlag
                 # offset += hData.rec_len  # manually advanced by length of raw data
 
                 # since we read all record types now, in this case means unexpected record types
-                ele = <dataCluster*>message_queue_message_alloc_blocking(q)
-                ele.error = INVAILD_STDF
-                ele.operation = FINISH
-                message_queue_write(q, ele)
+                send_finish(q, slab, INVAILD_STDF)
                 break
         else:
-            # end of file
-            ele = <dataCluster*>message_queue_message_alloc_blocking(q)
-            ele.error = STD_EOF
-            ele.operation = FINISH
-            message_queue_write(q, ele)
+            # end of file, or error of decompression
+            send_finish(q, slab, status)
+            break
+
+
+cdef void decode_record(chunkDecoder* dec, uint16_t recHeader, const unsigned char* rawData, uint16_t binaryLen, trInfo* info) nogil:
+    # resolve test id and dut index of a TR within the chunk, 
+    # summarizer only has to map them to global ids
+    cdef TR_PEEK peek
+    cdef uint32_t dut
+
+    info.localID = -1
+    info.localDut = 0
+    if dec.failed:
+        return
+
+    if recHeader == REC_PIR:
+        # HEAD_NUM & SITE_NUM are U1, 0 if omitted
+        dec.dutCount += 1
+        if MAP_OK != hashmap_put(dec.headSite, 
+                                 (rawData[0] if binaryLen > 0 else 0)<<8 | (rawData[1] if binaryLen > 1 else 0), 
+                                 dec.dutCount):
+            dec.failed = True
+
+    elif recHeader == REC_PTR or recHeader == REC_MPR or recHeader == REC_FTR:
+        peek_TR(recHeader, rawData, binaryLen, &peek)
+        info.localID = getTestID(dec.idMap, peek.TEST_NUM, peek.TEST_TXT)
+        if info.localID < 0:
+            # negative if failed, summarizer will parse it by itself
+            info.localID = insertTestItem(dec.idMap, peek.TEST_NUM, peek.TEST_TXT)
+        if MAP_OK == hashmap_get(dec.headSite, peek.HEAD_NUM<<8 | peek.SITE_NUM, &dut):
+            info.localDut = dut
+        info.TEST_NUM = peek.TEST_NUM
+        info.HEAD_NUM = peek.HEAD_NUM
+        info.SITE_NUM = peek.SITE_NUM
+        info.OPT_FLAG = peek.OPT_FLAG
+        info.LO_LIMIT = peek.LO_LIMIT
+        info.HI_LIMIT = peek.HI_LIMIT
+
+
+cdef void get_offset_mapped(const stdf_mapping* m, uint64_t start, uint64_t end, tsQueue* q, 
+                            bint* p_needByteSwap, bint* stopFlag, chunkDecoder* dec) nogil:
+    # same as get_offset, but rawData points to the mapped pages directly,
+    # no copy & no allocation per record, slab payload is unused.
+    # records in [start, end) are read, TRs are decoded as well if dec is not NULL
+    cdef header hData
+    cdef uint16_t recHeader
+    cdef uint64_t offset = start
+    cdef dataCluster *slab = NULL
+    cdef recData *rec
+
+    while True:
+        # check stop signal from main thread
+        if stopFlag != NULL:
+            if stopFlag[0]:
+                send_finish(q, slab, TERMINATE)
+                break
+        
+        if offset + sizeof(hData) <= end:
+            memcpy(&hData, m.base + offset, sizeof(hData))
+            recHeader = MAKE_REC(hData.rec_typ, hData.rec_sub)
+            offset += sizeof(hData)
+            if p_needByteSwap[0]:
+                SwapBytes(&hData.rec_len, sizeof(uint16_t))
+
+            if isValidRecord(recHeader):
+                if offset + hData.rec_len <= end:
+                    if slab == NULL or slab.count == SLAB_RECORDS:
+                        flush_slab(q, slab)
+                        slab = new_slab(q)
+                        slab.decoded = (dec != NULL)
+                    rec = &slab.recs[slab.count]
+                    rec.recHeader = recHeader
+                    rec.offset = offset
+                    rec.rawData = <unsigned char*>(m.base + offset)
+                    rec.binaryLen = hData.rec_len
+                    if dec != NULL:
+                        decode_record(dec, recHeader, rec.rawData, rec.binaryLen, &slab.tr[slab.count])
+                    slab.count += 1
+                    offset += hData.rec_len
+                else:
+                    # truncated record at the end of file
+                    send_finish(q, slab, STD_EOF)
+                    break
+            else:
+                send_finish(q, slab, INVAILD_STDF)
+                break
+        else:
+            # end of file or chunk
+            send_finish(q, slab, STD_EOF)
+            break
+
+
+cdef int split_chunks(const stdf_mapping* m, int n, uint64_t* bounds) nogil:
+    # split mapped file into at most n chunks by a header-only scan, 
+    # a chunk starts at a PIR or WIR when no part is under test, so that 
+    # workers can number duts locally. bounds has n+1 items, returns chunk count
+    cdef header hData
+    cdef uint16_t recHeader
+    cdef uint64_t offset = 0
+    cdef int k = 1, openDut = 0
+
+    bounds[0] = 0
+    while k < n and offset + sizeof(hData) <= m.size:
+        memcpy(&hData, m.base + offset, sizeof(hData))
+        recHeader = MAKE_REC(hData.rec_typ, hData.rec_sub)
+        if needByteSwap:
+            SwapBytes(&hData.rec_len, sizeof(uint16_t))
+        if not isValidRecord(recHeader):
+            # leave the rest to the last chunk, worker will report the error
             break
 
+        if recHeader == REC_PIR or recHeader == REC_WIR:
+            if openDut == 0 and offset >= (m.size // n) * k:
+                bounds[k] = offset
+                k += 1
+        if recHeader == REC_PIR:
+            openDut += 1
+        elif recHeader == REC_PRR and openDut > 0:
+            openDut -= 1
+        offset += sizeof(hData) + hData.rec_len
+    bounds[k] = m.size
+    return k
+
+
+cdef void* parse_chunk(void* input_args) nogil:
+    cdef chunk_arg* args = <chunk_arg*>input_args
+    cdef chunkDecoder dec
+    
+    dec.idMap = createTestIDMap()
+    dec.headSite = hashmap_new(8)
+    dec.dutCount = 0
+    # without local tables, records are sent as is
+    dec.failed = (dec.idMap == NULL or dec.headSite == NULL)
+    get_offset_mapped(args.mapping, args.start, args.end, args.q, &needByteSwap, args.stopFlag, &dec)
+    destoryTestIDMap(dec.idMap)
+    hashmap_free(dec.headSite)
+    return NULL
+
+
+cdef int slabsOfBytes(uint64_t nbytes) nogil:
+    # largest power of 2 slabs that fit in nbytes, 
+    # queue rounds depth up to power of 2, so round down here to stay in budget
+    cdef uint64_t cnt = nbytes // sizeof(dataCluster)
+    cdef int depth = 2
+    while <uint64_t>depth * 2 <= cnt and depth < (1 << 20):
+        depth *= 2
+    return depth
+
+
+cdef void drain_queue(tsQueue* q) nogil:
+    # discard slabs until parser finished, 
+    # otherwise parser may be blocked forever on a full queue
+    cdef dataCluster* item
+    while True:
+        item = <dataCluster*>message_queue_read(q)
+        if item == NULL:
+            break
+        if item.operation == FINISH:
+            message_queue_message_free(q, item)
+            break
+        message_queue_message_free(q, item)
+
 
 cdef void* parse(void* input_args) nogil:
     cdef parse_arg* args = <parse_arg*>input_args
@@ -236,6 +497,19 @@ cdef void* parse(void* input_args) nogil:
     cdef STDERR status, status_reopen
     cdef dataCluster *ele = <dataCluster*>message_queue_message_alloc_blocking(q)
 
+    if args.mapping != NULL and args.mapping.base != NULL:
+        # file is mapped by the caller, read records from memory
+        status = check_endian_mapped(args.mapping, p_needByteSwap)
+        if status == STD_OK:
+            ele.operation     = SET_ENDIAN
+            message_queue_write(q, ele)
+            get_offset_mapped(args.mapping, 0, args.mapping.size, q, p_needByteSwap, stopFlag, NULL)
+        else:
+            ele.error   = status
+            ele.operation     = FINISH
+            message_queue_write(q, ele)
+        return NULL
+
     status = stdf_open(&std, args.filename)
 
     if status != STD_OK:
@@ -243,6 +517,11 @@ cdef void* parse(void* input_args) nogil:
         ele.operation     = FINISH
         message_queue_write(q, ele)
     else:
+        stdf_set_gz_index(std, args.gzIndex)
+        stdf_set_bz_index(std, args.bzIndex)
+        stdf_set_threads(std, args.threads)
+        if args.copyPath != NULL:
+            args.copyStatus = stdf_set_copy(std, args.copyPath)
         status = check_endian(std, p_needByteSwap)
         status_reopen = stdf_reopen(std)
         if status == STD_OK and status_reopen == STD_OK:
@@ -251,6 +530,8 @@ cdef void* parse(void* input_args) nogil:
             message_queue_write(q, ele)
             # start parsing file
             get_offset(std, q, p_needByteSwap, stopFlag)
+            if args.copyPath != NULL and args.copyStatus == STD_OK:
+                args.copyStatus = stdf_finish_copy(std)
         else:
             ele.error   = status
             ele.operation     = FINISH
@@ -261,18 +542,86 @@ cdef void* parse(void* input_args) nogil:
 # *** end of funcs for stdIO *** #
 
 
+def readVli(bytes buf, int pos):
+    '''decode a variable-length integer of xz, return value and next position'''
+    value = 0
+    for i in range(9):
+        byte = buf[pos + i]
+        value |= (byte & 0x7F) << (7 * i)
+        if not byte & 0x80:
+            return value, pos + i + 1
+    raise ValueError("Invalid integer in xz index")
+
+
+def xzDataSize(pyfh):
+    '''
+    uncompressed size of a xz file, summed from the indexes at the end of its streams, 
+    or the size in the header of a legacy lzma file. None if not recorded
+    '''
+    pyfh.seek(0)
+    head = pyfh.read(13)
+    if head[:6] != b"\xfd7zXZ\x00":
+        # legacy lzma, all bits set if size is unknown
+        if len(head) == 13 and head[5:13] != b"\xff" * 8:
+            return int.from_bytes(head[5:13], "little")
+        return None
+    total = 0
+    pos = pyfh.seek(0, 2)
+    try:
+        while pos > 0:
+            if pos < 24:
+                return None
+            pyfh.seek(pos - 12)
+            footer = pyfh.read(12)
+            if footer[10:12] != b"YZ":
+                # stream padding is a multiple of 4 null bytes
+                if footer[8:12] == b"\x00" * 4:
+                    pos -= 4
+                    continue
+                return None
+            indexSize = (int.from_bytes(footer[4:8], "little") + 1) * 4
+            indexStart = pos - 12 - indexSize
+            if indexStart < 12:
+                return None
+            pyfh.seek(indexStart)
+            index = pyfh.read(indexSize)
+            if index[0] != 0:
+                return None
+            count, p = readVli(index, 1)
+            blockBytes = 0
+            for _ in range(count):
+                unpadded, p = readVli(index, p)
+                uncompressed, p = readVli(index, p)
+                blockBytes += (unpadded + 3) & ~3
+                total += uncompressed
+            pos = indexStart - blockBytes - 12
+            if pos < 0:
+                return None
+    except (ValueError, IndexError):
+        return None
+    return total
+
+
 cdef uint64_t getFileSize(str filepath) except *:
     cdef uint64_t fsize = 0
+    cdef str ext = os.path.splitext(filepath)[1].lower()
+
+    if ext in (".xz", ".lzma") and not stdf_xz_supported():
+        raise NotImplementedError("cystdf is built without liblzma, xz & lzma files are not supported")
 
     pyfh = open(filepath, "rb")
 
-    if filepath.endswith(".gz"):
+    if ext == ".gz":
         # for gzip, read last 4 bytes as filesize
         pyfh.seek(-4, 2)
         fsize = <uint64_t>(int.from_bytes(pyfh.read(4), "little"))
-    elif filepath.endswith(".zip"):
+    elif ext == ".zip":
         with zipfile.ZipFile(filepath, "r") as zipObj:
             fsize = <uint64_t>(zipObj.filelist[0].file_size)
+    elif ext in (".xz", ".lzma"):
+        # exact size from xz indexes, compressed size if it is not recorded
+        dataSize = xzDataSize(pyfh)
+        fsize = <uint64_t>(dataSize if dataSize is not None else pyfh.seek(0, 2))
     else:
         # bzip file size is not known before uncompressing, return compressed file size instead
         fsize = <uint64_t>(pyfh.seek(0, 2))
@@ -339,26 +688,38 @@ def analyzeSTDF(str filepath, QSignal=None, QSignalPgs=None, flag=None):
     cdef tsQueue    q
     cdef pthread_t  th
     cdef dataCluster* item
+    cdef recData* rec
+    cdef uint32_t i
     cdef uint32_t totalRecord = 0
     cdef void* pRec = NULL
     cdef uint8_t HEAD_NUM, SITE_NUM
     cdef uint16_t preRecHeader = 0
     cdef int recCnt = 0, dutCnt = 0, waferCnt = 0
+    cdef stdf_mapping mapping
 
     # init queue
-    message_queue_init(&q, sizeof(dataCluster), 1024*8)
+    message_queue_init(&q, sizeof(dataCluster), slabsOfBytes(QUEUE_BYTES))
     # args for parser
     cdef parse_arg args
     args.filename = _filepath
+    # read from mapped pages if possible, fallback to stream reading
+    stdf_map(&mapping, _filepath)
+    args.mapping = &mapping
     args.q = &q
     args.p_needByteSwap = &needByteSwap
     args.stopFlag = &stopFlag
+    args.gzIndex = NULL
+    args.bzIndex = NULL
+    args.threads = DECOMPRESS_THREADS
+    args.copyPath = NULL
 
     pthread_create(&th, NULL, parse, <void*>&args)
 
     while True:
         if flag is not None and flag.stop:
             (&stopFlag)[0] = <bint>flag.stop
+            with nogil:
+                drain_queue(&q)
             break
         
         item = <dataCluster*>message_queue_read(&q)
@@ -377,9 +738,10 @@ def analyzeSTDF(str filepath, QSignal=None, QSignalPgs=None, flag=None):
                     resultLog += tmpRes + "\n"
                     
             elif item.operation == PARSE:
-                if item.pData:
-                    if (item.pData.recHeader == REC_PIR or item.pData.recHeader == REC_WIR or
-                        item.pData.recHeader == REC_PRR or item.pData.recHeader == REC_WRR):
+                for i in range(item.count):
+                    rec = &item.recs[i]
+                    if (rec.recHeader == REC_PIR or rec.recHeader == REC_WIR or
+                        rec.recHeader == REC_PRR or rec.recHeader == REC_WRR):
                         if recCnt != 0 and preRecHeader != 0:
                             # print previous result
                             tmpRes = "%s"%rec_name.get(preRecHeader, "") + " × %d"%recCnt if recCnt else ""
@@ -387,56 +749,56 @@ def analyzeSTDF(str filepath, QSignal=None, QSignalPgs=None, flag=None):
                                 QSignal.emit(tmpRes)
                             else:
                                 resultLog += tmpRes + "\n"
-                            
+                        
                         # write PXR and WXR right now, since we need to print head number of site number
-                        parse_record(&pRec, item.pData.recHeader, item.pData.rawData, item.pData.binaryLen)
-                        if item.pData.recHeader == REC_PIR:
+                        parse_record(&pRec, rec.recHeader, rec.rawData, rec.binaryLen)
+                        if rec.recHeader == REC_PIR:
                             dutCnt += 1
                             HEAD_NUM = (<PIR*>pRec).HEAD_NUM
                             SITE_NUM = (<PIR*>pRec).SITE_NUM
-                            tmpRes = "[%d] %s"%(dutCnt, rec_name.get(item.pData.recHeader, "")) + f" (HEAD: {HEAD_NUM}, SITE: {SITE_NUM})"
+                            tmpRes = "[%d] %s"%(dutCnt, rec_name.get(rec.recHeader, "")) + f" (HEAD: {HEAD_NUM}, SITE: {SITE_NUM})"
                             if isValidSignal:
                                 QSignal.emit(tmpRes)
                             else:
                                 resultLog += tmpRes + "\n"
                             if isValidProgressSignal:
-                                currentProgress = (100 * item.pData.offset) // fileSize
+                                currentProgress = (100 * rec.offset) // fileSize
                                 if currentProgress > previousProgress:
                                     QSignalPgs.emit(currentProgress)
-                            
-                        elif item.pData.recHeader == REC_WIR:
+                        
+                        elif rec.recHeader == REC_WIR:
                             waferCnt += 1
                             HEAD_NUM = (<WIR*>pRec).HEAD_NUM
-                            tmpRes = "%s"%rec_name.get(item.pData.recHeader, "") + f" (HEAD: {HEAD_NUM})"
+                            tmpRes = "%s"%rec_name.get(rec.recHeader, "") + f" (HEAD: {HEAD_NUM})"
                             if isValidSignal:
                                 QSignal.emit(tmpRes)
                             else:
                                 resultLog += tmpRes + "\n"
-                            
-                        elif item.pData.recHeader == REC_PRR:
+                        
+                        elif rec.recHeader == REC_PRR:
                             HEAD_NUM    = (<PRR*>pRec).HEAD_NUM
                             SITE_NUM    = (<PRR*>pRec).SITE_NUM
-                            tmpRes = "%s"%rec_name.get(item.pData.recHeader, "") + f" (HEAD: {HEAD_NUM}, SITE: {SITE_NUM})"
+                            tmpRes = "%s"%rec_name.get(rec.recHeader, "") + f" (HEAD: {HEAD_NUM}, SITE: {SITE_NUM})"
                             if isValidSignal:
                                 QSignal.emit(tmpRes)
                             else:
                                 resultLog += tmpRes + "\n"
-                            
+                        
                         else:
                             HEAD_NUM = (<WRR*>pRec).HEAD_NUM
-                            tmpRes = "%s"%rec_name.get(item.pData.recHeader, "") + f" (HEAD: {HEAD_NUM})"
+                            tmpRes = "%s"%rec_name.get(rec.recHeader, "") + f" (HEAD: {HEAD_NUM})"
                             if isValidSignal:
                                 QSignal.emit(tmpRes)
                             else:
                                 resultLog += tmpRes + "\n"
-                            
-                        free_record(item.pData.recHeader, pRec)
+                        
+                        free_record(rec.recHeader, pRec)
                         # reset preheader to 0, in order to print every PXR WXR
                         preRecHeader = 0
                         recCnt = 0
-                        
+                    
                     else:
-                        if preRecHeader != item.pData.recHeader:
+                        if preRecHeader != rec.recHeader:
                             # print previous cnt
                             if preRecHeader != 0:
                                 tmpRes = "%s"%rec_name.get(preRecHeader, "") + " × %d"%recCnt if recCnt else ""
@@ -444,16 +806,14 @@ def analyzeSTDF(str filepath, QSignal=None, QSignalPgs=None, flag=None):
                                     QSignal.emit(tmpRes)
                                 else:
                                     resultLog += tmpRes + "\n"
-                                
+                            
                             # update new
-                            preRecHeader = item.pData.recHeader
+                            preRecHeader = rec.recHeader
                             recCnt = 1
                         else:
                             recCnt += 1
 
                     totalRecord += 1
-                    free(item.pData.rawData)
-                free(item.pData)
             else:
                 if recCnt != 0 and preRecHeader != 0:
                     # print last record
@@ -495,6 +855,7 @@ def analyzeSTDF(str filepath, QSignal=None, QSignalPgs=None, flag=None):
     pthread_join(th, NULL)
     pthread_kill(th, 0)
     message_queue_destroy(&q)
+    stdf_unmap(&mapping)
     tmpRes = ""
     tmpRes += "\nTotal wafers: %d"%waferCnt
     tmpRes += "\nTotal duts/dies: %d"%dutCnt
@@ -515,8 +876,11 @@ def analyzeSTDF(str filepath, QSignal=None, QSignalPgs=None, flag=None):
 ##################################
 NPINT = int
 NPFLOAT = float
-ctypedef cnp.int_t NPINT_t
-ctypedef cnp.float_t NPFLOAT_t
+# records are decoded into compact dtypes, the same as the value sidecar, 
+# R4 values and byte-wide flags are kept without loss, int16 flag holds -1 for not tested
+NPFLOAT_COMPACT = np.float32
+NPFLAG_COMPACT = np.int16
+NPSTATE_COMPACT = np.uint8
 cdef bint* p_needByteSwap = &needByteSwap
 cdef bint py_needByteSwap = False
 
@@ -527,182 +891,444 @@ def setByteSwap(bint ON_OFF):
     py_needByteSwap = ON_OFF
 
 
-@cython.boundscheck(False) # turn off bounds-checking for entire function
-@cython.wraparound(False)  # turn off negative index wrapping for entire function
-cdef int32_t max(int32_t[:] inputArray) nogil:
-    cdef int i
-    cdef Py_ssize_t size = inputArray.shape[0]
-    cdef int32_t result = inputArray[0]
+cdef object rawView(object file_handle):
+    '''bytes view of `file_handle` if it exposes the buffer protocol (e.g. mmap of the file), otherwise None'''
+    if PyObject_CheckBuffer(file_handle):
+        return memoryview(file_handle).cast("B")
+    return None
 
-    for i in range(size):
-        if inputArray[i] > result:
-            result = inputArray[i]
 
-    return result
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef void readRawRanges(int64_t[::1] offsets, int32_t[::1] lengths, int64_t[::1] dests, unsigned char[::1] rawData, object file_handle, 
+                        int64_t maxGap = RAW_READ_GAP) except *:
+    '''
+    copy record i to rawData[dests[i]:], length of records that cannot be read are set to -1.
+
+    buffer (e.g. mmap) is copied from memory, uncompressed file is read by `stdf_read_ranges` 
+    without GIL, compressed handles are read in python, in file order
+    '''
+    cdef Py_ssize_t i, k, cnt = offsets.shape[0]
+    cdef int fd = -1
+    cdef STDERR status = NO_MEMORY
+    cdef const unsigned char[::1] tmpData
+    cdef const unsigned char[::1] mapped
+    cdef int64_t[::1] order
+
+    if cnt == 0:
+        return
+
+    view = rawView(file_handle)
+    if view is not None:
+        mapped = view
+        with nogil:
+            for i in range(cnt):
+                if offsets[i] < 0 or offsets[i] + lengths[i] > mapped.shape[0]:
+                    # cut by end of buffer
+                    lengths[i] = -1
+                elif lengths[i] > 0:
+                    memcpy(&rawData[dests[i]], &mapped[offsets[i]], lengths[i])
+        return
+
+    try:
+        fd = file_handle.fileno()
+    except (AttributeError, OSError):
+        # compressed handles have no file descriptor
+        fd = -1
+
+    if fd >= 0:
+        with nogil:
+            status = stdf_read_ranges(fd, &offsets[0], &lengths[0], cnt, &rawData[0], &dests[0], maxGap, RAW_READ_SPAN)
+        if status == STD_OK:
+            return
+
+    # seek forward only, decompressors restart from a checkpoint on backward seeks
+    order = np.argsort(offsets, kind="stable").astype(np.int64)
+    for k in range(cnt):
+        i = order[k]
+        file_handle.seek(offsets[i])
+        tmpData = file_handle.read(lengths[i])
+        if tmpData.shape[0] != lengths[i]:
+            # cut by end of file
+            lengths[i] = -1
+        elif lengths[i] > 0:
+            rawData[dests[i]:dests[i] + lengths[i]] = tmpData
+
+
+ctypedef struct rawTest:
+    uint16_t        recHeader
+    uint16_t        pinCount
+    uint16_t        rsltCount
+    Py_ssize_t      cnt         # number of duts, row size of the outputs
+    float*          data        # [rsltCount, cnt] for MPR, [cnt] otherwise
+    int16_t*        flag        # [cnt]
+    uint8_t*        states      # [pinCount, cnt], MPR only
+
+
+cdef inline void decodeMPRRecord(rawTest* t, Py_ssize_t i, const unsigned char* rawData, uint16_t binaryLen) nogil:
+    '''write TEST_FLG, RTN_STAT & RTN_RSLT of a MPR into the ith column of outputs'''
+    cdef Py_ssize_t j
+    cdef int infType
+    cdef float value
+    cdef MPR_LAYOUT layout
+
+    locate_MPR(rawData, binaryLen, &layout)
+    t.flag[i] = layout.TEST_FLG
+    for j in range(min(t.pinCount, layout.STAT_CNT)):
+        t.states[j * t.cnt + i] = decode_N1(&rawData[layout.STAT_POS], j)
+
+    for j in range(min(t.rsltCount, layout.RSLT_CNT)):
+        # results cut by end of record are 0
+        value = decode_R4(&rawData[layout.RSLT_POS + sizeof(float) * j]) if j < layout.RSLT_AVAIL else 0
+        infType = isinf(value)
+        if infType > 0:
+            value = FLT_MAX
+        elif infType < 0:
+            value = FLT_MIN
+        t.data[j * t.cnt + i] = value
 
 
 @cython.boundscheck(False)
 @cython.wraparound(False)
-def parsePFTR_rawList(uint16_t recHeader, int64_t[:] offsetArray, int32_t[:] lengthArray, object file_handle):
-    if recHeader != REC_PTR and recHeader != REC_FTR:
-        raise TypeError("This function is for parsering PTR & FTR only")
+cdef void decodeRawRecords(rawTest* tests, int32_t[::1] recTest, int64_t[::1] recCol, 
+                           int64_t[::1] dests, int32_t[::1] lengths, const unsigned char* rawData) nogil:
+    '''decode record r at rawData + dests[r] into the outputs of its test'''
+    cdef Py_ssize_t r, i, cnt = recTest.shape[0]
+    cdef int infType
+    cdef rawTest* t
+    cdef uint8_t testFlag
+    cdef float result
+
+    for r in prange(cnt):
+        if lengths[r] >= 0:
+            t = &tests[recTest[r]]
+            i = recCol[r]
+
+            if t.recHeader == REC_PTR or t.recHeader == REC_FTR:
+                # fixed fields are decoded in place, no record is allocated, 
+                # assignments make them thread private in prange
+                testFlag = 0
+                result = 0
+                decode_TR(t.recHeader, rawData + dests[r], lengths[r], &testFlag, &result)
+                t.flag[i] = testFlag
+                if t.recHeader == REC_FTR:
+                    t.data[i] = <float>testFlag
+                else:
+                    infType = isinf(result)
+                    if infType > 0:
+                        # replace +inf with max float
+                        t.data[i] = FLT_MAX
+                    elif infType < 0:
+                        # replace -inf with min float
+                        t.data[i] = FLT_MIN
+                    else:
+                        t.data[i] = result
 
-    cdef int i, infType
-    cdef void* pRec
-    cdef Py_ssize_t cnt = offsetArray.shape[0]
-    cdef int32_t maxL = max(lengthArray)
-
-    # data containers & views for nogil operation
-    cdef cnp.ndarray[NPFLOAT_t, ndim=1] dataList = np.full(cnt, NAN, dtype=NPFLOAT)
-    cdef cnp.ndarray[NPINT_t, ndim=1] flagList = np.zeros(cnt, dtype=NPINT)
-    cdef NPFLOAT_t [:] dataList_view = dataList
-    cdef NPINT_t   [:] flagList_view = flagList
-
-    if maxL < 0:
-        # no valid result
-        return {"dataList":dataList, "flagList":flagList}
-
-    # memoryView to store raw bytes from file
-    cdef const unsigned char[:,:] rawDataView = cyarray(shape = (cnt, maxL),
-                                                        itemsize = sizeof(unsigned char),
-                                                        format="B")
-    # c-contiguous view for accepting bytes from read()
-    cdef const unsigned char[::1] tmpData = cyarray(shape = (maxL,),
-                                                    itemsize = sizeof(unsigned char),
-                                                    format="B")
-
-    # output dict
-    cdef dict testDict = {}
-    
-    # read raw data
-    for i in range(cnt):
-        if offsetArray[i] < 0 or lengthArray[i] < 0:
-            # rawDataView[i, :] = b'\0'    # represent invalid rawData
-            lengthArray[i] = -1
+            else:
+                decodeMPRRecord(t, i, rawData + dests[r], lengths[r])
 
-        else:
-            file_handle.seek(offsetArray[i])
-            # we need to append extra bytes at the end of tmpData if maxL > lengthArray[i]
-            # otherwise the size mismatch error would be raised by the later copy process
-            tmpData = file_handle.read(lengthArray[i]) + b'\0' * (maxL - lengthArray[i])
-            rawDataView[i, :] = tmpData
 
-    # set C extern variable to the value from python side
-    global p_needByteSwap, py_needByteSwap
-    p_needByteSwap[0] = py_needByteSwap
-    # parse raw bytes
-    for i in prange(cnt, nogil=True):
-        if lengthArray[i] < 0:
-            dataList_view[i] = NAN
-            flagList_view[i] = -1
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def parseRawLists(list testList, object file_handle, bint compact = False):
+    '''
+    parse PTR, FTR & MPR of many tests in one sweep of the file.
+
+    `testList` contains tuples of (recHeader, pinCount, rsltCount, offsetArray, lengthArray), 
+    pinCount & rsltCount are ignored for PTR & FTR. Records of all tests are read in file order 
+    and decoded in one parallel loop, in batches of about RAW_BATCH_BYTES. If `file_handle` is a 
+    buffer (e.g. mmap of the file), records are decoded in place and nothing is read. 
+    Return a list of dicts, the same as `parsePFTR_rawList` / `parseMPR_rawList`, 
+    arrays are float32, int16 & uint8 if `compact`, otherwise float64 & int64
+    '''
+    cdef Py_ssize_t ti, k, i, r, n, nTests = len(testList)
+    cdef Py_ssize_t batchStart, batchEnd
+    cdef int64_t batchBytes, rawPos, mapSize = 0
+    cdef cnp.ndarray validMask
+    cdef uint16_t recHeader, pinCount, rsltCount
+    cdef int64_t[:] offsetArray
+    cdef int32_t[:] lengthArray
+    cdef cnp.ndarray dataList, flagList, statesList
+    cdef rawTest* tests = NULL
+    cdef int64_t[::1] offsets, dests, recCol
+    cdef int32_t[::1] lengths, recTest
+    cdef unsigned char[::1] rawData
+    cdef const unsigned char[::1] mapped
+    cdef const unsigned char* rawBase = NULL
+    cdef bint isMapped
+
+    cdef list results = []
+    cdef list validCnts = []
+    cdef list validBytes = []
+
+    for recHeader, pinCount, rsltCount, offsetArray, lengthArray in testList:
+        if recHeader != REC_PTR and recHeader != REC_FTR and recHeader != REC_MPR:
+            raise TypeError("This function is for parsering PTR, FTR & MPR only")
+        n = offsetArray.shape[0]
+        if lengthArray.shape[0] != n:
+            raise ValueError("Offset and length arrays of a test must have the same size")
+        # data containers, invalid records keep the initial values
+        flagList = np.full(n, -1, dtype=NPFLAG_COMPACT)
+        if recHeader == REC_MPR:
+            statesList = np.full([pinCount, n], 16, dtype=NPSTATE_COMPACT)  # use 0x10 as the invalid states
+            dataList = np.full([rsltCount, n], NAN, dtype=NPFLOAT_COMPACT)
+            results.append({"dataList":dataList, "statesList":statesList, "flagList":flagList})
         else:
-            parse_record(&pRec, recHeader, &rawDataView[i,0], lengthArray[i])
+            dataList = np.full(n, NAN, dtype=NPFLOAT_COMPACT)
+            results.append({"dataList":dataList, "flagList":flagList})
+        
+        # records are packed in the raw buffer, it takes the sum of valid lengths
+        validMask = (np.asarray(offsetArray) >= 0) & (np.asarray(lengthArray) >= 0)
+        validCnts.append(int(np.count_nonzero(validMask)))
+        validBytes.append(int(np.asarray(lengthArray)[validMask].sum(dtype=np.int64)))
+
+    if nTests == 0:
+        return results
+
+    view = rawView(file_handle)
+    isMapped = view is not None
+    if isMapped:
+        mapped = view
+        mapSize = mapped.shape[0]
+        if mapSize > 0:
+            rawBase = &mapped[0]
+
+    tests = <rawTest*>calloc(nTests, sizeof(rawTest))
+    if tests == NULL:
+        raise MemoryError("Cannot allocate test descriptors")
+    try:
+        for ti in range(nTests):
+            recHeader, pinCount, rsltCount = testList[ti][:3]
+            tests[ti].recHeader = recHeader
+            tests[ti].pinCount = pinCount
+            tests[ti].rsltCount = rsltCount
+            tests[ti].cnt = results[ti]["flagList"].shape[0]
+            tests[ti].data = <float*>cnp.PyArray_DATA(results[ti]["dataList"])
+            tests[ti].flag = <int16_t*>cnp.PyArray_DATA(results[ti]["flagList"])
+            if recHeader == REC_MPR:
+                tests[ti].states = <uint8_t*>cnp.PyArray_DATA(results[ti]["statesList"])
+
+        # set C extern variable to the value from python side
+        global p_needByteSwap, py_needByteSwap
+        p_needByteSwap[0] = py_needByteSwap
+
+        batchStart = 0
+        while batchStart < nTests:
+            # group tests until raw bytes exceed the budget, a large test is read alone
+            batchEnd = batchStart
+            batchBytes = 0
+            n = 0
+            while batchEnd < nTests and (batchEnd == batchStart or 
+                    batchBytes + <int64_t>validBytes[batchEnd] <= RAW_BATCH_BYTES):
+                batchBytes += <int64_t>validBytes[batchEnd]
+                n += validCnts[batchEnd]
+                batchEnd += 1
+
+            offsets = np.empty(n, dtype=np.int64)
+            lengths = np.empty(n, dtype=np.int32)
+            dests = np.empty(n, dtype=np.int64)
+            recCol = np.empty(n, dtype=np.int64)
+            recTest = np.empty(n, dtype=np.int32)
+            # record r starts at dests[r], its offset in the buffer, or the prefix sum of lengths in rawData
+            if not isMapped:
+                rawData = np.empty(batchBytes if batchBytes > 0 else 1, dtype=np.uint8)
+            r = 0
+            rawPos = 0
+            for ti in range(batchStart, batchEnd):
+                if validCnts[ti] == 0:
+                    continue
+                offsetArray = testList[ti][3]
+                lengthArray = testList[ti][4]
+                for i in range(offsetArray.shape[0]):
+                    if offsetArray[i] >= 0 and lengthArray[i] >= 0:
+                        offsets[r] = offsetArray[i]
+                        lengths[r] = lengthArray[i]
+                        dests[r] = offsetArray[i] if isMapped else rawPos
+                        if isMapped and offsetArray[i] + lengthArray[i] > mapSize:
+                            # cut by end of buffer
+                            lengths[r] = -1
+                        recCol[r] = i
+                        recTest[r] = <int32_t>ti
+                        rawPos += lengthArray[i]
+                        r += 1
+
+            if not isMapped:
+                readRawRanges(offsets, lengths, dests, rawData, file_handle)
+                rawBase = &rawData[0]
+            with nogil:
+                decodeRawRecords(tests, recTest, recCol, dests, lengths, rawBase)
+            batchStart = batchEnd
+    finally:
+        free(tests)
+
+    if not compact:
+        # upcast is exact, signaling NaN in RESULT is quieted as C assignment does
+        with np.errstate(invalid="ignore"):
+            for result in results:
+                result["dataList"] = result["dataList"].astype(NPFLOAT)
+                result["flagList"] = result["flagList"].astype(NPINT)
+                if "statesList" in result:
+                    result["statesList"] = result["statesList"].astype(NPINT)
+    return results
 
-            if recHeader == REC_PTR:
-                flagList_view[i] = (<PTR*>pRec).TEST_FLG
-                infType = isinf((<PTR*>pRec).RESULT)
-                if infType > 0:
-                    # replace +inf with max float
-                    dataList_view[i] = FLT_MAX
-                elif infType < 0:
-                    # replace -inf with min float
-                    dataList_view[i] = FLT_MIN
-                else:
-                    dataList_view[i] = (<PTR*>pRec).RESULT
-            elif recHeader == REC_FTR:
-                flagList_view[i] = (<FTR*>pRec).TEST_FLG
-                dataList_view[i] = <NPFLOAT_t>flagList_view[i]
-            
-            free_record(recHeader, pRec)
-            pRec = NULL
 
-    return {"dataList":dataList, "flagList":flagList}
+def parsePFTR_rawList(uint16_t recHeader, int64_t[:] offsetArray, int32_t[:] lengthArray, object file_handle):
+    if recHeader != REC_PTR and recHeader != REC_FTR:
+        raise TypeError("This function is for parsering PTR & FTR only")
+
+    return parseRawLists([(recHeader, 0, 0, offsetArray, lengthArray)], file_handle)[0]
 
 
-@cython.boundscheck(False)
-@cython.wraparound(False)
 def parseMPR_rawList(uint16_t recHeader, uint16_t pinCount, uint16_t rsltCount, int64_t[:] offsetArray, int32_t[:] lengthArray, object file_handle):
     if recHeader != REC_MPR:
         raise TypeError("This function is for parsering MPR only")
 
-    cdef int i, j, infType
-    cdef void* pRec
-    cdef Py_ssize_t cnt = offsetArray.shape[0]
-    cdef int32_t maxL = max(lengthArray)
-
-    # data containers & views for nogil operation
-    # Pin as row, dut as column
-    cdef cnp.ndarray[NPINT_t, ndim=2] statesList = np.full([pinCount, cnt], 16, dtype=NPINT)  # use 0x10 as the invalid states
-    cdef cnp.ndarray[NPFLOAT_t, ndim=2] dataList = np.full([rsltCount, cnt], NAN, dtype=NPFLOAT)
-    cdef cnp.ndarray[NPINT_t, ndim=1] flagList = np.full(cnt, -1, dtype=NPINT)      # init flag with invalid -1 value
-    cdef NPINT_t   [:,:] statesList_view = statesList
-    cdef NPFLOAT_t [:,:] dataList_view = dataList
-    cdef NPINT_t   [:] flagList_view = flagList
-
-    if maxL < 0:
-        # no valid result
-        return {"dataList":dataList, "statesList":statesList, "flagList":flagList}
-
-    # memoryView to store raw bytes from file
-    cdef const unsigned char[:,:] rawDataView = cyarray(shape = (cnt, maxL),
-                                                        itemsize = sizeof(unsigned char),
-                                                        format="B")
-    # c-contiguous view for accepting bytes from read()
-    cdef const unsigned char[::1] tmpData = cyarray(shape = (maxL,),
-                                                    itemsize = sizeof(unsigned char),
-                                                    format="B")
-
-    # output dict
-    cdef dict testDict = {}
-    
-    # read raw data
+    return parseRawLists([(recHeader, pinCount, rsltCount, offsetArray, lengthArray)], file_handle)[0]
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def locateMPR_rawList(int64_t[:] offsetArray, int32_t[:] lengthArray, object file_handle):
+    '''
+    locate RTN_STAT & RTN_RSLT in MPR records, only fields before RTN_STAT are read.
+
+    Return (flagList, layout), flagList is int16 TEST_FLG (-1 if not tested), layout is 
+    a uint16 array of [STAT_CNT, RSLT_CNT, RSLT_AVAIL, STAT_POS, RSLT_POS] of shape [5, cnt], 
+    zeros if not tested. Pins are decoded from the layout by `parseMPR_pinRow`
+    '''
+    cdef Py_ssize_t i, r, n = 0, cnt = offsetArray.shape[0]
+    cdef MPR_LAYOUT loc
+    cdef cnp.ndarray flagList, layoutArray
+    cdef int16_t[::1] flags
+    cdef uint16_t[:, ::1] layout
+    cdef int64_t[::1] offsets, dests, recCol
+    cdef int32_t[::1] lengths, binaryLens
+    cdef unsigned char[::1] rawData
+
+    if lengthArray.shape[0] != cnt:
+        raise ValueError("Offset and length arrays of a test must have the same size")
+    flagList = np.full(cnt, -1, dtype=NPFLAG_COMPACT)
+    layoutArray = np.zeros([5, cnt], dtype=np.uint16)
+    flags = flagList
+    layout = layoutArray
+
+    for i in range(cnt):
+        if offsetArray[i] >= 0 and lengthArray[i] >= 0:
+            n += 1
+    offsets = np.empty(n, dtype=np.int64)
+    lengths = np.empty(n, dtype=np.int32)
+    binaryLens = np.empty(n, dtype=np.int32)
+    dests = np.empty(n, dtype=np.int64)
+    recCol = np.empty(n, dtype=np.int64)
+    rawData = np.empty(n * MPR_FIXED_BYTES if n > 0 else 1, dtype=np.uint8)
+    r = 0
     for i in range(cnt):
-        if offsetArray[i] < 0 or lengthArray[i] < 0:
-            # rawDataView[i, :] = b'\0'    # represent invalid rawData
-            lengthArray[i] = -1
+        if offsetArray[i] >= 0 and lengthArray[i] >= 0:
+            offsets[r] = offsetArray[i]
+            lengths[r] = min(lengthArray[i], MPR_FIXED_BYTES)
+            binaryLens[r] = lengthArray[i]
+            dests[r] = r * MPR_FIXED_BYTES
+            recCol[r] = i
+            r += 1
 
-        else:
-            file_handle.seek(offsetArray[i])
-            # we need to append extra bytes at the end of tmpData if maxL > lengthArray[i]
-            # otherwise the size mismatch error would be raised by the later copy process
-            tmpData = file_handle.read(lengthArray[i]) + b'\0' * (maxL - lengthArray[i])
-            rawDataView[i, :] = tmpData
+    readRawRanges(offsets, lengths, dests, rawData, file_handle, PIN_READ_GAP)
 
-    # set C extern variable to the value from python side
     global p_needByteSwap, py_needByteSwap
     p_needByteSwap[0] = py_needByteSwap
-    # parse raw bytes
-    for i in prange(cnt, nogil=True):
-        if lengthArray[i] < 0:
-            for j in range(rsltCount):
-                dataList_view[j, i] = NAN
-            flagList_view[i] = -1
-        else:
-            parse_record(&pRec, recHeader, &rawDataView[i,0], lengthArray[i])
+    with nogil:
+        for r in range(n):
+            if lengths[r] >= 0:
+                # the layout is computed from the whole record length
+                locate_MPR(&rawData[dests[r]], binaryLens[r], &loc)
+                i = recCol[r]
+                flags[i] = loc.TEST_FLG
+                layout[0, i] = loc.STAT_CNT
+                layout[1, i] = loc.RSLT_CNT
+                layout[2, i] = loc.RSLT_AVAIL
+                layout[3, i] = loc.STAT_POS
+                layout[4, i] = loc.RSLT_POS
+
+    return flagList, layoutArray
 
-            flagList_view[i] = (<MPR*>pRec).TEST_FLG
-            if (<MPR*>pRec).RTN_STAT != NULL:
-                for j in range(pinCount):
-                    # write MPR states into ith column of statesList
-                    statesList_view[j, i] = ((<MPR*>pRec).RTN_STAT)[j]
-            
-            if (<MPR*>pRec).RTN_RSLT != NULL:
-                for j in range(rsltCount):
-                    # write MPR data into ith column of dataList
-                    infType = isinf(((<MPR*>pRec).RTN_RSLT)[j])
-                    if infType > 0:
-                        # replace +inf with max float
-                        dataList_view[j, i] = FLT_MAX
-                    elif infType < 0:
-                        # replace -inf with min float
-                        dataList_view[j, i] = FLT_MIN
-                    else:
-                        dataList_view[j, i] = ((<MPR*>pRec).RTN_RSLT)[j]
-            
-            free_record(recHeader, pRec)
-            pRec = NULL
 
-    return {"dataList":dataList, "statesList":statesList, "flagList":flagList}
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def parseMPR_pinRow(uint16_t pin, int64_t[:] offsetArray, uint16_t[:, ::1] layout, object file_handle):
+    '''
+    decode RTN_RSLT & RTN_STAT of the `pin`th pin from MPR records located by `locateMPR_rawList`, 
+    only the bytes of the pin are read. 
+    Return float32 results & uint8 states of shape [cnt], values are the same as the 
+    `pin`th row of `parseMPR_rawList`
+    '''
+    cdef Py_ssize_t i, r, n = 0, cnt = offsetArray.shape[0]
+    cdef int infType
+    cdef float value
+    cdef cnp.ndarray dataRow, statesRow
+    cdef float[::1] data
+    cdef uint8_t[::1] states
+    cdef int64_t[::1] offsets, dests, recCol
+    cdef int32_t[::1] lengths
+    cdef unsigned char[::1] rawData
+
+    if layout.shape[0] != 5 or layout.shape[1] != cnt:
+        raise ValueError("Layout does not match the offset array")
+    dataRow = np.full(cnt, NAN, dtype=NPFLOAT_COMPACT)
+    statesRow = np.full(cnt, 16, dtype=NPSTATE_COMPACT)  # use 0x10 as the invalid states
+    data = dataRow
+    states = statesRow
+
+    # a range for RTN_STAT and another for RTN_RSLT of each record
+    for i in range(cnt):
+        if offsetArray[i] >= 0:
+            n += (pin < layout[0, i]) + (pin < layout[2, i])
+    offsets = np.empty(n, dtype=np.int64)
+    lengths = np.empty(n, dtype=np.int32)
+    dests = np.empty(n, dtype=np.int64)
+    recCol = np.empty(n, dtype=np.int64)
+    rawData = np.empty(n * sizeof(float) if n > 0 else 1, dtype=np.uint8)
+    r = 0
+    for i in range(cnt):
+        if offsetArray[i] < 0:
+            continue
+        if pin < layout[0, i]:
+            offsets[r] = offsetArray[i] + layout[3, i] + pin // 2
+            lengths[r] = 1
+            dests[r] = r * sizeof(float)
+            recCol[r] = -1 - i      # negative for RTN_STAT
+            r += 1
+        if pin < layout[2, i]:
+            offsets[r] = offsetArray[i] + layout[4, i] + pin * sizeof(float)
+            lengths[r] = sizeof(float)
+            dests[r] = r * sizeof(float)
+            recCol[r] = i
+            r += 1
+
+    readRawRanges(offsets, lengths, dests, rawData, file_handle, PIN_READ_GAP)
+
+    global p_needByteSwap, py_needByteSwap
+    p_needByteSwap[0] = py_needByteSwap
+    with nogil:
+        for i in range(cnt):
+            # results cut by end of record are 0
+            if offsetArray[i] >= 0 and pin < layout[1, i]:
+                data[i] = 0
+        for r in range(n):
+            if lengths[r] < 0:
+                if recCol[r] >= 0:
+                    data[recCol[r]] = NAN
+                continue
+            if recCol[r] < 0:
+                states[-1 - recCol[r]] = decode_N1(&rawData[dests[r]], pin % 2)
+            else:
+                value = decode_R4(&rawData[dests[r]])
+                infType = isinf(value)
+                if infType > 0:
+                    value = FLT_MAX
+                elif infType < 0:
+                    value = FLT_MIN
+                data[recCol[r]] = value
+
+    return dataRow, statesRow
 
 # *** end of Record Parser *** #
 
@@ -754,6 +1380,28 @@ cdef void csqlite3_prepare_v2(sqlite3 *db, const char *Sql, sqlite3_stmt **ppStm
         raise Exception(errMsg.decode('UTF-8'))
 
 
+# copy database to a file by online backup, pages are written sequentially in one pass
+cdef void csqlite3_backup(sqlite3 *src, str dbPath) except *:
+    cdef sqlite3 *dest = NULL
+    cdef sqlite3_backup *backup
+    cdef int exitcode
+
+    csqlite3_open(dbPath, &dest)
+    try:
+        # file is replaced as a whole, no need to journal or sync
+        csqlite3_exec(dest, "PRAGMA synchronous = OFF; PRAGMA journal_mode = OFF;")
+        backup = sqlite3_backup_init(dest, "main", src, "main")
+        if backup == NULL:
+            raise Exception(sqlite3_errmsg(dest).decode('UTF-8'))
+        with nogil:
+            exitcode = sqlite3_backup_step(backup, -1)
+            sqlite3_backup_finish(backup)
+        if exitcode != SQLITE_DONE:
+            raise Exception(f"SQlite3 Error: {sqlite3_errstr(exitcode)}")
+    finally:
+        csqlite3_close(dest)
+
+
 # *** The following sqlite3 funcs will be called massive times, 
 # *** use error code instead of python exception
 # execute sqlite3 statement and reset/clear
@@ -785,6 +1433,70 @@ cdef int csqlite3_finalize(sqlite3_stmt *stmt) nogil:
 # ** End of Wrappers ** #
 
 
+# version of tables written by stdfSummarizer, 
+# bump it whenever the schema changes, cached databases with other versions are discarded
+DB_SCHEMA_VERSION = 2
+
+# offset matrix sidecar, saved as <dbPath><OFFSET_MATRIX_SUFFIX>
+# header: magic, uint32 testCount, uint32 dutCount, padded to OFFSET_MATRIX_HEADER bytes,
+# followed by int64 Offset[TEST_ID][DUTIndex-1] and int32 BinaryLen[TEST_ID][DUTIndex-1] in host byte order,
+# -1 if a test is not tested in a dut
+OFFSET_MATRIX_SUFFIX = "-offsets"
+OFFSET_MATRIX_MAGIC = b"STDFOFS1"
+OFFSET_MATRIX_HEADER = 64
+# matrix is not written if less than 1/OFFSET_MATRIX_MAX_SPARSITY of cells are filled, 
+# fetcher queries Test_Offsets instead
+OFFSET_MATRIX_MAX_SPARSITY = 4
+
+# value sidecar written by eager ingest, saved as <dbPath><VALUE_MATRIX_SUFFIX>
+# header: magic, uint32 testCount, uint32 dutCount, uint32 mprCount, padded to VALUE_MATRIX_HEADER bytes,
+# followed by float32 RESULT[TEST_ID][DUTIndex-1] (TEST_FLG for FTR, NaN for MPR or not tested),
+# int16 TEST_FLG[TEST_ID][DUTIndex-1] (-1 if not tested) and int64 (TEST_ID, pinCount, rsltCount, offset)[mprCount], 
+# each offset points to float32 RTN_RSLT[rsltCount][DUTIndex-1] (NaN if not tested) 
+# followed by uint8 RTN_STAT[pinCount][DUTIndex-1] (0x10 if not tested) of a MPR test.
+# sections start at 8-byte boundary, matrix is skipped for the same sparsity as the offset matrix
+VALUE_MATRIX_SUFFIX = "-values"
+VALUE_MATRIX_MAGIC = b"STDFVAL1"
+VALUE_MATRIX_HEADER = 64
+
+# seek points of a gzip file recorded while inflating, saved as <dbPath><GZ_INDEX_SUFFIX>
+# in the index file format of indexed_gzip (version 1), so that viewer can import it 
+# instead of inflating from the start on the first random access.
+# header: magic, uint8 version, uint8 flags, uint64 compressed size, uint64 uncompressed size, 
+# uint32 spacing, uint32 window size, uint32 point count, followed by 
+# (uint64 cmp_offset, uint64 uncmp_offset, uint8 bits, uint8 has window)[point count] and 
+# windows of points that have one, in host byte order
+GZ_INDEX_SUFFIX = "-gzidx"
+GZ_INDEX_MAGIC = b"GZIDX"
+GZ_INDEX_VERSION = 1
+GZ_INDEX_SPACING = 1 << 22
+
+# block offsets of a bzip2 file recorded while decompressing, saved as <dbPath><BZ_INDEX_SUFFIX>
+# header: magic, uint32 count, padded to BZ_INDEX_HEADER bytes, followed by 
+# int64 (bit offset, uncompressed offset)[count] in host byte order, including end of stream markers, 
+# as the block offsets of indexed_bzip2
+BZ_INDEX_SUFFIX = "-bzidx"
+BZ_INDEX_MAGIC = b"STDFBZI1"
+BZ_INDEX_HEADER = 16
+
+# decompressed copy of a compressed file written by transcode ingest, saved as <dbPath><TRANSCODE_SUFFIX>,
+# offsets in database are valid for both files
+TRANSCODE_SUFFIX = "-stdf"
+
+
+def isCompressed(str filepath):
+    '''True if filepath is read by a decompressor, judged by extension as stdf_open does'''
+    return os.path.splitext(filepath)[1].lower().startswith((".gz", ".bz", ".zip", ".xz", ".lzma"))
+
+
+def valueMatrixSections(uint64_t testCount, uint64_t dutCount, uint64_t mprCount):
+    '''return byte offsets of TEST_FLG matrix, MPR directory and the first MPR block in value sidecar'''
+    cdef uint64_t cellCount = testCount * dutCount
+    cdef uint64_t flagOffset = VALUE_MATRIX_HEADER + 4 * cellCount
+    cdef uint64_t dirOffset = (flagOffset + 2 * cellCount + 7) & ~(<uint64_t>7)
+    return flagOffset, dirOffset, dirOffset + 32 * mprCount
+
+
 #################################################
 # ** Callback function for iterating hashmap ** #
 #################################################
@@ -799,15 +1511,47 @@ cdef int writeFailCount(void* sql_stmt, uint32_t TEST_NUM, uint32_t count) nogil
 # ** End of Callback ** #
 
 
+cdef void bindTRValues(sqlite3_stmt* insertTR_stmt, uint16_t recHeader, void* pRec) nogil:
+    # bind :Value, :Flag, :States, :Results of insertTR from a parsed TR, 
+    # results are stored as in file, inf is replaced in writeValueMatrix
+    if recHeader == REC_PTR:
+        sqlite3_bind_double(insertTR_stmt, 5, (<PTR*>pRec).RESULT)
+        sqlite3_bind_int(insertTR_stmt, 6, (<PTR*>pRec).TEST_FLG)
+    elif recHeader == REC_FTR:
+        # same as parsePFTR_rawList, TEST_FLG is the value of FTR
+        sqlite3_bind_double(insertTR_stmt, 5, (<FTR*>pRec).TEST_FLG)
+        sqlite3_bind_int(insertTR_stmt, 6, (<FTR*>pRec).TEST_FLG)
+    else:
+        sqlite3_bind_int(insertTR_stmt, 6, (<MPR*>pRec).TEST_FLG)
+        if (<MPR*>pRec).RTN_STAT != NULL:
+            sqlite3_bind_blob(insertTR_stmt, 7, (<MPR*>pRec).RTN_STAT, (<MPR*>pRec).RTN_ICNT * sizeof(uint8_t), NULL)
+        if (<MPR*>pRec).RTN_RSLT != NULL:
+            sqlite3_bind_blob(insertTR_stmt, 8, (<MPR*>pRec).RTN_RSLT, (<MPR*>pRec).RSLT_CNT * sizeof(float), NULL)
+
+
+cdef inline float finiteResult(float value) nogil:
+    # same replacement of inf as record parsers
+    cdef int infType = isinf(value)
+    if infType > 0:
+        return FLT_MAX
+    elif infType < 0:
+        return FLT_MIN
+    return value
+
+
 cdef class stdfSummarizer:
     cdef:
         object QSignal, flag, pb_thread
         uint64_t offset, fileSize
         uint32_t dutIndex, waferIndex
         int programSectionsDepth
-        bint reading, isLittleEndian, stopFlag, isWindows, isBeforePRR
+        bint reading, isLittleEndian, stopFlag, isWindows, isBeforePRR, useMmap, eagerValues, inMemory, isGzip, isBzip, transcode, transcodeDone
+        int queueDepth, workers, decompressThreads
+        readonly uint64_t queueCapacity, queueHighWater
         dict pinDict
-        bytes filepath_bt
+        bytes filepath_bt, copyPath_bt
+        str dbPath
+        uint64_t trCount
         void* pRec
         char* endian
         char* TEST_TXT
@@ -815,11 +1559,17 @@ cdef class stdfSummarizer:
         char detailErrorMsg[512]
         const char* filepath_c
         const wchar_t*  filepath_wc
+        const wchar_t*  copyPath_wc
         sqlite3 *db_ptr
         sqlite3_stmt *insertFileInfo_stmt
         sqlite3_stmt *insertDut_stmt
         sqlite3_stmt *updateDut_stmt
         sqlite3_stmt *insertTR_stmt
+        sqlite3_stmt *insertTRBatch_stmt
+        trRow trBatch[TR_BATCH_ROWS]
+        int trBatchCount
+        gz_index gzIndex
+        bz_index bzIndex
         # sqlite3_stmt *updateTR_stmt
         sqlite3_stmt *insertTestInfo_stmt
         sqlite3_stmt *insertHBIN_stmt
@@ -850,6 +1600,10 @@ cdef class stdfSummarizer:
         self.insertDut_stmt         = NULL
         self.updateDut_stmt         = NULL
         self.insertTR_stmt          = NULL
+        self.insertTRBatch_stmt     = NULL
+        self.trBatchCount           = 0
+        memset(&self.gzIndex, 0, sizeof(gz_index))
+        memset(&self.bzIndex, 0, sizeof(bz_index))
         # self.updateTR_stmt          = NULL
         self.insertTestInfo_stmt    = NULL
         self.insertHBIN_stmt        = NULL
@@ -874,7 +1628,7 @@ cdef class stdfSummarizer:
         self.head_waferIndex        = NULL
 
 
-    def __init__(self, QSignal=None, flag=None, filepath=None, dbPath="test.db"):
+    def __init__(self, QSignal=None, flag=None, filepath=None, dbPath="test.db", useMmap=True, queueBytes=QUEUE_BYTES, workers=1, eagerValues=False, inMemory=False, gzIndexSpacing=GZ_INDEX_SPACING, decompressThreads=DECOMPRESS_THREADS, transcode=False):
         # init database in C
         cdef:
             const char* createTableSql = '''DROP TABLE IF EXISTS File_Info;
@@ -957,7 +1711,20 @@ cdef class stdfSummarizer:
                                                                 TEST_ID INTEGER, 
                                                                 Offset INTEGER,
                                                                 BinaryLen INTEGER,
-                                                                PRIMARY KEY (DUTIndex, TEST_ID)) WITHOUT ROWID;
+                                                                PRIMARY KEY (TEST_ID, DUTIndex)) WITHOUT ROWID;
+                                        
+                                        -- TRs arrive in dut order, stage them here and 
+                                        -- copy to test-major Test_Offsets in after_complete()
+                                        -- values are NULL unless eagerValues is on
+                                        CREATE TEMP TABLE IF NOT EXISTS Test_Offsets_Staging (
+                                                                DUTIndex INTEGER,
+                                                                TEST_ID INTEGER, 
+                                                                Offset INTEGER,
+                                                                BinaryLen INTEGER,
+                                                                Value REAL,
+                                                                Flag INTEGER,
+                                                                States BLOB,
+                                                                Results BLOB);
                                                                 
                                         CREATE TABLE IF NOT EXISTS Bin_Info (
                                                                 BIN_TYPE TEXT,
@@ -1016,7 +1783,12 @@ cdef class stdfSummarizer:
                                                             HBIN=:HBIN_NUM, SBIN=:SBIN_NUM, Flag=:Flag, 
                                                             WaferIndex=:WaferIndex, XCOORD=:XCOORD, YCOORD=:YCOORD 
                                                             WHERE DUTIndex=:DUTIndex; COMMIT; BEGIN;'''     # commit and start another transaction in PRR
-            const char* insertTR = '''INSERT OR REPLACE INTO Test_Offsets VALUES (:DUTIndex, :TEST_ID, :Offset ,:BinaryLen);'''
+            const char* insertTR = '''INSERT INTO Test_Offsets_Staging VALUES (:DUTIndex, :TEST_ID, :Offset ,:BinaryLen, 
+                                                                                :Value, :Flag, :States, :Results);'''
+            # TRs without values are buffered and inserted TR_BATCH_ROWS at a time, rows keep their order in rowid
+            bytes insertTRBatch_bt = ("INSERT INTO Test_Offsets_Staging (DUTIndex, TEST_ID, Offset, BinaryLen) VALUES " + 
+                                      ",".join(["(?,?,?,?)"] * TR_BATCH_ROWS) + ";").encode()
+            const char* insertTRBatch = insertTRBatch_bt
 
             # I am not adding IGNORE below, since tracking seen test_nums can skip a huge amount of codes
             const char* insertTestInfo = '''INSERT INTO Test_Info VALUES (:TEST_ID, :TEST_NUM, :recHeader, :TEST_NAME, 
@@ -1046,12 +1818,18 @@ cdef class stdfSummarizer:
 
         # init sqlite3 database api
         try:
-            csqlite3_open(dbPath, &self.db_ptr)
+            if inMemory:
+                # build database in memory and back up to dbPath in after_complete()
+                csqlite3_open(":memory:", &self.db_ptr)
+                csqlite3_exec(self.db_ptr, "PRAGMA journal_mode = OFF;")
+            else:
+                csqlite3_open(dbPath, &self.db_ptr)
             csqlite3_exec(self.db_ptr, createTableSql)
             csqlite3_prepare_v2(self.db_ptr, insertFileInfo, &self.insertFileInfo_stmt)
             csqlite3_prepare_v2(self.db_ptr, insertDut, &self.insertDut_stmt)
             csqlite3_prepare_v2(self.db_ptr, updateDut, &self.updateDut_stmt)
             csqlite3_prepare_v2(self.db_ptr, insertTR, &self.insertTR_stmt)
+            csqlite3_prepare_v2(self.db_ptr, insertTRBatch, &self.insertTRBatch_stmt)
             # csqlite3_prepare_v2(self.db_ptr, updateTR, &self.updateTR_stmt)
             csqlite3_prepare_v2(self.db_ptr, insertTestInfo, &self.insertTestInfo_stmt)
             csqlite3_prepare_v2(self.db_ptr, insertHBIN, &self.insertHBIN_stmt)
@@ -1087,8 +1865,35 @@ cdef class stdfSummarizer:
         self.fileSize = getFileSize(filepath)
         if self.fileSize == 0:
             raise OSError("File cannot be opened")
+        self.dbPath = dbPath
+        self.inMemory = inMemory
+        self.trCount = 0
         # init error msg to empty
         memset(self.detailErrorMsg, 0, 512)
+        # read uncompressed file from mapped pages instead of fread
+        self.useMmap = useMmap
+        # mapped file can be split into chunks and decoded by multiple threads
+        self.workers = workers if workers > 1 else 1
+        # decode results of every TR into value sidecar, viewer can skip reading stdf file on test selection
+        self.eagerValues = eagerValues
+        # record seek points every gzIndexSpacing uncompressed bytes, 0 to disable
+        self.isGzip = os.path.splitext(filepath)[1].lower() == ".gz" and gzIndexSpacing > 0
+        self.gzIndex.spacing = gzIndexSpacing if self.isGzip else 0
+        # blocks of bzip2 are decompressed in parallel and always recorded
+        self.isBzip = os.path.splitext(filepath)[1].lower().startswith(".bz")
+        self.decompressThreads = decompressThreads if decompressThreads > 1 else 1
+        # save decompressed data of a compressed file while parsing, viewer reads the copy instead
+        self.transcode = transcode and isCompressed(filepath)
+        self.transcodeDone = False
+        if self.transcode:
+            if self.isWindows:
+                self.copyPath_wc = PyUnicode_AsWideCharString(dbPath + TRANSCODE_SUFFIX, NULL)
+            else:
+                self.copyPath_bt = (dbPath + TRANSCODE_SUFFIX).encode("utf-8")
+        # parse queue is limited by bytes, high-water mark is updated after parsing
+        self.queueDepth = slabsOfBytes(queueBytes)
+        self.queueCapacity = self.queueDepth * sizeof(dataCluster)
+        self.queueHighWater = 0
         # python signal
         self.flag = flag
         self.QSignal = QSignal
@@ -1136,6 +1941,8 @@ cdef class stdfSummarizer:
         while self.reading:
             with nogil:
                 percent = (10000 * self.offset) // self.fileSize     # times additional 100 to save 2 decimal
+                # fileSize is the compressed size if data size is unknown (bzip, lzma without size)
+                percent = min(percent, 9999)
                 usleep(100000)      # wait for 100 ms
             
             self.QSignal.emit(percent)        
@@ -1162,55 +1969,139 @@ cdef class stdfSummarizer:
         
     def analyze(self):
         # global needByteSwap
-        cdef int errorCode = 0
-        cdef tsQueue    parseQ
-        cdef pthread_t  pth
+        cdef int errorCode = 0, flushError
+        cdef int k, depth, nChunks = 1, nQueues = 0, nStarted = 0, nFinished = 0
+        cdef uint32_t dutBase
+        cdef int* idTable = NULL
+        cdef int idTableSize = 0
+        cdef uint64_t* bounds = NULL
+        cdef tsQueue* queues = NULL
+        cdef pthread_t* threads = NULL
+        cdef chunk_arg* chunkArgs = NULL
         cdef dataCluster* item
+        cdef recData* rec
+        cdef uint32_t i
         cdef parse_arg args
+        cdef stdf_mapping mapping
 
-        # init c queue
-        if message_queue_init(&parseQ, sizeof(dataCluster), 2**22) != 0:
-            raise MemoryError("Unable to start parsing queue")
         # args for parser
         args.filename = <void*>self.filepath_wc if self.isWindows else <void*>self.filepath_c
-        args.q = &parseQ
-        args.p_needByteSwap = &needByteSwap
-        args.stopFlag = &self.stopFlag
-        # start parsing thread
-        if pthread_create(&pth, NULL, parse, <void*>&args) != 0:
-            raise RuntimeError("Failed to start parsing thread")
+        # mapping is only available for uncompressed files, 
+        # base is NULL if failed and parser will fallback to stream reading
+        mapping.base = NULL
+        if self.useMmap:
+            stdf_map(&mapping, args.filename)
+        # split mapped file for chunk workers, endianness must be known before they start, 
+        # otherwise parse in a single thread and let it report the error
+        if self.workers > 1 and mapping.base != NULL and check_endian_mapped(&mapping, &needByteSwap) == STD_OK:
+            bounds = <uint64_t*>malloc((self.workers + 1) * sizeof(uint64_t))
+            if bounds != NULL:
+                with nogil:
+                    nChunks = split_chunks(&mapping, self.workers, bounds)
+        if nChunks > 1:
+            logger.info(f"Parsing file in {nChunks} chunks")
+
+        # init c queues, one per chunk, and split memory budget among them.
+        # parser is blocked when all slabs are in flight, 
+        # so raw data held in memory never exceeds queueCapacity
+        depth = self.queueDepth if nChunks == 1 else slabsOfBytes(self.queueCapacity // nChunks)
+        queues = <tsQueue*>calloc(nChunks, sizeof(tsQueue))
+        threads = <pthread_t*>calloc(nChunks, sizeof(pthread_t))
+        chunkArgs = <chunk_arg*>calloc(nChunks, sizeof(chunk_arg))
+        if queues != NULL and threads != NULL and chunkArgs != NULL:
+            while nQueues < nChunks and message_queue_init(&queues[nQueues], sizeof(dataCluster), depth) == 0:
+                nQueues += 1
+        if nQueues < nChunks:
+            for k in range(nQueues):
+                message_queue_destroy(&queues[k])
+            free(queues)
+            free(threads)
+            free(chunkArgs)
+            free(bounds)
+            stdf_unmap(&mapping)
+            raise MemoryError("Unable to start parsing queue")
+        self.queueCapacity = <uint64_t>nChunks * depth * sizeof(dataCluster)
         
         try:
-            with nogil:
-                while True:
-                    item = <dataCluster*>message_queue_read(&parseQ)
-                    if item == NULL:
+            # start parsing threads
+            if nChunks == 1:
+                args.mapping = &mapping
+                args.q = &queues[0]
+                args.p_needByteSwap = &needByteSwap
+                args.stopFlag = &self.stopFlag
+                args.gzIndex = &self.gzIndex if self.isGzip else NULL
+                args.bzIndex = &self.bzIndex if self.isBzip else NULL
+                args.threads = self.decompressThreads
+                args.copyPath = NULL
+                args.copyStatus = OS_FAIL
+                if self.transcode:
+                    args.copyPath = <void*>self.copyPath_wc if self.isWindows else <void*><char*>self.copyPath_bt
+                if pthread_create(&threads[0], NULL, parse, <void*>&args) == 0:
+                    nStarted = 1
+            else:
+                for k in range(nChunks):
+                    chunkArgs[k].mapping = &mapping
+                    chunkArgs[k].start = bounds[k]
+                    chunkArgs[k].end = bounds[k+1]
+                    chunkArgs[k].q = &queues[k]
+                    chunkArgs[k].stopFlag = &self.stopFlag
+                    if pthread_create(&threads[k], NULL, parse_chunk, <void*>&chunkArgs[k]) != 0:
                         break
+                    nStarted += 1
+                # chunk workers do not send SET_ENDIAN
+                self.set_endian()
+            if nStarted < nChunks:
+                raise RuntimeError("Failed to start parsing thread")
 
-                    else:
-                        if item.operation == SET_ENDIAN:
-                            self.set_endian()
-
-                        elif item.operation == PARSE:
-                            if item.pData:
-                                self.offset = item.pData.offset
-                                errorCode = self.onRec(recHeader=item.pData.recHeader, \
-                                                        binaryLen=item.pData.binaryLen, \
-                                                        rawData=item.pData.rawData)
-                                free(item.pData.rawData)
-                            free(item.pData)
-                            if errorCode: break
-                        else:
-                            # save error code if finished
-                            if item.error:
-                                errorCode = item.error
+            with nogil:
+                # chunks are summarized in file order, 
+                # dut index and test id are numbered the same as a single parser
+                for k in range(nChunks):
+                    dutBase = self.dutIndex
+                    if idTableSize > 0:
+                        memset(idTable, 0xFF, idTableSize * sizeof(int))    # fill -1
+                    while True:
+                        item = <dataCluster*>message_queue_read(&queues[k])
+                        if item == NULL:
                             break
 
-                    message_queue_message_free(&parseQ, item)
+                        else:
+                            if item.operation == SET_ENDIAN:
+                                self.set_endian()
+
+                            elif item.operation == PARSE:
+                                for i in range(item.count):
+                                    rec = &item.recs[i]
+                                    self.offset = rec.offset
+                                    if item.decoded and item.tr[i].localID >= 0:
+                                        errorCode = self.onChunkTR(rec, &item.tr[i], dutBase, &idTable, &idTableSize)
+                                    else:
+                                        errorCode = self.onRec(recHeader=rec.recHeader, \
+                                                                binaryLen=rec.binaryLen, \
+                                                                rawData=rec.rawData)
+                                    if errorCode: break
+                                if errorCode: break
+                            else:
+                                # save error code if finished, 
+                                # EOF of a chunk except the last one is where the next chunk starts
+                                nFinished += 1
+                                if item.error and not (item.error == STD_EOF and k < nChunks - 1):
+                                    errorCode = item.error
+                                break
+
+                        message_queue_message_free(&queues[k], item)
+                    if errorCode: break
+                # insert TRs left in buffer, keep the previous error if any
+                flushError = self.flushTR()
+                if flushError and (not errorCode or errorCode == STD_EOF):
+                    errorCode = flushError
 
             if errorCode:
                 raise Exception
 
+        except RuntimeError:
+            raise
+
         except Exception:
             if errorCode == INVAILD_STDF:
                 raise Exception("The file is not a valid STDF")
@@ -1233,10 +2124,28 @@ cdef class stdfSummarizer:
                 raise Exception(f"SQlite3 Error: {sqlite3_errstr(errorCode)}")
 
         finally:
-            # join progress bar thread if finished
-            pthread_join(pth, NULL)
-            pthread_kill(pth, 0)
-            message_queue_destroy(&parseQ)
+            if nFinished < nStarted:
+                # stopped by error, terminate parsers before joining
+                self.stopFlag = True
+                with nogil:
+                    for k in range(nFinished, nStarted):
+                        drain_queue(&queues[k])
+            # join parsing threads if finished
+            self.queueHighWater = 0
+            for k in range(nStarted):
+                pthread_join(threads[k], NULL)
+                pthread_kill(threads[k], 0)
+            self.transcodeDone = self.transcode and nStarted == 1 and args.copyStatus == STD_OK and not self.stopFlag
+            for k in range(nChunks):
+                self.queueHighWater += message_queue_high_water(&queues[k]) * sizeof(dataCluster)
+                message_queue_destroy(&queues[k])
+            logger.info(f"Parse queue high-water mark: {self.queueHighWater} / {self.queueCapacity} bytes")
+            free(queues)
+            free(threads)
+            free(chunkArgs)
+            free(bounds)
+            free(idTable)
+            stdf_unmap(&mapping)
             self.after_complete()
         
         
@@ -1270,16 +2179,54 @@ cdef class stdfSummarizer:
 
         csqlite3_finalize(updateFailCount_stmt)
         
-        cdef char* createIndex_COMMIT = '''CREATE INDEX dutKey ON Dut_Info (
+        # sorted copy appends to the test-major b-tree, so that offsets of a test are 
+        # stored contiguously. Duplicated TRs of a dut are replaced by the later one
+        cdef char* copyOffsets = '''INSERT OR REPLACE INTO Test_Offsets 
+                                        SELECT DUTIndex, TEST_ID, Offset, BinaryLen FROM Test_Offsets_Staging 
+                                        ORDER BY TEST_ID, DUTIndex, rowid;'''
+        cdef char* createIndex_COMMIT = '''DROP TABLE Test_Offsets_Staging;
+                                        
+                                        CREATE INDEX dutKey ON Dut_Info (
                                         HEAD_NUM	ASC,
                                         SITE_NUM	ASC);
                                         
                                         COMMIT;'''
+        csqlite3_exec(self.db_ptr, copyOffsets)
+        if self.eagerValues:
+            try:
+                self.writeValueMatrix()
+            except Exception as e:
+                # viewer will parse values from stdf file without the sidecar
+                logger.warning(f"Failed to write value matrix: {repr(e)}")
         csqlite3_exec(self.db_ptr, createIndex_COMMIT)
+        try:
+            self.writeOffsetMatrix()
+        except Exception as e:
+            # fetcher will use Test_Offsets without the sidecar
+            logger.warning(f"Failed to write offset matrix: {repr(e)}")
+        if self.isGzip:
+            try:
+                self.writeGzipIndex()
+            except Exception as e:
+                # viewer will build the index by itself on first access
+                logger.warning(f"Failed to write gzip index: {repr(e)}")
+        gz_index_clear(&self.gzIndex)
+        if self.isBzip:
+            try:
+                self.writeBzipIndex()
+            except Exception as e:
+                # viewer will find blocks by itself on first access
+                logger.warning(f"Failed to write bzip2 index: {repr(e)}")
+        bz_index_clear(&self.bzIndex)
+        if self.transcode and not self.transcodeDone:
+            logger.warning("Decompressed copy is incomplete and discarded")
+            if os.path.exists(self.dbPath + TRANSCODE_SUFFIX):
+                os.remove(self.dbPath + TRANSCODE_SUFFIX)
         csqlite3_finalize(self.insertFileInfo_stmt)
         csqlite3_finalize(self.insertDut_stmt)
         csqlite3_finalize(self.updateDut_stmt)
         csqlite3_finalize(self.insertTR_stmt)
+        csqlite3_finalize(self.insertTRBatch_stmt)
         # csqlite3_finalize(self.updateTR_stmt)
         csqlite3_finalize(self.insertTestInfo_stmt)
         csqlite3_finalize(self.insertHBIN_stmt)
@@ -1295,7 +2242,6 @@ cdef class stdfSummarizer:
         csqlite3_finalize(self.insertTestPin_stmt)
         csqlite3_finalize(self.insertDynamicLimit_stmt)
         csqlite3_finalize(self.insertDatalog_stmt)
-        csqlite3_close(self.db_ptr)
         # clean hashmap
         hashmap_free(self.defaultLLimit)
         hashmap_free(self.defaultHLimit)
@@ -1304,6 +2250,11 @@ cdef class stdfSummarizer:
         hashmap_free(self.head_waferIndex)            
         # clean testidmap
         destoryTestIDMap(self.idMap)
+        try:
+            if self.inMemory:
+                csqlite3_backup(self.db_ptr, self.dbPath)
+        finally:
+            csqlite3_close(self.db_ptr)
 
         if self.QSignal: 
             self.pb_thread.join()
@@ -1311,6 +2262,208 @@ cdef class stdfSummarizer:
             self.QSignal.emit(10000)
         
         
+    def writeOffsetMatrix(self):
+        # dump committed Test_Offsets to a dense matrix for fetcher to memory-map
+        cdef uint32_t testCount = self.idMap.mapSize if self.idMap != NULL else 0
+        cdef uint32_t dutCount = self.dutIndex
+        cdef int64_t[:, ::1] offsetView
+        cdef int32_t[:, ::1] lengthView
+        cdef sqlite3_stmt* selectOffsets_stmt
+        cdef int testID, dutIndex, exitcode
+
+        matrixPath = self.dbPath + OFFSET_MATRIX_SUFFIX
+        if os.path.exists(matrixPath):
+            os.remove(matrixPath)
+        if testCount == 0 or dutCount == 0 or <uint64_t>testCount * dutCount > OFFSET_MATRIX_MAX_SPARSITY * self.trCount:
+            logger.info(f"Offset matrix is skipped, {self.trCount} records in {testCount} tests x {dutCount} duts")
+            return
+
+        cellCount = <uint64_t>testCount * dutCount
+        with open(matrixPath, "wb") as f:
+            f.write(OFFSET_MATRIX_MAGIC + struct.pack("=II", testCount, dutCount))
+            f.truncate(OFFSET_MATRIX_HEADER + 12 * cellCount)
+        offsetArray = np.memmap(matrixPath, dtype=np.int64, mode="r+", offset=OFFSET_MATRIX_HEADER, shape=(testCount, dutCount))
+        lengthArray = np.memmap(matrixPath, dtype=np.int32, mode="r+", offset=OFFSET_MATRIX_HEADER + 8 * cellCount, shape=(testCount, dutCount))
+        offsetArray.fill(-1)
+        lengthArray.fill(-1)
+        offsetView = offsetArray
+        lengthView = lengthArray
+
+        csqlite3_prepare_v2(self.db_ptr, "SELECT TEST_ID, DUTIndex, Offset, BinaryLen FROM Test_Offsets", &selectOffsets_stmt)
+        with nogil:
+            while True:
+                exitcode = sqlite3_step(selectOffsets_stmt)
+                if exitcode != SQLITE_ROW:
+                    break
+                testID = sqlite3_column_int(selectOffsets_stmt, 0)
+                dutIndex = sqlite3_column_int(selectOffsets_stmt, 1)
+                if 0 <= testID < <int>testCount and 1 <= dutIndex <= <int>dutCount:
+                    offsetView[testID, dutIndex-1] = sqlite3_column_int64(selectOffsets_stmt, 2)
+                    lengthView[testID, dutIndex-1] = sqlite3_column_int(selectOffsets_stmt, 3)
+        sqlite3_finalize(selectOffsets_stmt)
+        del offsetView, lengthView
+        offsetArray.flush()
+        lengthArray.flush()
+        del offsetArray, lengthArray
+        if exitcode != SQLITE_DONE:
+            os.remove(matrixPath)
+            raise Exception(f"SQlite3 Error: {sqlite3_errstr(exitcode)}")
+
+
+    def writeGzipIndex(self):
+        # export seek points recorded by parser, index is incomplete if parsing stopped early
+        cdef uint32_t i
+        cdef gz_point* point
+
+        indexPath = self.dbPath + GZ_INDEX_SUFFIX
+        if os.path.exists(indexPath):
+            os.remove(indexPath)
+        if not self.gzIndex.complete or self.gzIndex.npoints == 0:
+            logger.info("Gzip index is skipped, file is not fully inflated")
+            return
+
+        with open(indexPath, "wb") as f:
+            f.write(GZ_INDEX_MAGIC + struct.pack("=BBQQIII", GZ_INDEX_VERSION, 0, 
+                                                 self.gzIndex.compressed_size, self.gzIndex.uncompressed_size, 
+                                                 self.gzIndex.spacing, GZ_WINDOW_SIZE, self.gzIndex.npoints))
+            for i in range(self.gzIndex.npoints):
+                point = &self.gzIndex.points[i]
+                f.write(struct.pack("=QQBB", point.cmp_offset, point.uncmp_offset, point.bits, point.window != NULL))
+            for i in range(self.gzIndex.npoints):
+                point = &self.gzIndex.points[i]
+                if point.window != NULL:
+                    f.write(point.window[:GZ_WINDOW_SIZE])
+
+
+    def writeBzipIndex(self):
+        # export block offsets recorded by parser, index is incomplete if parsing stopped early
+        cdef int64_t[:, ::1] blockView
+        cdef uint32_t i
+
+        indexPath = self.dbPath + BZ_INDEX_SUFFIX
+        if os.path.exists(indexPath):
+            os.remove(indexPath)
+        if not self.bzIndex.complete or self.bzIndex.nblocks == 0:
+            logger.info("Bzip2 index is skipped, file is not fully decompressed")
+            return
+
+        blockArray = np.empty((self.bzIndex.nblocks, 2), dtype=np.int64)
+        blockView = blockArray
+        for i in range(self.bzIndex.nblocks):
+            blockView[i, 0] = self.bzIndex.blocks[i].bit_offset
+            blockView[i, 1] = self.bzIndex.blocks[i].data_offset
+        with open(indexPath, "wb") as f:
+            f.write(BZ_INDEX_MAGIC + struct.pack("=I", self.bzIndex.nblocks).ljust(BZ_INDEX_HEADER - len(BZ_INDEX_MAGIC), b"\0"))
+            f.write(blockArray.tobytes())
+
+
+    def writeValueMatrix(self):
+        # scatter values in Test_Offsets_Staging to dense arrays, a later TR of a dut overwrites the earlier one
+        cdef uint32_t testCount = self.idMap.mapSize if self.idMap != NULL else 0
+        cdef uint32_t dutCount = self.dutIndex
+        cdef uint64_t cellCount, flagOffset, dirOffset, blockOffset, cell
+        cdef unsigned char[::1] fileView
+        cdef int64_t[::1] blockView         # block offset of MPR tests, -1 for others
+        cdef uint16_t[::1] pinView, rsltView
+        cdef unsigned char* base
+        cdef float* resultPtr
+        cdef int16_t* flagPtr
+        cdef float* blockRslt
+        cdef unsigned char* blockStat
+        cdef const unsigned char* states
+        cdef const unsigned char* rslts
+        cdef sqlite3_stmt* select_stmt
+        cdef int testID, dutIndex, exitcode, j, n
+        cdef float value
+
+        matrixPath = self.dbPath + VALUE_MATRIX_SUFFIX
+        if os.path.exists(matrixPath):
+            os.remove(matrixPath)
+        if testCount == 0 or dutCount == 0 or <uint64_t>testCount * dutCount > OFFSET_MATRIX_MAX_SPARSITY * self.trCount:
+            logger.info(f"Value matrix is skipped, {self.trCount} records in {testCount} tests x {dutCount} duts")
+            return
+
+        # size of MPR arrays is from the first record, the same as viewer
+        mprShapes = []
+        csqlite3_prepare_v2(self.db_ptr, '''SELECT TEST_ID, ifnull(RTN_ICNT, 0), ifnull(RSLT_PGM_CNT, 0) FROM Test_Info 
+                                            WHERE recHeader=3855 ORDER BY TEST_ID''', &select_stmt)
+        while sqlite3_step(select_stmt) == SQLITE_ROW:
+            mprShapes.append((sqlite3_column_int(select_stmt, 0), sqlite3_column_int(select_stmt, 1), sqlite3_column_int(select_stmt, 2)))
+        sqlite3_finalize(select_stmt)
+
+        cellCount = <uint64_t>testCount * dutCount
+        flagOffset, dirOffset, blockOffset = valueMatrixSections(testCount, dutCount, len(mprShapes))
+        blocks = np.full(testCount, -1, dtype=np.int64)
+        pins = np.zeros(testCount, dtype=np.uint16)
+        rslts_cnt = np.zeros(testCount, dtype=np.uint16)
+        directory = np.zeros((len(mprShapes), 4), dtype=np.int64)
+        for k, (tid, pinCount, rsltCount) in enumerate(mprShapes):
+            directory[k] = (tid, pinCount, rsltCount, blockOffset)
+            if 0 <= tid < testCount:
+                blocks[tid], pins[tid], rslts_cnt[tid] = blockOffset, pinCount, rsltCount
+            blockOffset = (blockOffset + (4 * rsltCount + pinCount) * dutCount + 7) & ~7
+
+        with open(matrixPath, "wb") as f:
+            f.write(VALUE_MATRIX_MAGIC + struct.pack("=III", testCount, dutCount, len(mprShapes)))
+            f.truncate(blockOffset)
+        fileArray = np.memmap(matrixPath, dtype=np.uint8, mode="r+")
+        fileArray[VALUE_MATRIX_HEADER:flagOffset].view(np.float32).fill(np.nan)
+        fileArray[flagOffset:flagOffset + 2 * cellCount].view(np.int16).fill(-1)
+        fileArray[dirOffset:dirOffset + directory.nbytes] = directory.view(np.uint8).ravel()
+        for tid, _, rsltCount, offset in directory:
+            fileArray[offset:offset + 4 * rsltCount * dutCount].view(np.float32).fill(np.nan)
+            fileArray[offset + 4 * rsltCount * dutCount:offset + (4 * rsltCount + pins[tid]) * dutCount].fill(0x10)
+        fileView = fileArray
+        blockView = blocks
+        pinView = pins
+        rsltView = rslts_cnt
+        base = &fileView[0]
+        resultPtr = <float*>(base + <uint64_t>VALUE_MATRIX_HEADER)
+        flagPtr = <int16_t*>(base + flagOffset)
+
+        csqlite3_prepare_v2(self.db_ptr, "SELECT TEST_ID, DUTIndex, Value, Flag, States, Results FROM Test_Offsets_Staging ORDER BY rowid", &select_stmt)
+        with nogil:
+            while True:
+                exitcode = sqlite3_step(select_stmt)
+                if exitcode != SQLITE_ROW:
+                    break
+                testID = sqlite3_column_int(select_stmt, 0)
+                dutIndex = sqlite3_column_int(select_stmt, 1)
+                if testID < 0 or testID >= <int>testCount or dutIndex < 1 or dutIndex > <int>dutCount:
+                    continue
+                if sqlite3_column_type(select_stmt, 3) == SQLITE_NULL:
+                    continue
+                cell = <uint64_t>testID * dutCount + dutIndex - 1
+                flagPtr[cell] = sqlite3_column_int(select_stmt, 3)
+                if sqlite3_column_type(select_stmt, 2) != SQLITE_NULL:
+                    resultPtr[cell] = finiteResult(<float>sqlite3_column_double(select_stmt, 2))
+                if blockView[testID] >= 0:
+                    # arrays of a MPR are column dutIndex-1 of the test's block, 
+                    # missing values are reset in case of a previous TR in this dut
+                    blockRslt = <float*>(base + blockView[testID])
+                    blockStat = base + blockView[testID] + 4 * rsltView[testID] * dutCount
+                    states = <const unsigned char*>sqlite3_column_blob(select_stmt, 4)
+                    n = sqlite3_column_bytes(select_stmt, 4)
+                    for j in range(pinView[testID]):
+                        blockStat[j * dutCount + dutIndex - 1] = states[j] if j < n else 0x10
+                    rslts = <const unsigned char*>sqlite3_column_blob(select_stmt, 5)
+                    n = sqlite3_column_bytes(select_stmt, 5) // sizeof(float)
+                    for j in range(rsltView[testID]):
+                        if j < n:
+                            # blob is not guaranteed to be aligned
+                            memcpy(&value, rslts + j * sizeof(float), sizeof(float))
+                            blockRslt[j * dutCount + dutIndex - 1] = finiteResult(value)
+                        else:
+                            blockRslt[j * dutCount + dutIndex - 1] = NAN
+        sqlite3_finalize(select_stmt)
+        del fileView
+        fileArray.flush()
+        del fileArray
+        if exitcode != SQLITE_DONE:
+            os.remove(matrixPath)
+            raise Exception(f"SQlite3 Error: {sqlite3_errstr(exitcode)}")
+
+
     cdef int onRec(self, uint16_t recHeader, uint16_t binaryLen, unsigned char* rawData) nogil:
         # most frequent records on top to reduce check times
         # in Cython it will be replaced by switch case, which will be more efficient than py_dict/if..else
@@ -1761,8 +2914,82 @@ cdef class stdfSummarizer:
     
     cdef int onTR(self, uint16_t recHeader, uint16_t binaryLen, unsigned char* rawData) nogil:
         cdef:
-            int testID = 0
-            uint32_t TEST_NUM, currentDutIndex, _1stLLimit, _1stHLimit
+            int testID = -1
+            TR_PEEK     peek
+
+        # read testNum headNum and siteNum without allocation, 
+        # full record is parsed only for the first occurrence of a test
+        peek_TR(recHeader, rawData, binaryLen, &peek)
+        return self.storeTR(recHeader, binaryLen, rawData, &peek, &testID, 0)
+
+
+    cdef int onChunkTR(self, recData* rec, trInfo* info, uint32_t dutBase, int** p_idTable, int* p_idTableSize) nogil:
+        # TR decoded by a chunk worker, map local test id and dut index to the global ones
+        cdef:
+            int testID, err
+            int newSize
+            int* newTable
+            TR_PEEK     peek
+
+        if info.localID >= p_idTableSize[0]:
+            # local ids are assigned in order of appearance, grow table on demand
+            newSize = 2 * p_idTableSize[0] if p_idTableSize[0] > 0 else 1024
+            while newSize <= info.localID:
+                newSize *= 2
+            newTable = <int*>realloc(p_idTable[0], newSize * sizeof(int))
+            if newTable == NULL:
+                return NO_MEMORY
+            memset(newTable + p_idTableSize[0], 0xFF, (newSize - p_idTableSize[0]) * sizeof(int))     # fill -1
+            p_idTable[0] = newTable
+            p_idTableSize[0] = newSize
+
+        testID = p_idTable[0][info.localID]
+        if testID < 0:
+            # first occurrence in this chunk, test name is required for global id
+            peek_TR(rec.recHeader, rec.rawData, rec.binaryLen, &peek)
+        else:
+            peek.TEST_NUM = info.TEST_NUM
+            peek.HEAD_NUM = info.HEAD_NUM
+            peek.SITE_NUM = info.SITE_NUM
+            peek.OPT_FLAG = info.OPT_FLAG
+            peek.LO_LIMIT = info.LO_LIMIT
+            peek.HI_LIMIT = info.HI_LIMIT
+            peek.TEST_TXT[0] = 0
+
+        err = self.storeTR(rec.recHeader, rec.binaryLen, rec.rawData, &peek, &testID, 
+                           dutBase + info.localDut if info.localDut > 0 else 0)
+        if testID >= 0:
+            p_idTable[0][info.localID] = testID
+        return err
+
+
+    cdef int flushTR(self) nogil:
+        # insert buffered TRs, a full buffer is inserted by one statement
+        cdef int i, err = 0
+        cdef sqlite3_stmt* stmt = self.insertTRBatch_stmt if self.trBatchCount == TR_BATCH_ROWS else self.insertTR_stmt
+        cdef int base = 0
+
+        for i in range(self.trBatchCount):
+            sqlite3_bind_int(stmt, base + 1, self.trBatch[i].DUTIndex)                       # DUTIndex
+            sqlite3_bind_int(stmt, base + 2, self.trBatch[i].TEST_ID)                        # TEST_ID
+            sqlite3_bind_int64(stmt, base + 3, <sqlite3_int64>self.trBatch[i].offset)       # offset
+            sqlite3_bind_int(stmt, base + 4, self.trBatch[i].binaryLen)                      # BinaryLen
+            if stmt == self.insertTRBatch_stmt:
+                base += 4
+            else:
+                err = csqlite3_step(stmt)
+                if err: break
+        if stmt == self.insertTRBatch_stmt:
+            err = csqlite3_step(stmt)
+        self.trBatchCount = 0
+        return err
+
+
+    cdef int storeTR(self, uint16_t recHeader, uint16_t binaryLen, unsigned char* rawData, TR_PEEK* peek, int* p_testID, uint32_t dutIndex) nogil:
+        # testID (>= 0) and dutIndex (> 0) are looked up here if not provided
+        cdef:
+            int testID = p_testID[0]
+            uint32_t TEST_NUM, currentDutIndex = dutIndex, _1stLLimit, _1stHLimit
             uint8_t HEAD_NUM, SITE_NUM, OPT_FLAG
             uint16_t RTN_ICNT = 0, RSLT_PGM_CNT = 0     # For FTR & MPR
             int i, RES_SCAL, err = 0
@@ -1774,54 +3001,63 @@ cdef class stdfSummarizer:
             char* Unit = NULL
             char* SEQ_NAM = NULL
             int SEQ_NAM_LEN = 0
+            void* pValueRec = NULL
             uint16_t*   pRTN_INDX = NULL   # For FTR & MPR
             uint16_t*   pPGM_INDX = NULL   # For FTR
 
-        parse_record(&self.pRec, recHeader, rawData, binaryLen)
-        # read testNum headNum and siteNum
-        if recHeader == REC_PTR:
-            TEST_NUM = (<PTR*>self.pRec).TEST_NUM
-            TEST_TXT = (<PTR*>self.pRec).TEST_TXT
-            HEAD_NUM = (<PTR*>self.pRec).HEAD_NUM
-            SITE_NUM = (<PTR*>self.pRec).SITE_NUM
-        elif recHeader == REC_FTR:
-            TEST_NUM = (<FTR*>self.pRec).TEST_NUM
-            TEST_TXT = (<FTR*>self.pRec).TEST_TXT
-            HEAD_NUM = (<FTR*>self.pRec).HEAD_NUM
-            SITE_NUM = (<FTR*>self.pRec).SITE_NUM
-        else:
-            TEST_NUM = (<MPR*>self.pRec).TEST_NUM
-            TEST_TXT = (<MPR*>self.pRec).TEST_TXT
-            HEAD_NUM = (<MPR*>self.pRec).HEAD_NUM
-            SITE_NUM = (<MPR*>self.pRec).SITE_NUM
-
-        if TEST_TXT == NULL:
-            TEST_TXT = ""
+        TEST_NUM = peek.TEST_NUM
+        TEST_TXT = peek.TEST_TXT
+        HEAD_NUM = peek.HEAD_NUM
+        SITE_NUM = peek.SITE_NUM
 
-        if (MAP_OK != hashmap_get(self.head_site_dutIndex, HEAD_NUM<<8 | SITE_NUM, &currentDutIndex)):
+        if currentDutIndex == 0 and (MAP_OK != hashmap_get(self.head_site_dutIndex, HEAD_NUM<<8 | SITE_NUM, &currentDutIndex)):
             err = MAP_MISSING
             sprintf(self.detailErrorMsg, "Error key in XTR %d, TestNumber:%d Head:%d Site:%d", recHeader, TEST_NUM, HEAD_NUM, SITE_NUM)
 
-        testID = getTestID(self.idMap, TEST_NUM, TEST_TXT)
         if testID < 0:
-            testID = insertTestItem(self.idMap, TEST_NUM, TEST_TXT)
+            testID = getTestID(self.idMap, TEST_NUM, TEST_TXT)
             if testID < 0:
-                err = testID
-                sprintf(self.detailErrorMsg, "Error when storing testID for TestNumber:%d Head:%d Site:%d", TEST_NUM, HEAD_NUM, SITE_NUM)
-
-        if not err:
-            # insert or replace Test_Offsets
+                testID = insertTestItem(self.idMap, TEST_NUM, TEST_TXT)
+                if testID < 0:
+                    err = testID
+                    sprintf(self.detailErrorMsg, "Error when storing testID for TestNumber:%d Head:%d Site:%d", TEST_NUM, HEAD_NUM, SITE_NUM)
+            p_testID[0] = testID
+
+        if not err and not self.eagerValues:
+            # buffer offsets, staging table is not read until after_complete()
+            self.trBatch[self.trBatchCount].DUTIndex = currentDutIndex
+            self.trBatch[self.trBatchCount].TEST_ID = testID
+            self.trBatch[self.trBatchCount].offset = self.offset
+            self.trBatch[self.trBatchCount].binaryLen = binaryLen
+            self.trBatchCount += 1
+            if self.trBatchCount == TR_BATCH_ROWS:
+                err = self.flushTR()
+            self.trCount += 1
+
+        elif not err:
+            # eager values: insert offsets and decoded values into Test_Offsets_Staging row by row
             sqlite3_bind_int(self.insertTR_stmt, 1, currentDutIndex)                # DUTIndex
             sqlite3_bind_int(self.insertTR_stmt, 2, testID)                         # TEST_ID
             sqlite3_bind_int64(self.insertTR_stmt, 3, <sqlite3_int64>self.offset)   # offset
             sqlite3_bind_int(self.insertTR_stmt, 4, binaryLen)                      # BinaryLen
+            parse_record(&pValueRec, recHeader, rawData, binaryLen)
+            if pValueRec == NULL:
+                return NO_MEMORY
+            bindTRValues(self.insertTR_stmt, recHeader, pValueRec)
             err = csqlite3_step(self.insertTR_stmt)
+            if pValueRec != NULL:
+                # blobs are bound without copy, free after step
+                free_record(recHeader, pValueRec)
+            self.trCount += 1
         
         # cache omitted fields
         # MUST pre-read and cache OPT_FLAG, RES_SCAL, LLM_SCAL, HLM_SCAL of a test item from the first record
         # as it may be omitted in the later record, causing typeError when user directly selects sites where 
         # no such field value is available in the data preparation.
         if (not err) and (not hashmap_contains(self.defaultLLimit, testID)):
+            parse_record(&self.pRec, recHeader, rawData, binaryLen)
+            if self.pRec == NULL:
+                return NO_MEMORY
             if recHeader == REC_FTR: # FTR
                 No_RES_SCAL = No_LLimit = No_HLimit = No_LSpec = No_HSpec = True
                 OPT_FLAG    = (<FTR*>self.pRec).OPT_FLAG
@@ -1926,14 +3162,16 @@ cdef class stdfSummarizer:
                         sqlite3_bind_text(self.insertTestPin_stmt, 3, "PGM", -1, NULL)
                         err = csqlite3_step(self.insertTestPin_stmt)
 
+            free_record(recHeader, self.pRec)
+
         else:
             # This case is for handling dynamic limits in PTR only, FTR is not allowed, MPR must use the same limits
             if (not err) and (recHeader == REC_PTR):
                 # test_num has been seen, defaultLLimit contains test_num
                 # we need to check if the limits are differ from the default one in the dictionary
-                LLimit      = (<PTR*>self.pRec).LO_LIMIT
-                HLimit      = (<PTR*>self.pRec).HI_LIMIT
-                OPT_FLAG    = (<PTR*>self.pRec).OPT_FLAG
+                LLimit      = peek.LO_LIMIT
+                HLimit      = peek.HI_LIMIT
+                OPT_FLAG    = peek.OPT_FLAG
                 # OPT_FLAG in PTR can't be 0 (bit 1 must be 1), otherwise it is omitted
                 # omitted limits is the same as default
                 if OPT_FLAG:
@@ -1965,7 +3203,6 @@ cdef class stdfSummarizer:
                             sqlite3_bind_double(self.insertDynamicLimit_stmt, 4, HLimit)            # HLimit
                         err = csqlite3_step(self.insertDynamicLimit_stmt)
 
-        free_record(recHeader, self.pRec)
         return err
                             
             
@@ -2834,5 +4071,10 @@ cdef class stdfSummarizer:
 
     
 class stdfDataRetriever:
-    def __init__(self, filepath, dbPath, QSignal=None, flag=None):
-        self.summarizer = stdfSummarizer(QSignal=QSignal, flag=flag, filepath=filepath, dbPath=dbPath)            
+    def __init__(self, filepath, dbPath, QSignal=None, flag=None, useMmap=True, queueBytes=QUEUE_BYTES, workers=1, eagerValues=False, inMemory=False, gzIndexSpacing=GZ_INDEX_SPACING, decompressThreads=DECOMPRESS_THREADS, transcode=False):
+        self.summarizer = stdfSummarizer(QSignal=QSignal, flag=flag, filepath=filepath, dbPath=dbPath, useMmap=useMmap, queueBytes=queueBytes, 
+                                         workers=workers, eagerValues=eagerValues, inMemory=inMemory, gzIndexSpacing=gzIndexSpacing, 
+                                         decompressThreads=decompressThreads, transcode=transcode)
+        # bytes of parse queue in use at peak, equals queueCapacity if parser was ever throttled by the sqlite writer
+        self.queueHighWater = self.summarizer.queueHighWater
+        self.queueCapacity = self.summarizer.queueCapacity            
@@ -50,6 +50,34 @@ include_dirs      = [numpy.get_include()]                                    # n
 macros            = [("_LARGEFILE64_SOURCE", 1),                             # enable 64bit for zlib
                      ("NPY_NO_DEPRECATED_API", "NPY_1_7_API_VERSION")]       # suppress numpy deprecate warning
 
+# xz decoder, liblzma is not bundled in stdf4_src like zlib & bzip2. 
+# it is linked if lzma.h and the library are found, otherwise xz & lzma files are 
+# rejected at ingest. set CYSTDF_LZMA=1 to require it, CYSTDF_LZMA=0 to skip it
+def hasLzma() -> bool:
+      import tempfile
+      from distutils.ccompiler import new_compiler
+      from distutils.sysconfig import customize_compiler
+      from distutils.errors import CCompilerError, DistutilsError
+      compiler = new_compiler(compiler="mingw32" if isWindows else None)
+      customize_compiler(compiler)
+      with tempfile.TemporaryDirectory() as tmpDir:
+            src = os.path.join(tmpDir, "lzma_check.c")
+            with open(src, "w") as f:
+                  f.write("#include <lzma.h>\nint main(void) { return lzma_version_number() == 0; }\n")
+            try:
+                  objs = compiler.compile([src], output_dir=tmpDir)
+                  compiler.link_executable(objs, os.path.join(tmpDir, "lzma_check"), libraries=["lzma"])
+            except (CCompilerError, DistutilsError):
+                  return False
+      return True
+
+useLzma = os.environ.get("CYSTDF_LZMA", "")
+if useLzma == "1" or (useLzma != "0" and hasLzma()):
+      libraries.append('lzma')
+      macros.append(("HAVE_LZMA", 1))
+else:
+      print("liblzma is not found, cystdf is built without xz & lzma support")
+
 # openmp
 if isMac:
       include_dirs.append(os.path.join(os.getcwd(), "libomp", "include"))
@@ -87,4 +115,6 @@ setup(ext_modules = cythonize(Extension(
       )))
 
 # python3 cystdf_amalgamation_setup.py build_ext --inplace
-# python cystdf_amalgamation_setup.py build_ext --inplace --compile=mingw32
\ No newline at end of file
+# python cystdf_amalgamation_setup.py build_ext --inplace --compile=mingw32
+# xz & lzma support needs the headers and library of liblzma: 
+#   debian/ubuntu: apt install liblzma-dev, macos: brew install xz, msys2 mingw: pacman -S mingw-w64-x86_64-xz
\ No newline at end of file
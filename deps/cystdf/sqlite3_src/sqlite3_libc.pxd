@@ -33,7 +33,9 @@ cdef extern from "sqlite3_35_3.c" nogil:
 cdef extern from "sqlite3_35_3.h" nogil:
     cdef enum:
         SQLITE_OK
+        SQLITE_ROW
         SQLITE_DONE
+        SQLITE_NULL
     ctypedef long long int sqlite3_int64
     ctypedef struct sqlite3:
         pass
@@ -42,6 +44,8 @@ cdef extern from "sqlite3_35_3.h" nogil:
         pass
     ctypedef struct sqlite3_stmt:
         pass
+    ctypedef struct sqlite3_backup:
+        pass
 
     int sqlite3_open(const char *filename, sqlite3 **db_ptr)
     int sqlite3_close(sqlite3 *db)
@@ -81,5 +85,17 @@ cdef extern from "sqlite3_35_3.h" nogil:
     int sqlite3_bind_zeroblob64(sqlite3_stmt*, int, sqlite3_uint64)
     int sqlite3_clear_bindings(sqlite3_stmt*)
 
+    int sqlite3_column_int(sqlite3_stmt*, int iCol)
+    sqlite3_int64 sqlite3_column_int64(sqlite3_stmt*, int iCol)
+    double sqlite3_column_double(sqlite3_stmt*, int iCol)
+    const void *sqlite3_column_blob(sqlite3_stmt*, int iCol)
+    int sqlite3_column_bytes(sqlite3_stmt*, int iCol)
+    int sqlite3_column_type(sqlite3_stmt*, int iCol)
+
+    sqlite3_backup *sqlite3_backup_init(sqlite3 *pDest, const char *zDestName,
+                                        sqlite3 *pSource, const char *zSourceName)
+    int sqlite3_backup_step(sqlite3_backup *p, int nPage)
+    int sqlite3_backup_finish(sqlite3_backup *p)
+
     const char *sqlite3_errmsg(sqlite3* db)
     const char *sqlite3_errstr(int)
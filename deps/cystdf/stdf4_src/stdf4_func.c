@@ -189,6 +189,8 @@ void read_Cn(Cn* desptr, const unsigned char* rawData, uint16_t binaryLen, uint1
         // read count
         count = rawData[*pos];
         (*pos) += sizeof(U1);
+        // truncated string, never read beyond the record
+        if (count > binaryLen - *pos) { count = (U1)(binaryLen - *pos); }
 
         if (count) {
             // read string if count is not 0
@@ -214,9 +216,11 @@ void read_Bn(Bn* desptr, const unsigned char* rawData, uint16_t binaryLen, uint1
     if (*pos < binaryLen) {
         // read count
         count = rawData[*pos];
+        (*pos) += sizeof(U1);
+        // truncated data, never read beyond the record
+        if (count > binaryLen - *pos) { count = (U1)(binaryLen - *pos); }
         // save count to byteCnt if it's not NULL
         if (byteCnt) { *byteCnt = (uint16_t)count; }
-        (*pos) += sizeof(U1);
         if (count) {
             // read string if count is not 0
             memcpy(*desptr, &rawData[*pos], count);
@@ -1044,6 +1048,189 @@ void parse_DTR(void** pRec, const unsigned char* rawData, uint16_t binaryLen) {
 
 
 
+// Peek test records
+// read_X functions are used for fixed length fields, variable length fields are skipped
+// or copied to a fixed buffer, positions advance exactly the same as in parse_X
+static void peek_Cn(C1* desbuf, const unsigned char* rawData, uint16_t binaryLen, uint16_t* pos) {
+    U1 count = 0;
+    if (*pos < binaryLen) {
+        count = rawData[*pos];
+        (*pos) += sizeof(U1);
+        if (count > binaryLen - *pos) { count = (U1)(binaryLen - *pos); }
+        if (desbuf) { memcpy(desbuf, &rawData[*pos], count); }
+        (*pos) += count;
+    }
+    if (desbuf) { desbuf[count] = '\0'; }
+}
+
+static void skip_Dn(const unsigned char* rawData, uint16_t binaryLen, uint16_t* pos) {
+    U2 bitcount = 0;
+    U2 bytecount = 0;
+    if (*pos + sizeof(U2) <= binaryLen) {
+        memcpy(&bitcount, &rawData[*pos], sizeof(U2));
+        if (needByteSwap) {
+            SwapBytes(&bitcount, sizeof(U2));
+        }
+        (*pos) += sizeof(U2);
+        bytecount = (bitcount/8 + bitcount%8);
+        if (bytecount != 0 && (*pos + bytecount <= binaryLen)) {
+            (*pos) += bytecount;
+        }
+    }
+}
+
+static void skip_kxN1(uint16_t k, uint16_t binaryLen, uint16_t* pos) {
+    U2 bytecount = k/2 + k%2;
+    if (k != 0 && *pos + bytecount <= binaryLen) {
+        (*pos) += bytecount;
+    }
+}
+
+static void skip_kxU2R4(uint16_t k, uint16_t size, uint16_t binaryLen, uint16_t* pos) {
+    // each element is read only if all its bytes are available
+    uint16_t avail = (*pos < binaryLen) ? (binaryLen - *pos) / size : 0;
+    (*pos) += size * (k < avail ? k : avail);
+}
+
+void peek_TR(uint16_t recHeader, const unsigned char* rawData, uint16_t binaryLen, void* peek) {
+    TR_PEEK* p = (TR_PEEK*)peek;
+    uint16_t pos = 0;
+    B1 tmpB1;
+    U2 RTN_ICNT, RSLT_PGM_CNT;
+    I1 tmpI1;
+
+    p->OPT_FLAG = 0;
+    p->LO_LIMIT = 0;
+    p->HI_LIMIT = 0;
+    read_U4(&p->TEST_NUM, rawData, binaryLen, &pos);
+    read_U1(&p->HEAD_NUM, rawData, binaryLen, &pos);
+    read_U1(&p->SITE_NUM, rawData, binaryLen, &pos);
+
+    switch (recHeader) {
+        case REC_PTR:
+            read_B1(&tmpB1, rawData, binaryLen, &pos);          // TEST_FLG
+            read_B1(&tmpB1, rawData, binaryLen, &pos);          // PARM_FLG
+            pos = (pos + sizeof(R4) <= binaryLen) ? pos + sizeof(R4) : pos;    // RESULT
+            peek_Cn(p->TEST_TXT, rawData, binaryLen, &pos);
+            peek_Cn(NULL, rawData, binaryLen, &pos);            // ALARM_ID
+            read_B1(&p->OPT_FLAG, rawData, binaryLen, &pos);
+            read_I1(&tmpI1, rawData, binaryLen, &pos);          // RES_SCAL
+            read_I1(&tmpI1, rawData, binaryLen, &pos);          // LLM_SCAL
+            read_I1(&tmpI1, rawData, binaryLen, &pos);          // HLM_SCAL
+            read_R4(&p->LO_LIMIT, rawData, binaryLen, &pos);
+            read_R4(&p->HI_LIMIT, rawData, binaryLen, &pos);
+            break;
+
+        case REC_MPR:
+            read_B1(&tmpB1, rawData, binaryLen, &pos);          // TEST_FLG
+            read_B1(&tmpB1, rawData, binaryLen, &pos);          // PARM_FLG
+            read_U2(&RTN_ICNT, rawData, binaryLen, &pos);
+            read_U2(&RSLT_PGM_CNT, rawData, binaryLen, &pos);
+            skip_kxN1(RTN_ICNT, binaryLen, &pos);               // RTN_STAT
+            skip_kxU2R4(RSLT_PGM_CNT, sizeof(R4), binaryLen, &pos);  // RTN_RSLT
+            peek_Cn(p->TEST_TXT, rawData, binaryLen, &pos);
+            break;
+
+        case REC_FTR:
+            read_B1(&tmpB1, rawData, binaryLen, &pos);          // TEST_FLG
+            read_B1(&tmpB1, rawData, binaryLen, &pos);          // OPT_FLAG
+            // CYCL_CNT, REL_VADR, REPT_CNT, NUM_FAIL, XFAIL_AD, YFAIL_AD, VECT_OFF
+            skip_kxU2R4(6, sizeof(U4), binaryLen, &pos);
+            skip_kxU2R4(1, sizeof(U2), binaryLen, &pos);
+            read_U2(&RTN_ICNT, rawData, binaryLen, &pos);
+            read_U2(&RSLT_PGM_CNT, rawData, binaryLen, &pos);
+            skip_kxU2R4(RTN_ICNT, sizeof(U2), binaryLen, &pos); // RTN_INDX
+            skip_kxN1(RTN_ICNT, binaryLen, &pos);               // RTN_STAT
+            skip_kxU2R4(RSLT_PGM_CNT, sizeof(U2), binaryLen, &pos);  // PGM_INDX
+            skip_kxN1(RSLT_PGM_CNT, binaryLen, &pos);           // PGM_STAT
+            skip_Dn(rawData, binaryLen, &pos);                  // FAIL_PIN
+            peek_Cn(NULL, rawData, binaryLen, &pos);            // VECT_NAM
+            peek_Cn(NULL, rawData, binaryLen, &pos);            // TIME_SET
+            peek_Cn(NULL, rawData, binaryLen, &pos);            // OP_CODE
+            peek_Cn(p->TEST_TXT, rawData, binaryLen, &pos);
+            break;
+
+        default:
+            p->TEST_TXT[0] = '\0';
+            break;
+    }
+}
+
+
+// TEST_FLG & RESULT of PTR, TEST_FLG of FTR, without allocation
+void decode_TR(uint16_t recHeader, const unsigned char* rawData, uint16_t binaryLen, B1* flag, R4* result) {
+    uint16_t pos = 0;
+    U4 tmpU4;
+    U1 tmpU1;
+    B1 tmpB1;
+
+    if (binaryLen >= 12) {
+        // TEST_NUM, HEAD_NUM & SITE_NUM are complete, fields are at fixed offsets
+        *flag = rawData[6];
+        if (recHeader == REC_PTR) {
+            memcpy(result, &rawData[8], sizeof(R4));
+            if (needByteSwap) {
+                SwapBytes(result, sizeof(R4));
+            }
+        }
+        return;
+    }
+    // truncated record, read fields in order as `parse_record`
+    read_U4(&tmpU4, rawData, binaryLen, &pos);
+    read_U1(&tmpU1, rawData, binaryLen, &pos);
+    read_U1(&tmpU1, rawData, binaryLen, &pos);
+    read_B1(flag, rawData, binaryLen, &pos);
+    if (recHeader == REC_PTR) {
+        read_B1(&tmpB1, rawData, binaryLen, &pos);      // PARM_FLG
+        read_R4(result, rawData, binaryLen, &pos);
+    }
+}
+
+// locate RTN_STAT & RTN_RSLT of MPR as `parse_record` reads them, only the fixed fields are read
+void locate_MPR(const unsigned char* rawData, uint16_t binaryLen, void* layout) {
+    MPR_LAYOUT* l = (MPR_LAYOUT*)layout;
+    uint16_t pos = 0;
+    uint16_t avail;
+    U4 tmpU4;
+    U1 tmpU1;
+    B1 tmpB1;
+
+    read_U4(&tmpU4, rawData, binaryLen, &pos);
+    read_U1(&tmpU1, rawData, binaryLen, &pos);
+    read_U1(&tmpU1, rawData, binaryLen, &pos);
+    read_B1(&l->TEST_FLG, rawData, binaryLen, &pos);
+    read_B1(&tmpB1, rawData, binaryLen, &pos);          // PARM_FLG
+    read_U2(&l->STAT_CNT, rawData, binaryLen, &pos);
+    read_U2(&l->RSLT_CNT, rawData, binaryLen, &pos);
+
+    l->STAT_POS = pos;
+    // incomplete RTN_STAT is omitted, as read_kxN1
+    if (l->STAT_CNT > 0 && pos + l->STAT_CNT/2 + l->STAT_CNT%2 <= binaryLen) {
+        pos += l->STAT_CNT/2 + l->STAT_CNT%2;
+    } else {
+        l->STAT_CNT = 0;
+    }
+    l->RSLT_POS = pos;
+    avail = (pos < binaryLen) ? (binaryLen - pos) / sizeof(R4) : 0;
+    l->RSLT_AVAIL = (avail < l->RSLT_CNT) ? avail : l->RSLT_CNT;
+}
+
+// read a nibble of kxN1 array
+uint8_t decode_N1(const unsigned char* rawData, uint16_t index) {
+    return (index % 2) ? (rawData[index/2] & 0xF0) >> 4 : rawData[index/2] & 0x0F;
+}
+
+// read R4 at rawData, byte swapped if needed
+float decode_R4(const unsigned char* rawData) {
+    R4 value;
+    memcpy(&value, rawData, sizeof(R4));
+    if (needByteSwap) {
+        SwapBytes(&value, sizeof(R4));
+    }
+    return value;
+}
+
+
 void parse_record(void** pRec, uint16_t recHeader, const unsigned char* rawData, uint16_t binaryLen){
     switch (recHeader) {
         case REC_FAR: parse_FAR(pRec, rawData, binaryLen); break;
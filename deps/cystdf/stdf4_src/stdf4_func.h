@@ -33,3 +33,13 @@ extern int needByteSwap;
 void parse_record(void** pRec, uint16_t recHeader, const unsigned char* rawData, uint16_t binaryLen);
 
 void free_record(uint16_t recHeader, void* record);
+
+void peek_TR(uint16_t recHeader, const unsigned char* rawData, uint16_t binaryLen, void* peek);
+
+void decode_TR(uint16_t recHeader, const unsigned char* rawData, uint16_t binaryLen, uint8_t* flag, float* result);
+
+void locate_MPR(const unsigned char* rawData, uint16_t binaryLen, void* layout);
+
+uint8_t decode_N1(const unsigned char* rawData, uint16_t index);
+
+float decode_R4(const unsigned char* rawData);
@@ -30,13 +30,20 @@
 #include <stdlib.h>
 #include <string.h>
 #include <ctype.h>
+#include <errno.h>
 #include <fcntl.h>
 #include <wchar.h>
+#include <pthread.h>
 #ifdef _WIN32
     #include <io.h>
     #include <share.h>
     #include <locale.h>
     #include <stdio.h>
+    #include <windows.h>
+#else
+    #include <unistd.h>
+    #include <sys/mman.h>
+    #include <sys/stat.h>
 #endif
 
 int get_fd_with_unicode_path(const char* utf8_filename, const wchar_t* wchar_filename) {
@@ -110,6 +117,79 @@ stdf_fops stdf_fops_org = {
 
 
 /* GZ */
+// gzip is inflated here instead of gzread, so that seek points can be recorded
+#define GZ_CHUNK    (1 << 17)
+
+typedef struct _gz_reader {
+    FILE*           f;
+    z_stream        strm;
+    uint64_t        totread;        // compressed bytes read from file
+    uint64_t        totin;          // compressed bytes consumed by inflate
+    uint64_t        totout;         // uncompressed bytes
+    int             memberEnd;      // end of a gzip member is reached
+    unsigned char   window[GZ_WINDOW_SIZE];     // circular buffer of the latest output
+    unsigned char   in[GZ_CHUNK];
+} gz_reader;
+
+void gz_index_clear(gz_index* index) {
+    if (index == NULL) {
+        return;
+    }
+    for (uint32_t i = 0; i < index->npoints; i++) {
+        free(index->points[i].window);
+    }
+    free(index->points);
+    index->points = NULL;
+    index->npoints = 0;
+    index->capacity = 0;
+    index->compressed_size = 0;
+    index->uncompressed_size = 0;
+    index->complete = 0;
+}
+
+static void gz_update_window(gz_reader* gz, const unsigned char* out, uint64_t len) {
+    // position in window of the first byte to copy, totout is not yet advanced
+    uint64_t start = gz->totout;
+    if (len >= GZ_WINDOW_SIZE) {
+        start += len - GZ_WINDOW_SIZE;
+        out += len - GZ_WINDOW_SIZE;
+        len = GZ_WINDOW_SIZE;
+    }
+    uint32_t pos = (uint32_t)(start % GZ_WINDOW_SIZE);
+    uint32_t first = GZ_WINDOW_SIZE - pos < len ? GZ_WINDOW_SIZE - pos : (uint32_t)len;
+    memcpy(gz->window + pos, out, first);
+    memcpy(gz->window, out + first, (size_t)len - first);
+}
+
+static int gz_add_point(gz_reader* gz, gz_index* index, int memberStart) {
+    if (index->npoints == index->capacity) {
+        uint32_t capacity = index->capacity ? 2 * index->capacity : 64;
+        gz_point* points = (gz_point*)realloc(index->points, capacity * sizeof(gz_point));
+        if (points == NULL) {
+            return NO_MEMORY;
+        }
+        index->points = points;
+        index->capacity = capacity;
+    }
+    gz_point* p = &index->points[index->npoints];
+    p->cmp_offset = gz->totin;
+    p->uncmp_offset = gz->totout;
+    p->bits = (uint8_t)(gz->strm.data_type & 7);
+    p->window = NULL;
+    if (!memberStart) {
+        // unwrap circular window, oldest byte first
+        p->window = (unsigned char*)malloc(GZ_WINDOW_SIZE);
+        if (p->window == NULL) {
+            return NO_MEMORY;
+        }
+        uint32_t pos = (uint32_t)(gz->totout % GZ_WINDOW_SIZE);
+        memcpy(p->window, gz->window + pos, GZ_WINDOW_SIZE - pos);
+        memcpy(p->window + GZ_WINDOW_SIZE - pos, gz->window, pos);
+    }
+    index->npoints++;
+    return STD_OK;
+}
+
 int _stdf_open_gz(void* stdf, void* filename){
     STDF* std = (STDF*)stdf;
 #ifdef _WIN32
@@ -117,37 +197,110 @@ int _stdf_open_gz(void* stdf, void* filename){
 #else
     int fd = get_fd_with_unicode_path((char*)filename, NULL);
 #endif
-    std->gzF = gzdopen(fd, "rb");
-
-    if (std->gzF == NULL) {
+    gz_reader* gz = (gz_reader*)calloc(1, sizeof(gz_reader));
+    if (gz == NULL) {
+#ifdef _WIN32
+        if (fd >= 0) _close(fd);
+#else
+        if (fd >= 0) close(fd);
+#endif
+        return NO_MEMORY;
+    }
+#ifdef _WIN32
+    gz->f = fd < 0 ? NULL : _wfdopen(fd, L"rb");
+#else
+    gz->f = fd < 0 ? NULL : fdopen(fd, "rb");
+#endif
+    // 32 + 15: detect gzip header, max window
+    if (gz->f == NULL || inflateInit2(&gz->strm, 32 + 15) != Z_OK) {
         printf("file handler is null, failed to open %s\n", (char*)filename);
-        gzclose(std->gzF);
+        if (gz->f) fclose(gz->f);
+        free(gz);
         return OS_FAIL;
     }
+    std->gzReader = gz;
+    // points are recorded from the start on every open
+    gz_index_clear(std->gzIndex);
     return STD_OK;
 }
 
 int _stdf_read_gz(void* stdf, void* buf, int length){
     STDF* std = (STDF*)stdf;
-    int nread = gzread(std->gzF, buf, length);
-    if (nread != length) {
-        return STD_EOF;
-    }
-    return STD_OK;
-}
+    gz_reader* gz = (gz_reader*)std->gzReader;
+    gz_index* index = std->gzIndex;
+    int ret;
 
-int _stdf_skip_gz(void* stdf, int num){
-    STDF* std = (STDF*)stdf;
-    if (gzseek(std->gzF, num, SEEK_CUR) != 0){
-        return OS_FAIL;
+    gz->strm.next_out = (unsigned char*)buf;
+    gz->strm.avail_out = (uInt)length;
+    while (gz->strm.avail_out > 0) {
+        if (gz->strm.avail_in == 0) {
+            size_t n = fread(gz->in, 1, GZ_CHUNK, gz->f);
+            if (n == 0) {
+                if (index && gz->memberEnd) {
+                    index->compressed_size = gz->totread;
+                    index->uncompressed_size = gz->totout;
+                    index->complete = 1;
+                }
+                break;
+            }
+            gz->totread += n;
+            gz->strm.next_in = gz->in;
+            gz->strm.avail_in = (uInt)n;
+        }
+        if (gz->memberEnd) {
+            // concatenated member, anything else is trailing garbage and ignored as gzread does
+            if (gz->strm.next_in[0] != 0x1f || inflateReset(&gz->strm) != Z_OK) {
+                break;
+            }
+            gz->memberEnd = 0;
+        }
+        unsigned char* out = gz->strm.next_out;
+        uInt before_in = gz->strm.avail_in;
+        uInt before_out = gz->strm.avail_out;
+        // Z_BLOCK returns at the end of header and every deflate block
+        ret = inflate(&gz->strm, index ? Z_BLOCK : Z_NO_FLUSH);
+        gz->totin += before_in - gz->strm.avail_in;
+        if (before_out != gz->strm.avail_out) {
+            gz_update_window(gz, out, before_out - gz->strm.avail_out);
+            gz->totout += before_out - gz->strm.avail_out;
+        }
+        if (ret == Z_STREAM_END) {
+            gz->memberEnd = 1;
+            continue;
+        }
+        if (ret != Z_OK && ret != Z_BUF_ERROR) {
+            // corrupted data, treated as end of file
+            break;
+        }
+        // a point at the start of a block that is not the last one, 
+        // the first point of a member is just after the header
+        if (index && (gz->strm.data_type & 128) && !(gz->strm.data_type & 64) && 
+            (index->npoints == 0 || gz->totout - index->points[index->npoints-1].uncmp_offset >= index->spacing)) {
+            int memberStart = gz->strm.total_out == 0;
+            if (gz_add_point(gz, index, memberStart) != STD_OK) {
+                // stop recording, the index is incomplete
+                gz_index_clear(index);
+                std->gzIndex = index = NULL;
+            }
+        }
+    }
+    if (gz->strm.avail_out != 0) {
+        return STD_EOF;
     }
     return STD_OK;
 }
 
 int _stdf_close_gz(void* stdf){
     STDF* std = (STDF*)stdf;
-    int status = gzclose(std->gzF);
-    if (status != Z_OK) {
+    gz_reader* gz = (gz_reader*)std->gzReader;
+    if (gz == NULL) {
+        return STD_OK;
+    }
+    inflateEnd(&gz->strm);
+    int status = fclose(gz->f);
+    free(gz);
+    std->gzReader = NULL;
+    if (status != 0) {
         return OS_FAIL;
     }
     return STD_OK;
@@ -162,6 +315,401 @@ stdf_fops stdf_fops_gz = {
 
 
 /* BZ & BZ2 */
+// blocks are located by their 48-bit magic and decompressed by a pool of threads, 
+// each block as a standalone stream, then handed to the reader in file order
+#define BZ_BLOCK_MAGIC      0x314159265359ULL
+#define BZ_EOS_MAGIC        0x177245385090ULL
+#define BZ_MAGIC_MASK       0xFFFFFFFFFFFFULL
+#define BZ_SCAN_CHUNK       (1 << 22)
+#define BZ_OUT_CHUNK        (1 << 20)
+#define BZ_SLOTS_PER_THREAD 2
+
+enum {BZ_SLOT_FREE = 0, BZ_SLOT_BUSY, BZ_SLOT_DONE, BZ_SLOT_ERROR};
+
+typedef struct _bz_slot {
+    uint64_t        seq;            // order of block in file
+    uint64_t        bit_start;      // block magic
+    uint64_t        bit_end;        // next block magic or end of stream marker
+    int             eos;            // block is the last of a stream
+    int             state;
+    unsigned char*  raw;            // bytes covering [bit_start, bit_end)
+    size_t          raw_len, raw_cap;
+    unsigned char*  in;             // raw bits realigned into a single block stream
+    size_t          in_cap;
+    unsigned char*  out;
+    size_t          out_len, out_cap;
+} bz_slot;
+
+typedef struct _bz_reader {
+    FILE*           f;
+    pthread_mutex_t lock;
+    pthread_cond_t  cond;
+    pthread_t*      threads;
+    int             nthreads;
+    int             stop;
+    // scanner, guarded by lock
+    unsigned char*  sbuf;
+    size_t          slen, scap;
+    uint64_t        sbase;          // file offset of sbuf[0]
+    uint64_t        spos;           // file offset of the next byte to scan
+    uint64_t        reg;            // latest 64 bits scanned
+    uint64_t        blk_start;      // magic of the block being scanned
+    int             has_blk;
+    int             scan_done, scan_error;
+    // blocks in flight, guarded by lock
+    bz_slot*        slots;
+    int             nslots;
+    uint64_t        next_seq;       // next block to scan
+    uint64_t        read_seq;       // block being read
+    // reader only
+    bz_slot*        cur;
+    int             cur_span;       // number of slots merged into cur
+    size_t          out_pos;
+    uint64_t        data_start;     // uncompressed offset of cur
+    int             last_eos;
+} bz_reader;
+
+void bz_index_clear(bz_index* index) {
+    if (index == NULL) {
+        return;
+    }
+    free(index->blocks);
+    index->blocks = NULL;
+    index->nblocks = 0;
+    index->capacity = 0;
+    index->complete = 0;
+}
+
+static int bz_index_add(bz_index* index, uint64_t bit_offset, uint64_t data_offset) {
+    if (index->nblocks == index->capacity) {
+        uint32_t capacity = index->capacity ? 2 * index->capacity : 256;
+        bz_block* blocks = (bz_block*)realloc(index->blocks, capacity * sizeof(bz_block));
+        if (blocks == NULL) {
+            return NO_MEMORY;
+        }
+        index->blocks = blocks;
+        index->capacity = capacity;
+    }
+    index->blocks[index->nblocks].bit_offset = bit_offset;
+    index->blocks[index->nblocks].data_offset = data_offset;
+    index->nblocks++;
+    return STD_OK;
+}
+
+static int bz_reserve(unsigned char** buf, size_t* cap, size_t size) {
+    if (*cap >= size) {
+        return STD_OK;
+    }
+    size_t newCap = *cap ? *cap : BZ_OUT_CHUNK;
+    while (newCap < size) {
+        newCap *= 2;
+    }
+    unsigned char* p = (unsigned char*)realloc(*buf, newCap);
+    if (p == NULL) {
+        return NO_MEMORY;
+    }
+    *buf = p;
+    *cap = newCap;
+    return STD_OK;
+}
+
+// read more of the file into scan buffer, bytes of the pending block are kept
+static int bz_refill(bz_reader* bz) {
+    // a magic found later may start in the last bytes scanned
+    uint64_t keep = bz->has_blk ? bz->blk_start / 8 : (bz->spos > bz->sbase + 8 ? bz->spos - 8 : bz->sbase);
+    size_t drop = (size_t)(keep - bz->sbase);
+    if (drop) {
+        memmove(bz->sbuf, bz->sbuf + drop, bz->slen - drop);
+        bz->slen -= drop;
+        bz->sbase = keep;
+    }
+    if (bz_reserve(&bz->sbuf, &bz->scap, bz->slen + BZ_SCAN_CHUNK) != STD_OK) {
+        return -1;
+    }
+    size_t n = fread(bz->sbuf + bz->slen, 1, BZ_SCAN_CHUNK, bz->f);
+    bz->slen += n;
+    return n > 0;
+}
+
+// find the next magic that starts at or after min_bit, 
+// end of stream marker is ignored unless any is set
+static int bz_find_magic(bz_reader* bz, uint64_t min_bit, int any, uint64_t* found, int* isEos) {
+    int status;
+    for (;;) {
+        while (bz->spos < bz->sbase + bz->slen) {
+            bz->reg = (bz->reg << 8) | bz->sbuf[bz->spos - bz->sbase];
+            bz->spos++;
+            uint64_t end = bz->spos * 8;
+            for (int s = 7; s >= 0; s--) {
+                uint64_t v = (bz->reg >> s) & BZ_MAGIC_MASK;
+                if ((v == BZ_BLOCK_MAGIC || (any && v == BZ_EOS_MAGIC)) && end >= (uint64_t)s + 48 && end - s - 48 >= min_bit) {
+                    *found = end - s - 48;
+                    *isEos = v == BZ_EOS_MAGIC;
+                    return 1;
+                }
+            }
+        }
+        if ((status = bz_refill(bz)) <= 0) {
+            return status;
+        }
+    }
+}
+
+// put the next block into slot, return 1 if found, 0 at end of file, -1 if out of memory
+static int bz_scan_block(bz_reader* bz, bz_slot* slot) {
+    uint64_t end = 0;
+    int isEos = 0, found;
+    if (!bz->has_blk) {
+        // stream header, or padding and header of the next stream
+        found = bz_find_magic(bz, 0, 0, &bz->blk_start, &isEos);
+        if (found <= 0) {
+            return found;
+        }
+        bz->has_blk = 1;
+    }
+    found = bz_find_magic(bz, bz->blk_start + 48, 1, &end, &isEos);
+    if (found < 0) {
+        return found;
+    }
+    if (found == 0) {
+        // truncated file, the last block fails to decompress
+        end = (bz->sbase + bz->slen) * 8;
+        isEos = 0;
+    }
+    uint64_t first = bz->blk_start / 8;
+    size_t len = (size_t)((end + 7) / 8 - first);
+    if (bz_reserve(&slot->raw, &slot->raw_cap, len) != STD_OK) {
+        return -1;
+    }
+    memcpy(slot->raw, bz->sbuf + (first - bz->sbase), len);
+    slot->raw_len = len;
+    slot->bit_start = bz->blk_start;
+    slot->bit_end = end;
+    slot->eos = found && isEos;
+    if (found && !isEos) {
+        bz->blk_start = end;
+    } else {
+        bz->has_blk = 0;
+    }
+    return 1;
+}
+
+// realign bits of raw into a stream of a single block and decompress it
+static int bz_decode(bz_slot* slot) {
+    uint32_t shift = (uint32_t)(slot->bit_start % 8);
+    uint64_t nbits = slot->bit_end - slot->bit_start;
+    const unsigned char* raw = slot->raw;
+    // magic and block crc at least
+    if (nbits < 80) {
+        return INVAILD_STDF;
+    }
+    size_t whole = (size_t)(nbits / 8);
+    if (bz_reserve(&slot->in, &slot->in_cap, whole + 16) != STD_OK) {
+        return NO_MEMORY;
+    }
+    unsigned char* p = slot->in;
+    // level 9 accepts blocks of any level
+    memcpy(p, "BZh9", 4);
+    size_t n = 4;
+    if (shift == 0) {
+        memcpy(p + n, raw, whole);
+    } else {
+        for (size_t i = 0; i < whole; i++) {
+            p[n + i] = (unsigned char)((raw[i] << shift) | (raw[i+1] >> (8 - shift)));
+        }
+    }
+    n += whole;
+    uint32_t rem = (uint32_t)(nbits % 8);
+    uint64_t acc = 0;
+    uint32_t nacc = 0;
+    if (rem) {
+        uint32_t two = (uint32_t)raw[whole] << 8 | (whole + 1 < slot->raw_len ? raw[whole+1] : 0);
+        acc = (two >> (16 - shift - rem)) & ((1u << rem) - 1);
+        nacc = rem;
+    }
+    // combined crc of a single block stream equals the block crc after magic
+    uint32_t crc = 0;
+    for (int k = 6; k < 10; k++) {
+        crc = (crc << 8) | (shift ? (unsigned char)((raw[k] << shift) | (raw[k+1] >> (8 - shift))) : raw[k]);
+    }
+    acc = (acc << 48) | BZ_EOS_MAGIC;
+    nacc += 48;
+    while (nacc >= 8) {
+        p[n++] = (unsigned char)(acc >> (nacc - 8));
+        nacc -= 8;
+    }
+    acc = (acc << 32) | crc;
+    nacc += 32;
+    while (nacc >= 8) {
+        p[n++] = (unsigned char)(acc >> (nacc - 8));
+        nacc -= 8;
+    }
+    if (nacc) {
+        p[n++] = (unsigned char)(acc << (8 - nacc));
+    }
+
+    bz_stream strm;
+    memset(&strm, 0, sizeof(strm));
+    if (BZ2_bzDecompressInit(&strm, 0, 0) != BZ_OK) {
+        return NO_MEMORY;
+    }
+    strm.next_in = (char*)p;
+    strm.avail_in = (unsigned int)n;
+    slot->out_len = 0;
+    int ret;
+    do {
+        if (bz_reserve(&slot->out, &slot->out_cap, slot->out_len + BZ_OUT_CHUNK) != STD_OK) {
+            ret = BZ_MEM_ERROR;
+            break;
+        }
+        unsigned int avail = (unsigned int)(slot->out_cap - slot->out_len);
+        strm.next_out = (char*)slot->out + slot->out_len;
+        strm.avail_out = avail;
+        ret = BZ2_bzDecompress(&strm);
+        slot->out_len += avail - strm.avail_out;
+    } while (ret == BZ_OK && (strm.avail_in > 0 || strm.avail_out == 0));
+    BZ2_bzDecompressEnd(&strm);
+    return ret == BZ_STREAM_END ? STD_OK : INVAILD_STDF;
+}
+
+static void* bz_worker(void* arg) {
+    bz_reader* bz = (bz_reader*)arg;
+    pthread_mutex_lock(&bz->lock);
+    for (;;) {
+        while (!bz->stop && !bz->scan_done && bz->next_seq - bz->read_seq >= (uint64_t)bz->nslots) {
+            pthread_cond_wait(&bz->cond, &bz->lock);
+        }
+        if (bz->stop || bz->scan_done) {
+            break;
+        }
+        bz_slot* slot = &bz->slots[bz->next_seq % bz->nslots];
+        int found = bz_scan_block(bz, slot);
+        if (found <= 0) {
+            bz->scan_done = 1;
+            bz->scan_error = found < 0;
+            pthread_cond_broadcast(&bz->cond);
+            break;
+        }
+        slot->seq = bz->next_seq++;
+        slot->state = BZ_SLOT_BUSY;
+        pthread_mutex_unlock(&bz->lock);
+        int status = bz_decode(slot);
+        pthread_mutex_lock(&bz->lock);
+        slot->state = status == STD_OK ? BZ_SLOT_DONE : BZ_SLOT_ERROR;
+        pthread_cond_broadcast(&bz->cond);
+    }
+    pthread_mutex_unlock(&bz->lock);
+    return NULL;
+}
+
+static int bz_start(bz_reader* bz, int nthreads) {
+    nthreads = nthreads > 1 ? nthreads : 1;
+    bz->nslots = BZ_SLOTS_PER_THREAD * nthreads + 1;
+    bz->slots = (bz_slot*)calloc(bz->nslots, sizeof(bz_slot));
+    bz->threads = (pthread_t*)calloc(nthreads, sizeof(pthread_t));
+    if (bz->slots == NULL || bz->threads == NULL) {
+        return NO_MEMORY;
+    }
+    while (bz->nthreads < nthreads && pthread_create(&bz->threads[bz->nthreads], NULL, bz_worker, bz) == 0) {
+        bz->nthreads++;
+    }
+    return bz->nthreads ? STD_OK : OS_FAIL;
+}
+
+// wait until block seq is decompressed, lock is held. return 0 if there is no such block
+static int bz_wait_slot(bz_reader* bz, uint64_t seq) {
+    bz_slot* slot = &bz->slots[seq % bz->nslots];
+    for (;;) {
+        if (slot->seq == seq && (slot->state == BZ_SLOT_DONE || slot->state == BZ_SLOT_ERROR)) {
+            return 1;
+        }
+        if (bz->scan_done && bz->next_seq <= seq) {
+            return 0;
+        }
+        pthread_cond_wait(&bz->cond, &bz->lock);
+    }
+}
+
+// a magic may occur inside compressed data by chance and split a block, 
+// retry with following blocks appended, lock is held
+static int bz_merge_next(bz_reader* bz, bz_slot* slot) {
+    for (int k = 1; k < bz->nslots; k++) {
+        uint64_t seq = bz->read_seq + k;
+        if (!bz_wait_slot(bz, seq)) {
+            break;
+        }
+        bz_slot* next = &bz->slots[seq % bz->nslots];
+        if (slot->eos || next->bit_start != slot->bit_end) {
+            break;
+        }
+        size_t keep = (size_t)(next->bit_start / 8 - slot->bit_start / 8);
+        if (bz_reserve(&slot->raw, &slot->raw_cap, keep + next->raw_len) != STD_OK) {
+            break;
+        }
+        memcpy(slot->raw + keep, next->raw, next->raw_len);
+        slot->raw_len = keep + next->raw_len;
+        slot->bit_end = next->bit_end;
+        slot->eos = next->eos;
+        pthread_mutex_unlock(&bz->lock);
+        int status = bz_decode(slot);
+        pthread_mutex_lock(&bz->lock);
+        if (status == STD_OK) {
+            bz->cur_span = k + 1;
+            return STD_OK;
+        }
+    }
+    return INVAILD_STDF;
+}
+
+// release current block and move to the next one
+static int bz_next_block(STDF* std, bz_reader* bz) {
+    int status = STD_OK;
+    if (bz->threads == NULL && bz_start(bz, std->threads) != STD_OK) {
+        return NO_MEMORY;
+    }
+    pthread_mutex_lock(&bz->lock);
+    if (bz->cur) {
+        bz->data_start += bz->cur->out_len;
+        bz->last_eos = bz->cur->eos;
+        for (int k = 0; k < bz->cur_span; k++) {
+            bz->slots[bz->read_seq % bz->nslots].state = BZ_SLOT_FREE;
+            bz->read_seq++;
+        }
+        bz->cur = NULL;
+        pthread_cond_broadcast(&bz->cond);
+    }
+    bz->cur_span = 1;
+    if (!bz_wait_slot(bz, bz->read_seq)) {
+        if (std->bzIndex && !bz->scan_error && bz->last_eos) {
+            std->bzIndex->complete = 1;
+        }
+        // out of memory while scanning is not the end of file
+        status = bz->scan_error ? NO_MEMORY : STD_EOF;
+    } else {
+        bz_slot* slot = &bz->slots[bz->read_seq % bz->nslots];
+        if (slot->state == BZ_SLOT_ERROR) {
+            // corrupted block, unless it is split by a magic found in its data
+            status = bz_merge_next(bz, slot);
+        }
+        if (status == STD_OK) {
+            bz->cur = slot;
+            bz->out_pos = 0;
+        }
+    }
+    pthread_mutex_unlock(&bz->lock);
+
+    bz_index* index = std->bzIndex;
+    if (status == STD_OK && index) {
+        if (bz_index_add(index, bz->cur->bit_start, bz->data_start) != STD_OK ||
+            (bz->cur->eos && bz_index_add(index, bz->cur->bit_end, bz->data_start + bz->cur->out_len) != STD_OK)) {
+            // stop recording, the index is incomplete
+            bz_index_clear(index);
+            std->bzIndex = NULL;
+        }
+    }
+    return status;
+}
+
 int _stdf_open_bz(void* stdf, void* filename){
     STDF* std = (STDF*)stdf;
 #ifdef _WIN32
@@ -169,38 +717,97 @@ int _stdf_open_bz(void* stdf, void* filename){
 #else
     int fd = get_fd_with_unicode_path((char*)filename, NULL);
 #endif
-    std->bzF = BZ2_bzdopen(fd, "rb");
-
-    if (std->bzF == NULL) {
+    bz_reader* bz = (bz_reader*)calloc(1, sizeof(bz_reader));
+    if (bz == NULL) {
+#ifdef _WIN32
+        if (fd >= 0) _close(fd);
+#else
+        if (fd >= 0) close(fd);
+#endif
+        return NO_MEMORY;
+    }
+#ifdef _WIN32
+    bz->f = fd < 0 ? NULL : _wfdopen(fd, L"rb");
+#else
+    bz->f = fd < 0 ? NULL : fdopen(fd, "rb");
+#endif
+    if (bz->f == NULL) {
         printf("file handler is null, failed to open %s\n", (char*)filename);
-        BZ2_bzclose(std->bzF);
+        free(bz);
         return OS_FAIL;
     }
+    pthread_mutex_init(&bz->lock, NULL);
+    pthread_cond_init(&bz->cond, NULL);
+    // threads are started on the first read, after stdf_set_threads
+    std->bzReader = bz;
+    bz_index_clear(std->bzIndex);
     return STD_OK;
 }
 
 int _stdf_read_bz(void* stdf, void* buf, int length){
     STDF* std = (STDF*)stdf;
-    int nread = BZ2_bzread(std->bzF, buf, length);
-    if (nread != length) {
-        return STD_EOF;
+    bz_reader* bz = (bz_reader*)std->bzReader;
+    unsigned char* dst = (unsigned char*)buf;
+    while (length > 0) {
+        if (bz->cur == NULL || bz->out_pos == bz->cur->out_len) {
+            // STD_EOF only after the last block, a block failed to decompress is INVAILD_STDF
+            int status = bz_next_block(std, bz);
+            if (status != STD_OK) {
+                return status;
+            }
+            continue;
+        }
+        size_t n = bz->cur->out_len - bz->out_pos;
+        n = n < (size_t)length ? n : (size_t)length;
+        memcpy(dst, bz->cur->out + bz->out_pos, n);
+        bz->out_pos += n;
+        dst += n;
+        length -= (int)n;
     }
     return STD_OK;
 }
 
-int _stdf_skip_bz(void* stdf, int num){
-    char buf[num];
-    STDF* std = (STDF*)stdf;
-    int status = BZ2_bzread(std->bzF, buf, num);
-    if (status == -1) {
+// rewind without decompressing again if the first block is not released
+static int _stdf_rewind_bz(STDF* std) {
+    bz_reader* bz = (bz_reader*)std->bzReader;
+    if (bz == NULL || bz->read_seq != 0) {
         return OS_FAIL;
     }
+    bz->out_pos = 0;
     return STD_OK;
 }
 
 int _stdf_close_bz(void* stdf){
     STDF* std = (STDF*)stdf;
-    BZ2_bzclose(std->bzF);
+    bz_reader* bz = (bz_reader*)std->bzReader;
+    if (bz == NULL) {
+        return STD_OK;
+    }
+    pthread_mutex_lock(&bz->lock);
+    bz->stop = 1;
+    pthread_cond_broadcast(&bz->cond);
+    pthread_mutex_unlock(&bz->lock);
+    for (int k = 0; k < bz->nthreads; k++) {
+        pthread_join(bz->threads[k], NULL);
+    }
+    if (bz->slots) {
+        for (int k = 0; k < bz->nslots; k++) {
+            free(bz->slots[k].raw);
+            free(bz->slots[k].in);
+            free(bz->slots[k].out);
+        }
+    }
+    free(bz->slots);
+    free(bz->threads);
+    free(bz->sbuf);
+    pthread_cond_destroy(&bz->cond);
+    pthread_mutex_destroy(&bz->lock);
+    int status = fclose(bz->f);
+    free(bz);
+    std->bzReader = NULL;
+    if (status != 0) {
+        return OS_FAIL;
+    }
     return STD_OK;
 }
 
@@ -212,6 +819,181 @@ stdf_fops stdf_fops_bz = {
 };
 
 
+/* XZ & LZMA */
+#ifdef HAVE_LZMA
+// blocks of a multi-block xz file are decompressed by the threaded decoder of liblzma, 
+// legacy .lzma and single-threaded decoding use the auto decoder
+#define XZ_CHUNK        (1 << 17)
+#define XZ_OUT_CHUNK    (1 << 20)
+
+static const uint8_t XZ_MAGIC[6] = {0xFD, '7', 'z', 'X', 'Z', 0x00};
+
+typedef struct _xz_reader {
+    FILE*           f;
+    lzma_stream     strm;
+    int             started;        // decoder is initialized on the first read, after stdf_set_threads
+    int             end;            // end of the last stream
+    int             error;          // status of a failed decoding, the file is rejected
+    uint64_t        out_seq;        // number of output chunks decompressed
+    size_t          out_pos;
+    size_t          out_len;
+    unsigned char   in[XZ_CHUNK];
+    unsigned char   out[XZ_OUT_CHUNK];
+} xz_reader;
+
+static int xz_start(xz_reader* xz, int nthreads) {
+    lzma_ret ret;
+    size_t n = fread(xz->in, 1, XZ_CHUNK, xz->f);
+    xz->strm.next_in = xz->in;
+    xz->strm.avail_in = n;
+    xz->started = 1;
+#if LZMA_VERSION >= 50040002
+    if (nthreads > 1 && n >= sizeof(XZ_MAGIC) && !memcmp(xz->in, XZ_MAGIC, sizeof(XZ_MAGIC))) {
+        lzma_mt mt;
+        memset(&mt, 0, sizeof(mt));
+        mt.flags = LZMA_CONCATENATED;
+        mt.threads = (uint32_t)nthreads;
+        // fall back to single thread rather than using too much memory for huge blocks
+        mt.memlimit_threading = lzma_physmem() / 4;
+        mt.memlimit_stop = UINT64_MAX;
+        ret = lzma_stream_decoder_mt(&xz->strm, &mt);
+    } else
+#endif
+    {
+        (void)nthreads;
+        ret = lzma_auto_decoder(&xz->strm, UINT64_MAX, LZMA_CONCATENATED);
+    }
+    return ret == LZMA_OK ? STD_OK : NO_MEMORY;
+}
+
+static int xz_next_chunk(xz_reader* xz) {
+    lzma_ret ret;
+    xz->strm.next_out = xz->out;
+    xz->strm.avail_out = XZ_OUT_CHUNK;
+    while (!xz->end && !xz->error && xz->strm.avail_out > 0) {
+        lzma_action action = LZMA_RUN;
+        if (xz->strm.avail_in == 0) {
+            size_t n = fread(xz->in, 1, XZ_CHUNK, xz->f);
+            xz->strm.next_in = xz->in;
+            xz->strm.avail_in = n;
+            if (n == 0) {
+                action = LZMA_FINISH;
+            }
+        }
+        ret = lzma_code(&xz->strm, action);
+        if (ret == LZMA_STREAM_END) {
+            // end of the last stream, padding between streams is consumed by the decoder
+            xz->end = 1;
+        } else if (ret == LZMA_MEM_ERROR || ret == LZMA_MEMLIMIT_ERROR) {
+            xz->error = NO_MEMORY;
+        } else if (ret != LZMA_OK) {
+            // corrupted or truncated data, output of the chunk is not verified
+            xz->error = INVAILD_STDF;
+        }
+    }
+    xz->out_pos = 0;
+    xz->out_seq++;
+    if (xz->error) {
+        xz->out_len = 0;
+        return xz->error;
+    }
+    xz->out_len = XZ_OUT_CHUNK - xz->strm.avail_out;
+    return xz->out_len > 0 ? STD_OK : STD_EOF;
+}
+
+int _stdf_open_xz(void* stdf, void* filename){
+    STDF* std = (STDF*)stdf;
+#ifdef _WIN32
+    int fd = get_fd_with_unicode_path(NULL, (wchar_t*)filename);
+#else
+    int fd = get_fd_with_unicode_path((char*)filename, NULL);
+#endif
+    xz_reader* xz = (xz_reader*)calloc(1, sizeof(xz_reader));
+    if (xz == NULL) {
+#ifdef _WIN32
+        if (fd >= 0) _close(fd);
+#else
+        if (fd >= 0) close(fd);
+#endif
+        return NO_MEMORY;
+    }
+#ifdef _WIN32
+    xz->f = fd < 0 ? NULL : _wfdopen(fd, L"rb");
+#else
+    xz->f = fd < 0 ? NULL : fdopen(fd, "rb");
+#endif
+    if (xz->f == NULL) {
+        printf("file handler is null, failed to open %s\n", (char*)filename);
+        free(xz);
+        return OS_FAIL;
+    }
+    lzma_stream init = LZMA_STREAM_INIT;
+    xz->strm = init;
+    std->xzReader = xz;
+    return STD_OK;
+}
+
+int _stdf_read_xz(void* stdf, void* buf, int length){
+    STDF* std = (STDF*)stdf;
+    xz_reader* xz = (xz_reader*)std->xzReader;
+    unsigned char* dst = (unsigned char*)buf;
+    int status;
+    if (!xz->started && (status = xz_start(xz, std->threads)) != STD_OK) {
+        return status;
+    }
+    while (length > 0) {
+        if (xz->out_pos == xz->out_len) {
+            // STD_EOF only at the end of the last stream
+            if ((status = xz_next_chunk(xz)) != STD_OK) {
+                return status;
+            }
+            continue;
+        }
+        size_t n = xz->out_len - xz->out_pos;
+        n = n < (size_t)length ? n : (size_t)length;
+        memcpy(dst, xz->out + xz->out_pos, n);
+        xz->out_pos += n;
+        dst += n;
+        length -= (int)n;
+    }
+    return STD_OK;
+}
+
+// rewind without decompressing again if the first chunk is still held
+static int _stdf_rewind_xz(STDF* std) {
+    xz_reader* xz = (xz_reader*)std->xzReader;
+    if (xz == NULL || xz->out_seq > 1) {
+        return OS_FAIL;
+    }
+    xz->out_pos = 0;
+    return STD_OK;
+}
+
+int _stdf_close_xz(void* stdf){
+    STDF* std = (STDF*)stdf;
+    xz_reader* xz = (xz_reader*)std->xzReader;
+    if (xz == NULL) {
+        return STD_OK;
+    }
+    lzma_end(&xz->strm);
+    int status = fclose(xz->f);
+    free(xz);
+    std->xzReader = NULL;
+    if (status != 0) {
+        return OS_FAIL;
+    }
+    return STD_OK;
+}
+
+stdf_fops stdf_fops_xz = {
+    _stdf_open_xz,
+    _stdf_read_xz,
+    // _stdf_skip_xz,
+    _stdf_close_xz
+};
+#endif //HAVE_LZMA
+
+
 /* ZIP */
 int _stdf_open_zip(void* stdf, void* filename){
     STDF* std = (STDF*)stdf;
@@ -262,57 +1044,82 @@ stdf_fops stdf_fops_zip = {
 
 /* API */
 
-STDERR stdf_open(STDF** sh_ptr, void* filename) {
-    *sh_ptr = (STDF*)malloc(sizeof(STDF));
-    STDF* sh = *sh_ptr;
-    if (sh == NULL) {
-        free(sh);
-        return NO_MEMORY;
-    }
-    sh->filepath = filename;
-    
+stdf_format get_stdf_format(void* filename) {
 #ifdef _WIN32
     wchar_t* ext = wcsrchr((wchar_t*)filename, L'.');
+    if (ext == NULL) {
+        return NotCompressed;
+    }
     if (!_wcsnicmp(ext, L".gz", 3)){
-        sh->fmt = GZ_compressed;
+        return GZ_compressed;
     } else if (!_wcsnicmp(ext, L".bz", 3)){
-        sh->fmt = BZ_compressed;
+        return BZ_compressed;
     } else if (!_wcsnicmp(ext, L".bz2", 4)){
-        sh->fmt = BZ_compressed;
+        return BZ_compressed;
     } else if (!_wcsnicmp(ext, L".zip", 4)){
-        sh->fmt = ZIP_compressed;    
+        return ZIP_compressed;    
+    } else if (!_wcsnicmp(ext, L".xz", 3) || !_wcsnicmp(ext, L".lzma", 5)){
+        return XZ_compressed;
     } else {
-        sh->fmt = NotCompressed;
+        return NotCompressed;
     }
 #else
     char* ext = strrchr((char*)filename, '.');
+    if (ext == NULL) {
+        return NotCompressed;
+    }
     if (!strncasecmp(ext, ".gz", 3)){
-        sh->fmt = GZ_compressed;
+        return GZ_compressed;
     } else if (!strncasecmp(ext, ".bz", 3)){
-        sh->fmt = BZ_compressed;
+        return BZ_compressed;
     } else if (!strncasecmp(ext, ".bz2", 4)){
-        sh->fmt = BZ_compressed;
+        return BZ_compressed;
     } else if (!strncasecmp(ext, ".zip", 4)){
-        sh->fmt = ZIP_compressed;
+        return ZIP_compressed;
+    } else if (!strncasecmp(ext, ".xz", 3) || !strncasecmp(ext, ".lzma", 5)){
+        return XZ_compressed;
     } else {
-        sh->fmt = NotCompressed;
+        return NotCompressed;
     }
 #endif
+}
+
+STDERR stdf_open(STDF** sh_ptr, void* filename) {
+    *sh_ptr = (STDF*)malloc(sizeof(STDF));
+    STDF* sh = *sh_ptr;
+    if (sh == NULL) {
+        free(sh);
+        return NO_MEMORY;
+    }
+    sh->filepath = filename;
+    sh->gzIndex = NULL;
+    sh->bzIndex = NULL;
+    sh->threads = 1;
+    sh->copyF = NULL;
+    sh->copyError = 0;
+    
+    sh->fmt = get_stdf_format(filename);
 
     // set file operations
     switch (sh->fmt) {
     case GZ_compressed:
-        sh->gzF = NULL;
+        sh->gzReader = NULL;
         sh->fops = &stdf_fops_gz;
         break;
     case BZ_compressed:
-        sh->bzF = NULL;
+        sh->bzReader = NULL;
         sh->fops = &stdf_fops_bz;
         break;
     case ZIP_compressed:
         sh->zipF = NULL;
         sh->fops = &stdf_fops_zip;
         break;
+#ifdef HAVE_LZMA
+    case XZ_compressed:
+        sh->xzReader = NULL;
+        sh->fops = &stdf_fops_xz;
+        break;
+#endif
     
     default:
         /* treat as a uncompressed stdf */
@@ -325,7 +1132,29 @@ STDERR stdf_open(STDF** sh_ptr, void* filename) {
     return sh->fops->stdf_open(sh, sh->filepath);
 }
 
+int stdf_xz_supported(void) {
+#ifdef HAVE_LZMA
+    return 1;
+#else
+    return 0;
+#endif
+}
+
 STDERR stdf_reopen(STDF* sh) {
+    // data is copied again from the start
+    if (sh->copyF) {
+        rewind(sh->copyF);
+    }
+    // bzip2 reader still holds the first block, no need to decompress it again
+    if (sh->fmt == BZ_compressed && _stdf_rewind_bz(sh) == STD_OK) {
+        return STD_OK;
+    }
+#ifdef HAVE_LZMA
+    // same for the first output chunk of xz
+    if (sh->fmt == XZ_compressed && _stdf_rewind_xz(sh) == STD_OK) {
+        return STD_OK;
+    }
+#endif
     // close current file
     sh->fops->stdf_close(sh);
     return sh->fops->stdf_open(sh, sh->filepath);
@@ -333,8 +1162,249 @@ STDERR stdf_reopen(STDF* sh) {
 }
 
 STDERR stdf_close(STDF* sh) {
+    if (sh->copyF) {
+        fclose(sh->copyF);
+    }
     int status = sh->fops->stdf_close(sh);
     free(sh);
     return status;
 }
 
+
+STDERR stdf_read(STDF* sh, void* buf, int length) {
+    int status = sh->fops->stdf_read(sh, buf, length);
+    if (status == STD_OK && sh->copyF && length > 0 && 
+        fwrite(buf, 1, (size_t)length, sh->copyF) != (size_t)length) {
+        sh->copyError = 1;
+    }
+    return status;
+}
+
+
+STDERR stdf_set_copy(STDF* sh, void* filename) {
+    // uncompressed copy of a compressed file, written as the file is read
+#ifdef _WIN32
+    sh->copyF = _wfopen((wchar_t*)filename, L"wb");
+#else
+    sh->copyF = fopen((char*)filename, "wb");
+#endif
+    if (sh->copyF == NULL) {
+        return OS_FAIL;
+    }
+    setvbuf(sh->copyF, NULL, _IOFBF, 1 << 20);
+    sh->copyError = 0;
+    return STD_OK;
+}
+
+
+STDERR stdf_finish_copy(STDF* sh) {
+    if (sh->copyF == NULL) {
+        return OS_FAIL;
+    }
+    int status = fclose(sh->copyF);
+    sh->copyF = NULL;
+    if (status != 0 || sh->copyError) {
+        return OS_FAIL;
+    }
+    return STD_OK;
+}
+
+
+void stdf_set_gz_index(STDF* sh, gz_index* index) {
+    // points read so far are dropped by the next open, i.e. stdf_reopen
+    if (sh->fmt == GZ_compressed) {
+        sh->gzIndex = index;
+    }
+}
+
+
+void stdf_set_bz_index(STDF* sh, bz_index* index) {
+    // blocks are recorded from the start, a rewind keeps them
+    if (sh->fmt == BZ_compressed) {
+        bz_index_clear(index);
+        sh->bzIndex = index;
+    }
+}
+
+
+void stdf_set_threads(STDF* sh, int threads) {
+    // takes effect before the first read
+    sh->threads = threads > 1 ? threads : 1;
+}
+
+
+/* Memory mapped, uncompressed only */
+
+STDERR stdf_map(stdf_mapping* m, void* filename) {
+    m->base = NULL;
+    m->size = 0;
+    m->hMap = NULL;
+    if (get_stdf_format(filename) != NotCompressed) {
+        // compressed files have to be decompressed by stream
+        return OS_FAIL;
+    }
+#ifdef _WIN32
+    int fd = get_fd_with_unicode_path(NULL, (wchar_t*)filename);
+    if (fd < 0) {
+        return OS_FAIL;
+    }
+    HANDLE hFile = (HANDLE)_get_osfhandle(fd);
+    LARGE_INTEGER fsize;
+    if (hFile == INVALID_HANDLE_VALUE || !GetFileSizeEx(hFile, &fsize) || fsize.QuadPart == 0) {
+        _close(fd);
+        return OS_FAIL;
+    }
+    HANDLE hMap = CreateFileMappingW(hFile, NULL, PAGE_READONLY, 0, 0, NULL);
+    // view keeps a reference to the mapping, file descriptor is no longer needed
+    _close(fd);
+    if (hMap == NULL) {
+        return OS_FAIL;
+    }
+    void* base = MapViewOfFile(hMap, FILE_MAP_READ, 0, 0, 0);
+    if (base == NULL) {
+        CloseHandle(hMap);
+        return OS_FAIL;
+    }
+    m->hMap = (void*)hMap;
+    m->size = (uint64_t)fsize.QuadPart;
+#else
+    int fd = get_fd_with_unicode_path((char*)filename, NULL);
+    if (fd < 0) {
+        return OS_FAIL;
+    }
+    struct stat st;
+    if (fstat(fd, &st) != 0 || st.st_size == 0 || (uint64_t)st.st_size > (uint64_t)SIZE_MAX) {
+        close(fd);
+        return OS_FAIL;
+    }
+    void* base = mmap(NULL, (size_t)st.st_size, PROT_READ, MAP_PRIVATE, fd, 0);
+    close(fd);
+    if (base == MAP_FAILED) {
+        return OS_FAIL;
+    }
+    // records are consumed front to back exactly once
+    madvise(base, (size_t)st.st_size, MADV_SEQUENTIAL);
+    m->size = (uint64_t)st.st_size;
+#endif
+    m->base = (const unsigned char*)base;
+    return STD_OK;
+}
+
+STDERR stdf_unmap(stdf_mapping* m) {
+    if (m->base == NULL) {
+        return STD_OK;
+    }
+    int status = STD_OK;
+#ifdef _WIN32
+    if (!UnmapViewOfFile((void*)m->base)) {
+        status = OS_FAIL;
+    }
+    CloseHandle((HANDLE)m->hMap);
+#else
+    if (munmap((void*)m->base, (size_t)m->size) != 0) {
+        status = OS_FAIL;
+    }
+#endif
+    m->base = NULL;
+    m->size = 0;
+    m->hMap = NULL;
+    return status;
+}
+
+
+/* Batched random reads, uncompressed only */
+
+typedef struct _stdf_range {
+    int64_t     offset;
+    int32_t     length;
+    int64_t     index;
+} stdf_range;
+
+static int cmp_range(const void* a, const void* b) {
+    int64_t oa = ((const stdf_range*)a)->offset;
+    int64_t ob = ((const stdf_range*)b)->offset;
+    return (oa > ob) - (oa < ob);
+}
+
+// read at offset without moving the file position, return bytes read
+static int64_t pread_full(int fd, unsigned char* buf, int64_t size, int64_t offset) {
+    int64_t total = 0;
+    while (total < size) {
+#ifdef _WIN32
+        HANDLE h = (HANDLE)_get_osfhandle(fd);
+        OVERLAPPED ov;
+        DWORD n = 0;
+        DWORD want = (size - total) > 0x40000000 ? 0x40000000 : (DWORD)(size - total);
+        memset(&ov, 0, sizeof(ov));
+        ov.Offset = (DWORD)((uint64_t)(offset + total) & 0xFFFFFFFF);
+        ov.OffsetHigh = (DWORD)((uint64_t)(offset + total) >> 32);
+        if (h == INVALID_HANDLE_VALUE || !ReadFile(h, buf + total, want, &n, &ov) || n == 0) {
+            break;
+        }
+#else
+        ssize_t n = pread(fd, buf + total, (size_t)(size - total), (off_t)(offset + total));
+        if (n < 0 && errno == EINTR) {
+            continue;
+        }
+        if (n <= 0) {
+            break;
+        }
+#endif
+        total += n;
+    }
+    return total;
+}
+
+STDERR stdf_read_ranges(int fd, const int64_t* offsets, int32_t* lengths, int64_t cnt, 
+                        unsigned char* buf, const int64_t* dests, int64_t maxGap, int64_t maxSpan) {
+    // copy record i to buf + dests[i].
+    // ranges are read in file order, the ones apart by no more than maxGap bytes are 
+    // merged into a single read of up to maxSpan bytes. 
+    // length is set to -1 if offset or length is negative, or record is cut by end of file
+    int64_t n = 0, i, j, maxLen = 0;
+    for (i = 0; i < cnt; i++) {
+        maxLen = lengths[i] > maxLen ? lengths[i] : maxLen;
+    }
+    stdf_range* ranges = (stdf_range*)malloc((cnt > 0 ? cnt : 1) * sizeof(stdf_range));
+    unsigned char* span = (unsigned char*)malloc(maxSpan > maxLen ? maxSpan : maxLen);
+    if (ranges == NULL || span == NULL) {
+        free(ranges);
+        free(span);
+        return NO_MEMORY;
+    }
+    for (i = 0; i < cnt; i++) {
+        if (offsets[i] < 0 || lengths[i] < 0) {
+            lengths[i] = -1;
+            continue;
+        }
+        ranges[n].offset = offsets[i];
+        ranges[n].length = lengths[i];
+        ranges[n].index = i;
+        n++;
+    }
+    qsort(ranges, n, sizeof(stdf_range), cmp_range);
+
+    for (i = 0; i < n; i = j) {
+        int64_t start = ranges[i].offset;
+        int64_t end = start + ranges[i].length;
+        for (j = i + 1; j < n; j++) {
+            int64_t e = ranges[j].offset + ranges[j].length;
+            if (ranges[j].offset > end + maxGap || (e > end ? e : end) - start > maxSpan) {
+                break;
+            }
+            end = e > end ? e : end;
+        }
+        int64_t got = pread_full(fd, span, end - start, start);
+        for (int64_t k = i; k < j; k++) {
+            int64_t rel = ranges[k].offset - start;
+            if (rel + ranges[k].length > got) {
+                lengths[ranges[k].index] = -1;
+            } else {
+                memcpy(buf + dests[ranges[k].index], span + rel, ranges[k].length);
+            }
+        }
+    }
+    free(ranges);
+    free(span);
+    return STD_OK;
+}
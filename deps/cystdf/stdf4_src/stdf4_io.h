@@ -30,6 +30,10 @@
 #include "zlib_src/zlib.h"
 #include "bzip2_src/bzlib.h"
 #include "minizip_src/unzip.h"
+#ifdef HAVE_LZMA
+// liblzma of the system, xz & lzma files are not supported if it is not found at build
+#include <lzma.h>
+#endif
 
 #ifndef __STDF_IO_TYPES__
 #define __STDF_IO_TYPES__
@@ -49,9 +53,45 @@ typedef enum {
     GZ_compressed   = 1,
     BZ_compressed   = 2,
     ZIP_compressed  = 3,
+    XZ_compressed   = 4,
 } stdf_format;
 
 
+// seek points of a gzip file, in the layout of indexed_gzip (zran)
+#define GZ_WINDOW_SIZE  32768
+
+typedef struct _gz_point {
+    uint64_t        cmp_offset;     // first byte of a deflate block that is complete
+    uint64_t        uncmp_offset;
+    uint8_t         bits;           // bits of the block in the byte before cmp_offset
+    unsigned char*  window;         // GZ_WINDOW_SIZE bytes before uncmp_offset, NULL at start of a gzip member
+} gz_point;
+
+typedef struct _gz_index {
+    uint32_t        spacing;        // min bytes of uncompressed data between points
+    uint32_t        npoints;
+    uint32_t        capacity;
+    gz_point*       points;
+    uint64_t        compressed_size;
+    uint64_t        uncompressed_size;
+    int             complete;       // set when the whole file is inflated
+} gz_index;
+
+
+// block offsets of a bzip2 file, in the layout of indexed_bzip2 block offsets
+typedef struct _bz_block {
+    uint64_t        bit_offset;     // first bit of a block magic or an end of stream marker
+    uint64_t        data_offset;    // uncompressed offset of the block, or where the stream ends
+} bz_block;
+
+typedef struct _bz_index {
+    uint32_t        nblocks;
+    uint32_t        capacity;
+    bz_block*       blocks;
+    int             complete;       // set when the whole file is decompressed
+} bz_index;
+
+
 typedef struct _stdf_fops {
     int (*stdf_open)(void* stdf, void* filename);
     int (*stdf_read)(void* stdf, void* buf, int length);
@@ -64,16 +104,54 @@ typedef struct _stdf_handler {
     void*           filepath;
     stdf_format     fmt;
     FILE*           orgF;
-    gzFile          gzF;
-    BZFILE*         bzF;
+    void*           gzReader;
+    gz_index*       gzIndex;        // points are recorded while reading if not NULL
+    void*           bzReader;
+    bz_index*       bzIndex;        // blocks are recorded while reading if not NULL
+    void*           xzReader;
+    int             threads;        // decompression threads, bzip2 and xz only
+    FILE*           copyF;          // decompressed data read is also written here if not NULL
+    int             copyError;
     unzFile         zipF;
     stdf_fops*      fops;
 } STDF;
 
+
+typedef struct _stdf_mapping {
+    const unsigned char*    base;
+    uint64_t                size;
+    void*                   hMap;   // mapping object handle, windows only
+} stdf_mapping;
+
 #endif //__STDF_IO_TYPES__
 
 extern STDERR stdf_open(STDF** sh, void* filename);
 
 extern STDERR stdf_reopen(STDF* sh);
 
-extern STDERR stdf_close(STDF* sh);
\ No newline at end of file
+extern STDERR stdf_close(STDF* sh);
+
+extern STDERR stdf_read(STDF* sh, void* buf, int length);
+
+extern STDERR stdf_set_copy(STDF* sh, void* filename);
+
+extern STDERR stdf_finish_copy(STDF* sh);
+
+extern STDERR stdf_map(stdf_mapping* m, void* filename);
+
+extern STDERR stdf_unmap(stdf_mapping* m);
+
+extern void stdf_set_gz_index(STDF* sh, gz_index* index);
+
+extern void gz_index_clear(gz_index* index);
+
+extern void stdf_set_bz_index(STDF* sh, bz_index* index);
+
+extern void bz_index_clear(bz_index* index);
+
+extern void stdf_set_threads(STDF* sh, int threads);
+
+extern int stdf_xz_supported(void);
+
+extern STDERR stdf_read_ranges(int fd, const int64_t* offsets, int32_t* lengths, int64_t cnt, 
+                               unsigned char* buf, const int64_t* dests, int64_t maxGap, int64_t maxSpan);
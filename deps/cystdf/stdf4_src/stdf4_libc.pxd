@@ -38,6 +38,16 @@ cdef extern from "stdf4_func.h" nogil:
 
     void free_record(uint16_t recHeader, void* record)
 
+    void peek_TR(uint16_t recHeader, const unsigned char* rawData, uint16_t binaryLen, void* peek)
+
+    void decode_TR(uint16_t recHeader, const unsigned char* rawData, uint16_t binaryLen, uint8_t* flag, float* result)
+
+    void locate_MPR(const unsigned char* rawData, uint16_t binaryLen, void* layout)
+
+    uint8_t decode_N1(const unsigned char* rawData, uint16_t index)
+
+    float decode_R4(const unsigned char* rawData)
+
 
 cdef extern from "stdf4_func.c" nogil:
     cdef enum:
@@ -401,10 +411,29 @@ cdef extern from "stdf4_func.c" nogil:
     ctypedef struct DTR:
         Cn  TEXT_DAT
 
+    ctypedef struct TR_PEEK:
+        U4  TEST_NUM
+        U1  HEAD_NUM
+        U1  SITE_NUM
+        B1  OPT_FLAG
+        R4  LO_LIMIT
+        R4  HI_LIMIT
+        C1  TEST_TXT[256]
+
+    ctypedef struct MPR_LAYOUT:
+        B1  TEST_FLG
+        U2  STAT_CNT
+        U2  RSLT_CNT
+        U2  RSLT_AVAIL
+        U2  STAT_POS
+        U2  RSLT_POS
+
 
 cdef extern from "stdf4_io.c" nogil:
     STDERR stdf_open(STDF** sh, void* filename)
     STDERR stdf_close(STDF* sh)
+    STDERR stdf_map(stdf_mapping* m, void* filename)
+    STDERR stdf_unmap(stdf_mapping* m)
 
 
 cdef extern from "stdf4_io.h" nogil:
@@ -423,16 +452,70 @@ cdef extern from "stdf4_io.h" nogil:
         int (*stdf_skip)(void* stdf, int num) nogil
         int (*stdf_close)(void* stdf) nogil
 
+    ctypedef struct gz_point:
+        uint64_t        cmp_offset
+        uint64_t        uncmp_offset
+        uint8_t         bits
+        unsigned char*  window
+
+    ctypedef struct gz_index:
+        uint32_t        spacing
+        uint32_t        npoints
+        gz_point*       points
+        uint64_t        compressed_size
+        uint64_t        uncompressed_size
+        int             complete
+
+    ctypedef struct bz_block:
+        uint64_t        bit_offset
+        uint64_t        data_offset
+
+    ctypedef struct bz_index:
+        uint32_t        nblocks
+        bz_block*       blocks
+        int             complete
+
     ctypedef struct STDF:
         stdf_fops*      fops
         pass
 
+    ctypedef struct stdf_mapping:
+        const unsigned char*    base
+        uint64_t                size
+
     STDERR stdf_open(STDF** sh, void* filename)
 
     STDERR stdf_reopen(STDF* sh)
 
     STDERR stdf_close(STDF* sh)
 
+    STDERR stdf_map(stdf_mapping* m, void* filename)
+
+    STDERR stdf_unmap(stdf_mapping* m)
+
+    void stdf_set_gz_index(STDF* sh, gz_index* index)
+
+    void gz_index_clear(gz_index* index)
+
+    void stdf_set_bz_index(STDF* sh, bz_index* index)
+
+    void bz_index_clear(bz_index* index)
+
+    void stdf_set_threads(STDF* sh, int threads)
+
+    STDERR stdf_read(STDF* sh, void* buf, int length)
+
+    STDERR stdf_set_copy(STDF* sh, void* filename)
+
+    STDERR stdf_finish_copy(STDF* sh)
+
+    int stdf_xz_supported()
+
+    STDERR stdf_read_ranges(int fd, const int64_t* offsets, int32_t* lengths, int64_t cnt, 
+                            unsigned char* buf, const int64_t* dests, int64_t maxGap, int64_t maxSpan)
+
+    enum: GZ_WINDOW_SIZE
+
 
 cdef inline uint16_t MAKE_REC(uint8_t typ, uint8_t sub) nogil:
     return typ << 8 | sub
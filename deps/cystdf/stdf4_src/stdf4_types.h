@@ -485,4 +485,25 @@ typedef struct DTR {
     Cn  TEXT_DAT ; // ASCII text string
 } DTR;
 
+// fields peeked from PTR, MPR & FTR without allocation
+typedef struct TR_PEEK {
+    U4      TEST_NUM ; // Test number
+    U1      HEAD_NUM ; // Test head number
+    U1      SITE_NUM ; // Test site number
+    B1      OPT_FLAG ; // Optional data flag, PTR only
+    R4      LO_LIMIT ; // Low test limit value, PTR only
+    R4      HI_LIMIT ; // High test limit value, PTR only
+    C1      TEST_TXT[256]; // Descriptive text or label, "" if omitted
+} TR_PEEK;
+
+// positions of RTN_STAT & RTN_RSLT in MPR, located without allocation
+typedef struct MPR_LAYOUT {
+    B1      TEST_FLG ; // Test flags (fail, alarm, etc.)
+    U2      STAT_CNT ; // RTN_ICNT, 0 if RTN_STAT is omitted or incomplete
+    U2      RSLT_CNT ; // RSLT_CNT, results cut by end of record are read as 0
+    U2      RSLT_AVAIL;// Count of results complete in record
+    U2      STAT_POS ; // Position of RTN_STAT in record
+    U2      RSLT_POS ; // Position of RTN_RSLT in record
+} MPR_LAYOUT;
+
 #endif  // __STDF_REC_TYPES__
\ No newline at end of file
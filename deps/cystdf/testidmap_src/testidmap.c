@@ -29,6 +29,46 @@
 #include <string.h>
 
 
+static uint32_t hashTestItem(uint32_t TEST_NUM, const char* TEST_NAME)
+{
+    // FNV-1a over test name, seeded by test number
+    uint32_t h = 2166136261u ^ TEST_NUM;
+    h *= 16777619u;
+    for (const unsigned char* p = (const unsigned char*)TEST_NAME; *p; p++)
+    {
+        h ^= *p;
+        h *= 16777619u;
+    }
+    return h;
+}
+
+
+static int rehash(testIDMap* map, int newBucketCount)
+{
+    int* newBuckets = (int*)malloc(newBucketCount * sizeof(int));
+    if (newBuckets == NULL)
+    {
+        return TESTIDMAP_OMEM;
+    }
+    memset(newBuckets, -1, newBucketCount * sizeof(int));
+
+    uint32_t mask = (uint32_t)newBucketCount - 1;
+    for (int i = 0; i < map->mapSize; i++)
+    {
+        uint32_t pos = (map->tests)[i].hash & mask;
+        while (newBuckets[pos] != -1)
+        {
+            pos = (pos + 1) & mask;
+        }
+        newBuckets[pos] = i;
+    }
+    free(map->buckets);
+    map->buckets = newBuckets;
+    map->bucketCount = newBucketCount;
+    return TESTIDMAP_OK;
+}
+
+
 testIDMap* createTestIDMap() 
 {
     testIDMap* map = (testIDMap*)malloc(sizeof(testIDMap));
@@ -41,13 +81,17 @@ testIDMap* createTestIDMap()
     map->mapSize = 0;
     map->tests = (testItem*)malloc(map->capacity * sizeof(testItem));
     map->id = (int*)malloc(map->capacity * sizeof(int));
-    if (map->tests == NULL || map->id == NULL)
+    map->bucketCount = INIT_BUCKETS;
+    map->buckets = (int*)malloc(map->bucketCount * sizeof(int));
+    if (map->tests == NULL || map->id == NULL || map->buckets == NULL)
     {
         free(map->tests);
         free(map->id);
+        free(map->buckets);
         free(map);
         return NULL;
     }
+    memset(map->buckets, -1, map->bucketCount * sizeof(int));
 
     return map;
 }
@@ -67,6 +111,7 @@ void destoryTestIDMap(testIDMap* map)
     }
     free(map->tests);
     free(map->id);
+    free(map->buckets);
     free(map);
     return;
 }
@@ -79,13 +124,19 @@ int getTestID(testIDMap* map, uint32_t TEST_NUM, const char* TEST_NAME)
         return TESTIDMAP_INVALID;
     }
 
-    for (int i = 0; i < map->mapSize; i++)
+    uint32_t hash = hashTestItem(TEST_NUM, TEST_NAME);
+    uint32_t mask = (uint32_t)map->bucketCount - 1;
+    uint32_t pos = hash & mask;
+    int i;
+    // linear probing until an empty bucket is hit
+    while ((i = map->buckets[pos]) != -1)
     {
-        testItem tmp = (map->tests)[i];
-        if (tmp.TEST_NUM == TEST_NUM && strcmp(tmp.TEST_NAME, TEST_NAME) == 0)
+        testItem* tmp = &(map->tests)[i];
+        if (tmp->hash == hash && tmp->TEST_NUM == TEST_NUM && strcmp(tmp->TEST_NAME, TEST_NAME) == 0)
         {
             return map->id[i];
         }
+        pos = (pos + 1) & mask;
     }
     return TESTIDMAP_MISSING;
 }
@@ -104,35 +155,53 @@ int insertTestItem(testIDMap* map, uint32_t TEST_NUM, const char* TEST_NAME)
         int newCapacity = map->capacity + (map->capacity / 2);
 
         testItem* tmp_tests = (testItem*)realloc(map->tests, newCapacity * sizeof(testItem));
-        int* tmp_id = (int*)realloc(map->id, newCapacity * sizeof(int));
+        if (tmp_tests == NULL)
+        {
+            return TESTIDMAP_OMEM;
+        }
+        map->tests = tmp_tests;
 
-        if (tmp_tests != NULL && tmp_id != NULL)
+        int* tmp_id = (int*)realloc(map->id, newCapacity * sizeof(int));
+        if (tmp_id == NULL)
         {
-            map->tests = tmp_tests;
-            map->id = tmp_id;
-            map->capacity = newCapacity;
+            return TESTIDMAP_OMEM;
         }
-        else
+        map->id = tmp_id;
+        map->capacity = newCapacity;
+    }
+
+    if (2 * (map->mapSize + 1) > map->bucketCount)
+    {
+        // keep load factor <= 0.5
+        if (rehash(map, 2 * map->bucketCount) != TESTIDMAP_OK)
         {
-            free(tmp_tests);
-            free(tmp_id);
             return TESTIDMAP_OMEM;
         }
     }
 
     // insert new test to last
     // current mapSize is the index and id of the new test
-    (map->tests)[map->mapSize].TEST_NAME = (char*)calloc( strlen(TEST_NAME)+1, sizeof(char));
-    if ((map->tests)[map->mapSize].TEST_NAME == NULL)
+    testItem* item = &(map->tests)[map->mapSize];
+    item->TEST_NAME = (char*)calloc( strlen(TEST_NAME)+1, sizeof(char));
+    if (item->TEST_NAME == NULL)
     {
         return TESTIDMAP_OMEM;
     }
-    strcpy((map->tests)[map->mapSize].TEST_NAME, TEST_NAME);
-    (map->tests)[map->mapSize].TEST_NUM = TEST_NUM;
+    strcpy(item->TEST_NAME, TEST_NAME);
+    item->TEST_NUM = TEST_NUM;
+    item->hash = hashTestItem(TEST_NUM, TEST_NAME);
     (map->id)[map->mapSize] = map->mapSize;
+
+    uint32_t mask = (uint32_t)map->bucketCount - 1;
+    uint32_t pos = item->hash & mask;
+    while (map->buckets[pos] != -1)
+    {
+        pos = (pos + 1) & mask;
+    }
+    map->buckets[pos] = map->mapSize;
     // cnt +1
     map->mapSize += 1;
 
     // return the id of inserted test item
     return (map->mapSize) - 1;
-}
\ No newline at end of file
+}
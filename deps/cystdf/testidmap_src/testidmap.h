@@ -30,6 +30,7 @@
 #define __TESTIDMAP_H__
 
 #define INIT_SIZE 256
+#define INIT_BUCKETS 512    /* must be power of 2, keep load factor <= 0.5 */
 
 #define TESTIDMAP_INVALID -1003
 #define TESTIDMAP_MISSING -1002  /* No such element */
@@ -38,6 +39,7 @@
 
 typedef struct testItem {
     uint32_t    TEST_NUM;
+    uint32_t    hash;       /* hash of TEST_NUM + TEST_NAME */
     char*       TEST_NAME;
 } testItem;
 
@@ -47,6 +49,8 @@ typedef struct testIDMap {
     int         mapSize;
     testItem*   tests;
     int*        id;
+    int         bucketCount;
+    int*        buckets;    /* open addressing, index of tests, -1 if empty */
 } testIDMap;
 
 
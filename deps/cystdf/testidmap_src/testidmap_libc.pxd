@@ -30,7 +30,7 @@ cdef extern from "testidmap.c" nogil:
 
 cdef extern from "testidmap.h" nogil:
     ctypedef struct testIDMap:
-        pass
+        int         mapSize     # number of tests, ids are 0 ~ mapSize-1
 
     cdef enum:
         TESTIDMAP_INVALID
@@ -71,6 +71,7 @@ int message_queue_init(tsQueue *queue, int message_size, int max_depth) {
 	char sem_name[128];
 	queue->message_size = pad_size(message_size);
 	queue->max_depth = round_to_pow2(max_depth);
+	queue->high_water = 0;
 	queue->memory = malloc(queue->message_size * queue->max_depth);
 	if(!queue->memory)
 		goto error;
@@ -145,7 +146,13 @@ error:
 }
 
 void *message_queue_message_alloc(tsQueue *queue) {
-	if(__sync_fetch_and_add(&queue->allocator.free_blocks, -1) > 0) {
+	int free_blocks = __sync_fetch_and_add(&queue->allocator.free_blocks, -1);
+	if(free_blocks > 0) {
+		unsigned int in_use = queue->max_depth - (free_blocks - 1);
+		unsigned int hw = queue->high_water;
+		while(in_use > hw && !__sync_bool_compare_and_swap(&queue->high_water, hw, in_use)) {
+			hw = queue->high_water;
+		}
 		unsigned int pos = __sync_fetch_and_add(&queue->allocator.allocpos, 1) % queue->max_depth;
 		void *rv = queue->freelist[pos];
 		while(!rv) {
@@ -234,6 +241,10 @@ void *message_queue_read(tsQueue *queue) {
 	return rv;
 }
 
+unsigned int message_queue_high_water(tsQueue *queue) {
+	return queue->high_water;
+}
+
 void message_queue_destroy(tsQueue *queue) {
 	if(queue->queue.sem == &queue->queue.unnamed_sem) {
 		sem_destroy(queue->queue.sem);
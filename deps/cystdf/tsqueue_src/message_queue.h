@@ -47,6 +47,7 @@ typedef struct message_queue {
 	void *memory;
 	void **freelist;
 	void **queue_data;
+	unsigned int high_water;
 	struct {
 		sem_t unnamed_sem;
 		sem_t *sem;
@@ -156,6 +157,14 @@ extern void *message_queue_tryread(tsQueue *queue);
  */
 extern void *message_queue_read(tsQueue *queue);
 
+/**
+ * \brief Get the most messages allocated at the same time
+ *
+ * \param queue pointer to the message queue
+ * \return the largest number of messages allocated and not yet freed
+ */
+extern unsigned int message_queue_high_water(tsQueue *queue);
+
 /**
  * \brief Destroy a message queue structure
  *
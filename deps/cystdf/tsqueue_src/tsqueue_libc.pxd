@@ -47,5 +47,7 @@ cdef extern from "tsqueue_src/message_queue.h":
 
     void *message_queue_read(tsQueue *queue) nogil
 
+    unsigned int message_queue_high_water(tsQueue *queue) nogil
+
     void message_queue_destroy(tsQueue *queue) nogil
 
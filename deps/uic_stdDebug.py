@@ -83,7 +83,7 @@ class stdDebugPanel(QtWidgets.QDialog):
         f, _typ = QFileDialog.getOpenFileName(self,
                                               caption=self.tr("Select a STD File To Analyze"),
                                               directory=self.parent.settingParams.recentFolder,
-                                              filter=self.tr("All Supported Files (*.std* *.std*.gz *.std*.bz2 *.std*.zip);;STDF (*.std *.stdf);;Compressed STDF (*.std*.gz *.std*.bz2 *.std*.zip);;All Files (*.*)"),)
+                                              filter=self.tr("All Supported Files (*.std* *.std*.gz *.std*.bz2 *.std*.zip *.std*.xz);;STDF (*.std *.stdf);;Compressed STDF (*.std*.gz *.std*.bz2 *.std*.zip *.std*.xz);;All Files (*.*)"),)
             
         if os.path.isfile(f):
             # store folder path
@@ -26,6 +26,7 @@
 
 import subprocess, os, platform
 from .customizedQtClass import StyleDelegateForTable_List, FlippedProxyModel, NormalProxyModel
+from .cystdf import PREFETCH_TESTS
 # pyqt5
 from PyQt5 import QtCore, QtWidgets, QtGui
 from PyQt5.QtWidgets import QAbstractItemView, QApplication, QFileDialog, QPushButton
@@ -46,7 +47,6 @@ from .ui.stdfViewer_dutDataUI import Ui_dutData
 # from .ui.stdfViewer_dutDataUI_side6 import Ui_dutData
 
 
-
 class signal(QtCore.QObject):
     hideSignal = Signal()
     
@@ -91,6 +91,9 @@ class DutDataReader(QtWidgets.QWidget):
         for i, testTuple in enumerate(self.test_number_tuple_List):
             if self.stopFlag: return
 
+            if i % PREFETCH_TESTS == 0:
+                # read data of the next tests at once
+                self.parent.prepareData([(t[0], t[-1]) for t in self.test_number_tuple_List[i:i + PREFETCH_TESTS]], cacheData=True)
             dutData_perTest, stat_perTest, flagInfo_perTest = self.parent.getTestValueOfDUTs(self.selectedDutIndex, testTuple)
             dutData.append(dutData_perTest)
             dutStat.append(stat_perTest)
@@ -30,6 +30,7 @@ from enum import IntEnum
 from xlsxwriter import Workbook
 from xlsxwriter.worksheet import Worksheet
 import subprocess, platform, logging
+from .cystdf import PREFETCH_TESTS
 # pyqt5
 from PyQt5 import QtCore, QtWidgets
 from PyQt5.QtWidgets import QAbstractItemView, QFileDialog
@@ -157,7 +158,7 @@ class signals(QtCore.QObject):
     # get close signal
     closeSignal = Signal(bool)
     # signals from report generation thread for requesting data
-    prepareDataSignal = Signal(tuple)    # testID
+    prepareDataSignal = Signal(list)    # testIDs
     retrieveImageSignal = Signal(int, int, tuple, int)     # head, site, testTuple, chartType
     retrieveDataListSignal = Signal(int, dict)      # chartType, {site, testTuple} / {site, bin}
     retrieveTableDataSignal = Signal(int)           # FileInfo table
@@ -430,9 +431,10 @@ class reportGenerator(QtCore.QObject):
             stat_col_width = [len(s) for s in header_stat]
             hasStatHeader = False
             
-            for testTuple in self.numTupL:
-                # prepare data (all sites all heads)
-                self.prepareDataSignal.emit( (testTuple[0], testTuple[-1]) )
+            for i, testTuple in enumerate(self.numTupL):
+                # prepare data (all sites all heads) of the next tests at once
+                if i % PREFETCH_TESTS == 0:
+                    self.prepareDataSignal.emit( [(t[0], t[-1]) for t in self.numTupL[i:i + PREFETCH_TESTS]] )
                 
                 # if dut summary is selected
                 if tab.DUT in self.contL:
@@ -613,10 +615,10 @@ class progressDisplayer(QtWidgets.QDialog):
             self.close()
 
 
-    @Slot(tuple)
-    def prepareData(self, testID):
+    @Slot(list)
+    def prepareData(self, testIDs):
         # print_thread("prepareData")
-        self.parent().parent.prepareData([testID])
+        self.parent().parent.prepareData(testIDs)
     
     
     @Slot(int, int, tuple, int)
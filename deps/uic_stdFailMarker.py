@@ -25,6 +25,7 @@
 
 
 import time
+from .cystdf import PREFETCH_TESTS
 # pyqt5
 from PyQt5 import QtCore, QtWidgets, QtGui
 from PyQt5.QtWidgets import QApplication
@@ -69,6 +70,11 @@ class FailMarker(QtWidgets.QWidget):
             self.updateProgressBar(int(100 * (i+1) / self.total))
             QApplication.processEvents()    # force refresh UI to update progress bar
             
+            if i % PREFETCH_TESTS == 0:
+                # read data of the next tests at once, if fail count is not enough to mark them
+                nextTuples = [self.parent.getTestTuple(self.sim.item(j).text()) for j in range(i, min(i + PREFETCH_TESTS, self.total))]
+                self.parent.prepareData([(t[0], t[-1]) for t in nextTuples if self.parent.isTestDataRequired(t)], cacheData=True)
+            
             qitem = self.sim.item(i)
             testTuple = self.parent.getTestTuple(qitem.text())
             
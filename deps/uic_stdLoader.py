@@ -38,7 +38,8 @@ from .ui.stdfViewer_loadingUI import Ui_loadingUI
 # from PySide6.QtCore import Signal, Slot, QTranslator
 # from .ui.stdfViewer_loadingUI_side6 import Ui_loadingUI
 
-from .cystdf import stdfDataRetriever     # cython version
+from .cystdf import stdfDataRetriever, isCompressed     # cython version
+from .DatabaseCache import DatabaseCache, fileFingerprint, CACHE_LIMIT
 
 
 logger = logging.getLogger("STDF Viewer")
@@ -80,13 +81,14 @@ class stdfLoader(QtWidgets.QDialog):
         self.loaderUI = Ui_loadingUI()
         self.loaderUI.setupUi(self)
         self.loaderUI.progressBar.setMaximum(10000)     # 100 (default max value) * 10^precision
+        self.databasePath = ""      # database of the last loaded file
         
-    def loadFile(self, stdPath):
+    def loadFile(self, stdPath, eagerValues=False, transcode=False, cacheLimit=CACHE_LIMIT):
         self.closeEventByThread = False    # init at new file
         # create new thread and move stdReader to the new thread
         self.thread = QtCore.QThread(parent=self)
         self.reader = stdReader(self.signals)
-        self.reader.readThis(stdPath)
+        self.reader.readThis(stdPath, eagerValues, transcode, cacheLimit)
         
         # self.reader.readBegin()
         self.reader.moveToThread(self.thread)
@@ -128,6 +130,8 @@ class stdfLoader(QtWidgets.QDialog):
     @Slot(bool)
     def sendParseSignal(self, parseStatus):
         # parse parse status from reader to mainUI
+        if parseStatus:
+            self.databasePath = self.reader.databasePath
         self.signals.parseStatusSignal_parent.emit(parseStatus)
     
     @Slot(bool)
@@ -156,26 +160,45 @@ class stdReader(QtCore.QObject):
         self.parseStatusSignal = self.QSignals.parseStatusSignal_reader
         self.msgSignal = self.QSignals.msgSignal
         self.flag = flags()     # used for stopping parser
+        self.databasePath = ""
         
-    def readThis(self, stdPath):
+    def readThis(self, stdPath, eagerValues=False, transcode=False, cacheLimit=CACHE_LIMIT):
         self.stdPath = stdPath
+        self.eagerValues = eagerValues
+        # keep a decompressed copy of compressed file in cache
+        self.transcode = transcode and isCompressed(stdPath)
+        self.cacheLimit = cacheLimit
         
     @Slot()
     def readBegin(self):
+        cache = None
+        tmpPath = ""
         try:
             if self.msgSignal: self.msgSignal.emit("Loading STD file...", False, False, False)
             start = time.time()
-            databasePath = os.path.join(sys.rootFolder, "logs", "tmp_new.db")
-            stdfDataRetriever(filepath=self.stdPath, dbPath=databasePath, QSignal=self.progressBarSignal, flag=self.flag)
-            end = time.time()
-            print(end - start)
-            if self.flag.stop:
-                # user terminated
-                self.parseStatus = False
-                if self.msgSignal: self.msgSignal.emit("Loading cancelled by user", False, False, False)
-            else:
+            # databases are cached by file fingerprint, reopening a file skips parsing
+            cache = DatabaseCache(os.path.join(sys.rootFolder, "logs", "cache"), limit=self.cacheLimit)
+            key = fileFingerprint(self.stdPath)
+            self.databasePath = cache.lookup(key, requireValues=self.eagerValues, requireTranscode=self.transcode)
+            if self.databasePath:
+                end = time.time()
+                self.progressBarSignal.emit(10000)
                 self.parseStatus = True
-                if self.msgSignal: self.msgSignal.emit("Load completed, process time %.3f sec"%(end - start), False, False, False)
+                if self.msgSignal: self.msgSignal.emit("Load completed from cache, process time %.3f sec"%(end - start), False, False, False)
+            else:
+                tmpPath = cache.tmpPath(key)
+                stdfDataRetriever(filepath=self.stdPath, dbPath=tmpPath, QSignal=self.progressBarSignal, flag=self.flag, eagerValues=self.eagerValues, 
+                                  transcode=self.transcode)
+                end = time.time()
+                print(end - start)
+                if self.flag.stop:
+                    # user terminated
+                    self.parseStatus = False
+                    if self.msgSignal: self.msgSignal.emit("Loading cancelled by user", False, False, False)
+                else:
+                    self.databasePath = cache.store(key)
+                    self.parseStatus = True
+                    if self.msgSignal: self.msgSignal.emit("Load completed, process time %.3f sec"%(end - start), False, False, False)
             self.parseStatusSignal.emit(self.parseStatus)
                 
         except Exception as e:
@@ -185,6 +208,9 @@ class stdReader(QtCore.QObject):
             if self.msgSignal: self.msgSignal.emit(str(e), False, True, False)
             
         finally:
+            # remove incomplete database
+            if cache and tmpPath and not self.parseStatus:
+                cache.discard(tmpPath)
             # parse signal cannot be emitted in finally block
             # since it will execute before except block
             self.closeSignal.emit(True)     # close loaderUI